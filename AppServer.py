@@ -13,6 +13,8 @@ from blueprints.custom_stock import custom_stock_bp
 from flask import render_template
 from blueprints.limitup_unfilled_orders import limitup_unfilled_orders_bp 
 from blueprints.stock_pool_manager import global_updater
+from blueprints.dashboard_snapshot import snapshot_task
+from blueprints.bar_store import bar_store_task, BAR_STORE_ENABLED
 
 CORS(app)
 
@@ -47,5 +49,8 @@ if __name__ == '__main__':
     with app.app_context():
         global_updater.sync_latest_stocks()  # 初始同步
         global_updater.start()  # 启动线程
+    socketio.start_background_task(snapshot_task)  # 盘后看板快照
+    if BAR_STORE_ENABLED:
+        socketio.start_background_task(bar_store_task)  # 日线列式存储增量同步
     socketio.run(app, host=app.config['HOST'], port=app.config['PORT'], debug=False)
     print('Server started successfully')
\ No newline at end of file
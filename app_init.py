@@ -2,7 +2,8 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_caching import Cache
-from flask_socketio import SocketIO
+from flask import request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from sqlalchemy import inspect
 import yaml
 import sqlalchemy
@@ -36,55 +37,75 @@ app.config['PORT'] = config['server']['port']  # 添加 PORT
 
 db = SQLAlchemy(app)
 cache = Cache(app, config={'CACHE_TYPE': 'simple'})
-socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*")
+# polling 传输的响应超过阈值时压缩
+socketio = SocketIO(
+    app, async_mode='gevent', cors_allowed_origins="*",
+    http_compression=config.get('realtime', {}).get('http_compression', True),
+    compression_threshold=config.get('realtime', {}).get('compression_threshold', 1024)
+)
 
 
 logger = app.logger
 # 初始化socketio
 def init_socketio(socketio):
+    from blueprints.realtime_protocol import delta_encoder
+    from blueprints.realtime_subscriptions import subscriptions, DASHBOARD_SOURCES, ALL_ROOM, STOCK_DASHBOARD
+
     @socketio.on('connect', namespace='/stocks_realtime')
     def handle_connect():
         logger.debug("Client connected to /stocks_realtime namespace")
 
     @socketio.on('disconnect', namespace='/stocks_realtime')
     def handle_disconnect():
+        subscriptions.unsubscribe_all(request.sid)
         logger.debug("Client disconnected from /stocks_realtime namespace")
 
     from blueprints.stock_pool_manager import global_updater
 
+    def codes_for_dashboards(dashboards, sid=None):
+        if ALL_ROOM in dashboards:
+            return set(global_updater.stocks_pool.keys())
+        stock_codes = set()
+        for dashboard in dashboards:
+            if dashboard == STOCK_DASHBOARD:
+                # stock_dashboard 的股票不在股票池的 source 里，取请求方订阅的代码
+                if sid is not None:
+                    stock_codes.update(subscriptions.codes_for(sid))
+            elif dashboard in DASHBOARD_SOURCES:
+                for source in DASHBOARD_SOURCES[dashboard]:
+                    stock_codes.update(global_updater.codes_for_source(source))
+            else:
+                logger.debug(f"Ignoring unknown dashboard: {dashboard}")
+        return stock_codes
+
+    # 客户端订阅看板和/或股票代码集合，之后只收到订阅范围内的 realtime_update
+    @socketio.on('subscribe', namespace='/stocks_realtime')
+    def handle_subscribe(data=None):
+        dashboards = [d for d in (data or {}).get('dashboards', []) if d == ALL_ROOM or d in DASHBOARD_SOURCES]
+        codes = [str(code) for code in (data or {}).get('codes', []) if code]
+        joined, left = subscriptions.subscribe(request.sid, dashboards, codes)
+        for room in left:
+            leave_room(room)
+        for room in joined:
+            join_room(room)
+        # 先给订阅方一帧订阅范围内的全量数据
+        snapshot = delta_encoder.snapshot(codes_for_dashboards(dashboards) | set(codes))
+        if snapshot:
+            emit('realtime_update', delta_encoder.encode(snapshot, keyframe=True))
+        logger.debug(f"Client {request.sid} subscribed to {dashboards} and {len(codes)} codes")
+
     # 处理前端刷新请求，添加默认参数
     @socketio.on('refresh_realtime_data', namespace='/stocks_realtime')
     def handle_refresh_request(data=None):
         dashboards = data.get('dashboards', ['all']) if data else ['all']
         app.logger.debug(f"Received refresh_realtime_data request for dashboards: {dashboards}")
-        
-        # 映射 dashboard 到 stocks_pool 的 sources
-        source_mapping = {
-            'stock_dashboard': 'data_dashboard',  
-            'ma_strategy_dashboard': 'ma_strategy',
-            'custom_stock_dashboard': 'custom_stock',
-            'limitup_unfilled_orders_dashboard': 'limitup_unfilled_orders'
-        }
-        
-        if 'all' in dashboards:
-            stock_codes = list(global_updater.stocks_pool.keys())
-        else:
-            stock_codes = set()
-            with global_updater.realtime_lock:
-                for dashboard in dashboards:
-                    source = source_mapping.get(dashboard)
-                    if source:
-                        stock_codes.update(
-                            code for code, info in global_updater.stocks_pool.items()
-                            if source in info['sources']
-                        )
-                    else:  # stock_dashboard 包含所有股票
-                        stock_codes.update(global_updater.stocks_pool.keys())
-        
+
+        stock_codes = codes_for_dashboards(dashboards, request.sid)
         if stock_codes:
             updated_data = global_updater.get_realtime_data(list(stock_codes), source='mairui', caller='refresh_request')
             if updated_data:
-                socketio.emit('realtime_update', updated_data, namespace='/stocks_realtime')
+                # 变化部分已由 get_realtime_data 广播，这里给请求方补一帧所选股票的全量数据
+                emit('realtime_update', delta_encoder.encode_keyframe(updated_data))
                 app.logger.debug(f"Emitted refreshed realtime data for {len(updated_data)} stocks")
         else:
             app.logger.warning("No stocks selected for refresh")
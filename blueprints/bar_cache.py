@@ -0,0 +1,214 @@
+# blueprints/bar_cache.py
+# 日线缓存：历史交易日的 K 线不会再变化，按 (StockCode, trading_Date) 常驻内存，LRU 淘汰；
+# 未命中时依次查本地列式存储和 MySQL
+from app_init import app, db, config, DailyStockData
+from blueprints.trading_calendar import trading_calendar, to_date
+from blueprints.dashboard_assembler import frame_from_rows, DAILY_FIELDS
+from blueprints.bar_store import daily_bar_store, BAR_STORE_ENABLED, BAR_STORE_FIELDS
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import select
+import logging
+import time
+import gevent.lock
+import numpy as np
+import pandas as pd
+import pytz
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def get_beijing_today():
+    return datetime.now(pytz.timezone('Asia/Shanghai')).date()
+
+
+class DailyBarCache:
+    def __init__(self, max_entries=200000, negative_ttl=3600, query_chunk_size=500):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl        # 停牌等查不到的 (code, date) 在这段时间内不再重复查询
+        self.query_chunk_size = query_chunk_size
+        self._bars = OrderedDict()              # (code, date) -> (open, high, low, close, change_percent)
+        self._absent = {}                       # (code, date) -> 记录时间
+        self._lock = gevent.lock.Semaphore()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, now):
+        bar = self._bars.get(key, _MISSING)
+        if bar is not _MISSING:
+            self._bars.move_to_end(key)
+            return bar
+        checked_at = self._absent.get(key)
+        if checked_at is not None and now - checked_at < self.negative_ttl:
+            return None
+        return _MISSING
+
+    def _store(self, key, bar):
+        self._bars[key] = bar
+        self._bars.move_to_end(key)
+        self._absent.pop(key, None)
+        while len(self._bars) > self.max_entries:
+            self._bars.popitem(last=False)
+
+    def _fetch(self, stock_codes, dates, engine):
+        rows = []
+        columns = [getattr(DailyStockData, field) for field in DAILY_FIELDS]
+        with engine.connect() as conn:
+            for i in range(0, len(stock_codes), self.query_chunk_size):
+                chunk = stock_codes[i:i + self.query_chunk_size]
+                statement = select(*columns).where(
+                    DailyStockData.StockCode.in_(chunk),
+                    DailyStockData.trading_Date.in_(dates)
+                )
+                rows.extend(tuple(r) for r in conn.execute(statement).fetchall())
+        return rows
+
+    def get_rows(self, stock_codes, trading_dates, engine=None):
+        """
+        返回 stock_codes × trading_dates 范围内的日线行（DAILY_FIELDS 顺序的元组）。
+        历史日期优先从内存读取，只有缺失的 (code, date) 和当天的 K 线才会查询 MySQL。
+        """
+        if engine is None:
+            with app.app_context():
+                engine = db.engine
+        today = get_beijing_today()
+        dates = [to_date(d) for d in trading_dates]
+        now = time.time()
+
+        rows = []
+        served = set()
+        missing_codes = set()
+        missing_dates = set()
+        live_dates = [d for d in dates if d >= today]  # 当天数据盘后还会写入/修正，始终查库
+        with self._lock:
+            for date in dates:
+                if date >= today:
+                    continue
+                for code in stock_codes:
+                    bar = self._lookup((code, date), now)
+                    if bar is _MISSING:
+                        missing_codes.add(code)
+                        missing_dates.add(date)
+                        self.misses += 1
+                    else:
+                        self.hits += 1
+                        served.add((code, date))
+                        if bar is not None:
+                            rows.append((code, date) + bar)
+
+        fetched = []
+        if missing_codes and BAR_STORE_ENABLED:
+            # 先查本地列式存储，只有库里也没有结论的 (code, date) 才查 MySQL
+            stored, covered = daily_bar_store.lookup(sorted(missing_codes), sorted(missing_dates))
+            fetched.extend(stored)
+            served_from_store = covered
+            missing_codes = {code for code in missing_codes
+                             if any((code, date) not in covered for date in missing_dates)}
+            missing_dates = {date for date in missing_dates
+                             if any((code, date) not in covered for code in missing_codes)}
+        else:
+            served_from_store = set()
+        if missing_codes:
+            fetched.extend(self._fetch(sorted(missing_codes), sorted(missing_dates), engine))
+        if live_dates:
+            fetched.extend(self._fetch(list(stock_codes), live_dates, engine))
+        if fetched or missing_codes or served_from_store:
+            found = set()
+            with self._lock:
+                for row in fetched:
+                    key = (row[0], to_date(row[1]))
+                    if key in served or key in found:
+                        continue
+                    found.add(key)
+                    rows.append(row)
+                    if key[1] < today:
+                        self._store(key, tuple(row[2:]))
+                # 查询范围内没查到的历史 (code, date) 记为缺失，避免反复查库
+                for key in served_from_store:
+                    if key not in found:
+                        self._absent[key] = now
+                for code in missing_codes:
+                    for date in missing_dates:
+                        key = (code, date)
+                        if key not in found and key not in served:
+                            self._absent[key] = now
+                if len(self._absent) > self.max_entries:
+                    self._absent = {k: v for k, v in self._absent.items() if now - v < self.negative_ttl}
+            logger.debug(f"Daily bar cache fetched {len(fetched)} rows ({len(missing_codes)} missing codes, {len(live_dates)} live dates)")
+        return rows
+
+    def _frame_from_store(self, stock_codes, dates):
+        """
+        从列式存储的区间视图中取出多日日线，只复制所需股票的行。
+
+        :return: (frame, store_codes, store_dates)，store_codes × store_dates 以外的部分需另行查询
+        """
+        codes, window_dates, views = daily_bar_store.window(dates[0], dates[-1])
+        wanted = set(dates)
+        col_mask = np.array([d in wanted for d in window_dates], dtype=bool)
+        store_dates = [d for d in window_dates if d in wanted]
+        index = daily_bar_store.code_index
+        store_codes = [code for code in stock_codes if code in index and index[code] < len(codes)]
+        if not store_codes or not store_dates:
+            return None, [], []
+        rows = np.array([index[code] for code in store_codes], dtype=np.int64)
+        block = {field: views[field][rows][:, col_mask] for field in BAR_STORE_FIELDS}
+        frame = pd.DataFrame({
+            'StockCode': np.repeat(store_codes, len(store_dates)),
+            'trading_Date': np.tile(np.array(store_dates, dtype=object), len(store_codes)),
+            **{field: block[field].ravel() for field in BAR_STORE_FIELDS},
+        }, columns=DAILY_FIELDS)
+        # 各字段全为 NaN 表示该股票当天无日线（停牌等）
+        present = ~np.isnan(np.stack([block[field].ravel() for field in BAR_STORE_FIELDS])).all(axis=0)
+        return frame[present].reset_index(drop=True), store_codes, store_dates
+
+    def get_frame(self, stock_codes, trading_dates, engine=None):
+        """
+        返回 stock_codes × trading_dates 的日线 DataFrame。
+        启用列式存储时已同步的历史区间直接取自内存映射视图，其余部分走 get_rows。
+        """
+        stock_codes = list(stock_codes)
+        dates = sorted({to_date(d) for d in trading_dates})
+        if not BAR_STORE_ENABLED or not stock_codes or not dates:
+            return frame_from_rows(self.get_rows(stock_codes, dates, engine), DAILY_FIELDS)
+
+        frame, store_codes, store_dates = self._frame_from_store(stock_codes, dates)
+        if frame is None:
+            return frame_from_rows(self.get_rows(stock_codes, dates, engine), DAILY_FIELDS)
+        rows = []
+        stored_dates, stored_codes = set(store_dates), set(store_codes)
+        rest_dates = [d for d in dates if d not in stored_dates]
+        if rest_dates:
+            rows.extend(self.get_rows(stock_codes, rest_dates, engine))
+        rest_codes = [code for code in stock_codes if code not in stored_codes]
+        if rest_codes:
+            rows.extend(self.get_rows(rest_codes, store_dates, engine))
+        if not rows:
+            return frame
+        return pd.concat([frame, frame_from_rows(rows, DAILY_FIELDS)], ignore_index=True)
+
+    def prefill(self, stock_codes, days=5):
+        # 启动时预热股票池最近几个交易日的历史 K 线
+        stock_codes = list(stock_codes)
+        if not stock_codes:
+            return
+        try:
+            start_time = time.time()
+            dates = [d for d in trading_calendar.recent(get_beijing_today(), days + 1) if d < get_beijing_today()][:days]
+            rows = self.get_rows(stock_codes, dates)
+            logger.info(f"Daily bar cache prefilled {len(rows)} bars for {len(stock_codes)} stocks in {time.time() - start_time:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Error prefilling daily bar cache: {str(e)}", exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._bars), 'absent': len(self._absent), 'hits': self.hits, 'misses': self.misses}
+
+
+_bar_cache_config = config.get('cache', {}).get('daily_bars', {})
+daily_bar_cache = DailyBarCache(
+    max_entries=_bar_cache_config.get('max_entries', 200000),
+    negative_ttl=_bar_cache_config.get('negative_ttl', 3600)
+)
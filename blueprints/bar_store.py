@@ -0,0 +1,273 @@
+# blueprints/bar_store.py
+# 日线列式存储：open/high/low/close/change_percent 各自一个内存映射的 NumPy 数组，
+# 行为股票、列为交易日序号。整池多年窗口直接返回切片视图，不再逐行构造 ORM 对象
+from app_init import app, db, config, DailyStockData
+from blueprints.trading_calendar import trading_calendar, to_date
+from datetime import datetime
+from sqlalchemy import select
+import bisect
+import glob
+import json
+import logging
+import os
+import time
+import gevent
+import gevent.lock
+import numpy as np
+import pytz
+
+logger = logging.getLogger(__name__)
+
+BAR_STORE_FIELDS = ('open', 'high', 'low', 'close', 'change_percent')
+
+
+def get_beijing_today():
+    return datetime.now(pytz.timezone('Asia/Shanghai')).date()
+
+
+class DailyBarStore:
+    def __init__(self, directory='bar_store', history_days=750, sync_chunk_days=20, resync_days=3):
+        self.directory = directory
+        self.history_days = history_days
+        self.sync_chunk_days = sync_chunk_days
+        self.resync_days = resync_days  # 最近几个交易日每次同步都重新拉取，覆盖延迟落库和盘后修正
+        self.codes = []            # 行号 -> 股票代码
+        self.code_index = {}       # 股票代码 -> 行号
+        self.dates = []            # 列号（交易日序号）-> datetime.date，升序
+        self.synced_through = None # 已写入并落盘的最后一个交易日；dates 中更晚的列可能尚未写入
+        self.arrays = {}           # 字段 -> np.memmap，形状 (code_capacity, day_capacity)
+        self.generation = 0
+        self.code_capacity = 0
+        self.day_capacity = 0
+        self.last_synced_at = 0
+        self._lock = gevent.lock.Semaphore()
+        self._loaded = False
+
+    # ---------- 文件与容量管理 ----------
+    def _meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    def _field_path(self, field, generation):
+        return os.path.join(self.directory, f"{field}.{generation}.f8")
+
+    def _open_arrays(self, generation, code_capacity, day_capacity, mode):
+        return {
+            field: np.memmap(self._field_path(field, generation), dtype='float64', mode=mode,
+                             shape=(code_capacity, day_capacity))
+            for field in BAR_STORE_FIELDS
+        }
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self._meta_path()):
+            with open(self._meta_path(), 'r') as f:
+                meta = json.load(f)
+            self.generation = meta['generation']
+            self.code_capacity = meta['code_capacity']
+            self.day_capacity = meta['day_capacity']
+            self.codes = meta['codes']
+            self.code_index = {code: i for i, code in enumerate(self.codes)}
+            self.dates = [to_date(d) for d in meta['dates']]
+            self.synced_through = to_date(meta.get('synced_through'))
+            self.arrays = self._open_arrays(self.generation, self.code_capacity, self.day_capacity, 'r+')
+            logger.info(f"Daily bar store loaded: {len(self.codes)} codes x {len(self.dates)} days")
+        else:
+            self._allocate(1024, self.history_days + 256)
+        self._remove_stale_generations()
+        self._loaded = True
+
+    def _allocate(self, code_capacity, day_capacity):
+        # 扩容时写入新一代文件再切换，旧文件可能仍被读者的视图映射（Windows 下无法删除），下次启动时清理
+        generation = self.generation + 1
+        arrays = self._open_arrays(generation, code_capacity, day_capacity, 'w+')
+        for field, array in arrays.items():
+            array[:] = np.nan
+            if field in self.arrays:
+                old = self.arrays[field]
+                array[:old.shape[0], :old.shape[1]] = old
+            array.flush()
+        self.arrays = arrays
+        self.generation = generation
+        self.code_capacity = code_capacity
+        self.day_capacity = day_capacity
+        self._save_meta()
+        logger.info(f"Daily bar store allocated generation {generation}: {code_capacity} codes x {day_capacity} days")
+
+    def _remove_stale_generations(self):
+        for path in glob.glob(os.path.join(self.directory, '*.f8')):
+            if not path.endswith(f".{self.generation}.f8"):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale bar store file {path}: {e}")
+
+    def _save_meta(self):
+        meta = {
+            'generation': self.generation,
+            'code_capacity': self.code_capacity,
+            'day_capacity': self.day_capacity,
+            'codes': self.codes,
+            'dates': [d.strftime('%Y-%m-%d') for d in self.dates],
+            'synced_through': self.synced_through.strftime('%Y-%m-%d') if self.synced_through else None,
+        }
+        tmp_path = f"{self._meta_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def _code_row(self, code):
+        row = self.code_index.get(code)
+        if row is None:
+            if len(self.codes) >= self.code_capacity:
+                self._allocate(self.code_capacity * 2, self.day_capacity)
+            row = len(self.codes)
+            self.codes.append(code)
+            self.code_index[code] = row
+        return row
+
+    def _append_date(self, date):
+        if self.dates and date <= self.dates[-1]:
+            return
+        if len(self.dates) >= self.day_capacity:
+            self._allocate(self.code_capacity, self.day_capacity * 2)
+        self.dates.append(date)
+
+    def day_ordinal(self, date):
+        date = to_date(date)
+        idx = bisect.bisect_left(self.dates, date)
+        return idx if idx < len(self.dates) and self.dates[idx] == date else None
+
+    # ---------- 增量同步 ----------
+    def _write_rows(self, rows):
+        for row in rows:
+            col = self.day_ordinal(row[1])
+            if col is None:
+                continue
+            r = self._code_row(row[0])
+            for field, value in zip(BAR_STORE_FIELDS, row[2:]):
+                self.arrays[field][r, col] = np.nan if value is None else float(value)
+
+    def sync(self):
+        """从 DailyStockData 追加新交易日，并重新拉取最近 resync_days 个已同步的交易日"""
+        self._ensure_loaded()
+        start_time = time.time()
+        today = get_beijing_today()
+        with self._lock:
+            calendar_dates = trading_calendar.recent(today, self.history_days)[::-1]
+            if self.synced_through is not None:
+                # 从水位往前 resync_days 个交易日开始，上次中断后未写入的日期也会补上
+                synced = bisect.bisect_right(self.dates, self.synced_through)
+                resync_from = self.dates[max(0, synced - self.resync_days)]
+                calendar_dates = [d for d in calendar_dates if d >= resync_from]
+            if not calendar_dates:
+                return 0
+            for date in calendar_dates:
+                self._append_date(date)
+
+            columns = [getattr(DailyStockData, field) for field in ('StockCode', 'trading_Date') + BAR_STORE_FIELDS]
+            with app.app_context():
+                engine = db.engine
+            written = 0
+            for i in range(0, len(calendar_dates), self.sync_chunk_days):
+                chunk = calendar_dates[i:i + self.sync_chunk_days]
+                with engine.connect() as conn:
+                    rows = conn.execute(select(*columns).where(DailyStockData.trading_Date.in_(chunk))).fetchall()
+                self._write_rows(rows)
+                for array in self.arrays.values():
+                    array.flush()
+                # 日期按升序分块，本块写入并落盘后才推进水位；同步中断时未写入的日期不会被当作“确认无数据”
+                if self.synced_through is None or chunk[-1] > self.synced_through:
+                    self.synced_through = chunk[-1]
+                written += len(rows)
+                gevent.sleep(0)  # 大批量回填时让出，避免阻塞请求
+            self._save_meta()
+            self.last_synced_at = time.time()
+        logger.info(f"Daily bar store synced {written} bars for {len(calendar_dates)} days in {time.time() - start_time:.2f} seconds")
+        return written
+
+    # ---------- 读取 ----------
+    def settled_through(self):
+        """已写入落盘且不再修正的最后一个交易日；最近 resync_days 个交易日和水位之后的日期不在其内"""
+        dates = self.dates
+        if len(dates) <= self.resync_days or self.synced_through is None:
+            return None
+        end = min(len(dates) - self.resync_days,
+                  bisect.bisect_left(dates, get_beijing_today()),
+                  bisect.bisect_right(dates, self.synced_through))
+        return dates[end - 1] if end > 0 else None
+
+    def window(self, start_date=None, end_date=None):
+        """
+        返回整池在 [start_date, end_date] 区间的零拷贝视图，区间截止到 settled_through()。
+
+        :return: (codes, dates, {field: ndarray[len(codes), len(dates)]})，无数据处为 NaN
+        """
+        self._ensure_loaded()
+        settled = self.settled_through()
+        if settled is None:
+            return [], [], {field: np.empty((0, 0)) for field in BAR_STORE_FIELDS}
+        end_date = settled if end_date is None else min(to_date(end_date), settled)
+        # 先取出引用，同步过程中扩容替换 arrays 不影响已返回的视图
+        codes, dates, arrays = self.codes, self.dates, self.arrays
+        start = 0 if start_date is None else bisect.bisect_left(dates, to_date(start_date))
+        end = bisect.bisect_right(dates, end_date)
+        n_codes = len(codes)
+        views = {field: array[:n_codes, start:end] for field, array in arrays.items()}
+        return codes[:n_codes], dates[start:end], views
+
+    def lookup(self, stock_codes, trading_dates):
+        """
+        按 (code, date) 读取已同步的日线。
+
+        :return: (rows, covered)，rows 为 DAILY_FIELDS 顺序的元组，
+                 covered 为库中有确定结论（有数据或确认无数据）的 (code, date) 集合
+        """
+        self._ensure_loaded()
+        rows = []
+        covered = set()
+        settled = self.settled_through()
+        if settled is None:
+            return rows, covered
+        # 最近 resync_days 个交易日还可能被修正、水位之后的日期尚未写入，交给调用方查库
+        dates = [to_date(d) for d in trading_dates]
+        cols = [(date, self.day_ordinal(date)) for date in dates if date <= settled]
+        cols = [(date, col) for date, col in cols if col is not None]
+        known = [(code, self.code_index[code]) for code in stock_codes if code in self.code_index]
+        if not cols or not known:
+            return rows, covered
+
+        row_idx = np.array([r for _, r in known], dtype=np.int64)
+        col_idx = np.array([c for _, c in cols], dtype=np.int64)
+        block = np.stack([self.arrays[field][np.ix_(row_idx, col_idx)] for field in BAR_STORE_FIELDS], axis=-1)
+        present = ~np.isnan(block).all(axis=-1)
+        for i, (code, _) in enumerate(known):
+            for j, (date, _) in enumerate(cols):
+                covered.add((code, date))
+                if present[i, j]:
+                    rows.append((code, date) + tuple(None if np.isnan(v) else float(v) for v in block[i, j]))
+        return rows, covered
+
+_bar_store_config = config.get('bar_store', {})
+# 默认关闭：首次启用会从 MySQL 回填 history_days 个交易日的全市场日线，需要在配置中显式打开
+BAR_STORE_ENABLED = _bar_store_config.get('enabled', False)
+BAR_STORE_SYNC_INTERVAL = _bar_store_config.get('sync_interval', 1800)
+daily_bar_store = DailyBarStore(
+    directory=_bar_store_config.get('directory', 'bar_store'),
+    history_days=_bar_store_config.get('history_days', 750)
+)
+
+
+def bar_store_task():
+    logger.info("[global] Starting daily bar store sync task")
+    while True:
+        try:
+            daily_bar_store.sync()
+        except Exception as e:
+            logger.error(f"[global] Error syncing daily bar store: {str(e)}", exc_info=True)
+        gevent.sleep(BAR_STORE_SYNC_INTERVAL)
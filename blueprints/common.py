@@ -1,31 +1,38 @@
 # blueprints/common.py
 from flask import Blueprint
 from app_init import app, db, TradingDay
+from blueprints.trading_calendar import trading_calendar
+from blueprints.dashboard_assembler import frame_from_rows
+from blueprints.bar_cache import daily_bar_cache
+from sqlalchemy import select, func, and_
 import logging
 import datetime
+import gevent
 
 logger = logging.getLogger(__name__)
 
-def get_nearest_trading_date(target_date, TradingDay):
+def get_nearest_trading_date(target_date, TradingDay=None):
+    # TradingDay 参数保留以兼容旧调用，日期查询统一走内存中的交易日历
     try:
-        result = db.session.query(TradingDay.trading_date).filter(
-            TradingDay.trading_date <= target_date
-        ).order_by(TradingDay.trading_date.desc()).first()
-        return result[0] if result else None
+        return trading_calendar.nearest(target_date)
     except Exception as e:
         logger.error(f"Error in get_nearest_trading_date: {str(e)}")
         return None
 
-def get_recent_trading_dates(target_date, days, TradingDay):
+def get_recent_trading_dates(target_date, days, TradingDay=None):
     try:
-        results = db.session.query(TradingDay.trading_date).filter(
-            TradingDay.trading_date <= target_date
-        ).order_by(TradingDay.trading_date.desc()).limit(days).all()
-        return [r[0].strftime('%Y-%m-%d') for r in results]
+        return [d.strftime('%Y-%m-%d') for d in trading_calendar.recent(target_date, days)]
     except Exception as e:
         logger.error(f"Error in get_recent_trading_dates: {str(e)}")
         return []
 
+def get_next_trading_date(target_date):
+    try:
+        return trading_calendar.next_date(target_date)
+    except Exception as e:
+        logger.error(f"Error in get_next_trading_date: {str(e)}")
+        return None
+
 def is_tradingday(target_date):
     """
     判断指定日期是否为交易日。
@@ -33,52 +40,72 @@ def is_tradingday(target_date):
     :param target_date: 日期 (datetime 或者 'YYYY-MM-DD' 格式的字符串)
     :return: True 如果是交易日，否则 False
     """
-    with app.app_context():  # 添加应用上下文
-        if isinstance(target_date, str):
-            try:
-                target_date = datetime.strptime(target_date, "%Y-%m-%d")
-            except ValueError:
-                raise ValueError("Invalid date format. Use 'YYYY-MM-DD'.")
+    return trading_calendar.is_trading_day(target_date)
 
-        nearest_trading_date = get_nearest_trading_date(target_date, TradingDay)
-        
-        return nearest_trading_date == target_date if nearest_trading_date else False
 
+# 各看板实际用到的字段
+POPULARITY_FIELDS = ['StockCode', 'StockName', 'PopularityRank']
+TURNOVER_FIELDS = ['StockCode', 'TurnoverAmount', 'TurnoverRank']
+LIMITUP_FIELDS = ['StockCode', 'LatestLimitUpDate', 'ReasonCategory']
+
+def run_frame_query(engine, statement, columns):
+    # 每个查询在独立的连接池连接上执行，可在 greenlet 中并发
+    with engine.connect() as conn:
+        rows = conn.execute(statement).fetchall()
+    return frame_from_rows([tuple(r) for r in rows], columns)
+
+def fan_out_queries(jobs):
+    """
+    并发执行若干 (func, args...) 查询任务，func 的第一个参数为 engine，返回对应的 DataFrame 列表。
+    总耗时取决于最慢的查询，而不是所有查询之和。
+    """
+    engine = db.engine  # greenlet 中没有应用上下文，提前取出 engine
+    greenlets = [gevent.spawn(job[0], engine, *job[1:]) for job in jobs]
+    gevent.joinall(greenlets)
+    return [g.get() for g in greenlets]
+
+def load_daily_frame(engine, stock_codes, trading_dates):
+    # 历史 K 线走进程内缓存，只有缺失的和当天的才查库
+    return daily_bar_cache.get_frame(stock_codes, trading_dates, engine)
+
+def latest_limitup_statement(DailyLimitUpStocks, stock_codes):
+    # 每只股票只取最近一次涨停记录
+    latest = select(
+        DailyLimitUpStocks.StockCode.label('StockCode'),
+        func.max(DailyLimitUpStocks.LatestLimitUpDate).label('max_date')
+    ).where(
+        DailyLimitUpStocks.StockCode.in_(stock_codes)
+    ).group_by(DailyLimitUpStocks.StockCode).subquery()
+    return select(
+        DailyLimitUpStocks.StockCode, DailyLimitUpStocks.LatestLimitUpDate, DailyLimitUpStocks.ReasonCategory
+    ).join(
+        latest,
+        and_(DailyLimitUpStocks.StockCode == latest.c.StockCode,
+             DailyLimitUpStocks.LatestLimitUpDate == latest.c.max_date)
+    )
 
 def merge_stock_data(base_data, stock_codes, nearest_trading_date, recent_trading_dates, models):
     StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData = models
-    
-    pop_subquery = db.session.query(StockPopularityRanking).filter(
+
+    pop_statement = select(
+        StockPopularityRanking.StockCode, StockPopularityRanking.StockName, StockPopularityRanking.PopularityRank
+    ).where(
         StockPopularityRanking.StockCode.in_(stock_codes),
         StockPopularityRanking.date == nearest_trading_date
-    ).subquery()
-    popularity_data = db.session.query(pop_subquery).all()
+    )
 
-    turnover_subquery = db.session.query(StockTurnoverRanking).filter(
+    turnover_statement = select(
+        StockTurnoverRanking.StockCode, StockTurnoverRanking.TurnoverAmount, StockTurnoverRanking.TurnoverRank
+    ).where(
         StockTurnoverRanking.StockCode.in_(stock_codes),
         StockTurnoverRanking.date == nearest_trading_date
-    ).subquery()
-    turnover_data = db.session.query(turnover_subquery).all()
+    )
 
-    limitup_subquery = db.session.query(DailyLimitUpStocks).filter(
-        DailyLimitUpStocks.StockCode.in_(stock_codes)
-    ).subquery()
-    limitup_data = db.session.query(limitup_subquery).all()
-
-    daily_subquery = db.session.query(DailyStockData).filter(
-        DailyStockData.StockCode.in_(stock_codes),
-        DailyStockData.trading_Date.in_(recent_trading_dates)
-    ).order_by(DailyStockData.trading_Date.desc()).subquery()
-    daily_data = db.session.query(daily_subquery).all()
-
-    pop_dict = {p.StockCode: p for p in popularity_data}
-    turnover_dict = {t.StockCode: t for t in turnover_data}
-    limitup_dict = {l.StockCode: l for l in limitup_data}
-    daily_dict = {}
-    for d in daily_data:
-        if d.StockCode not in daily_dict:
-            daily_dict[d.StockCode] = []
-        daily_dict[d.StockCode].append(d)
-
-    return pop_dict, turnover_dict, limitup_dict, daily_dict
+    pop_frame, turnover_frame, limitup_frame, daily_frame = fan_out_queries([
+        (run_frame_query, pop_statement, POPULARITY_FIELDS),
+        (run_frame_query, turnover_statement, TURNOVER_FIELDS),
+        (run_frame_query, latest_limitup_statement(DailyLimitUpStocks, stock_codes), LIMITUP_FIELDS),
+        (load_daily_frame, stock_codes, recent_trading_dates),
+    ])
 
+    return pop_frame, turnover_frame, limitup_frame, daily_frame
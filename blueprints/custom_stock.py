@@ -3,8 +3,13 @@ from flask import Blueprint, jsonify, request
 import gevent.lock
 from app_init import app, db, cache, socketio, StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData, TradingDay
 from blueprints.common import get_nearest_trading_date, get_recent_trading_dates, merge_stock_data
+from blueprints.trading_calendar import trading_calendar
+from blueprints.bar_cache import daily_bar_cache
+from blueprints.dashboard_assembler import column, assemble_dashboard
+from blueprints.dashboard_cache import get_static_payload, overlay_realtime
 from datetime import datetime, timedelta
 import pytz
+import pandas as pd
 import os
 import logging
 import gevent
@@ -14,6 +19,18 @@ logger = logging.getLogger(__name__)
 
 custom_stock_bp = Blueprint('custom_stock', __name__)
 
+CUSTOM_STOCK_COLUMNS = [
+    column('StockCode'),
+    column('StockName', 'popularity', default='Unknown'),
+    column('PopularityRank', 'popularity'),
+    column('TurnoverAmount', 'turnover'),
+    column('TurnoverRank', 'turnover'),
+    column('LatestLimitUpDate', 'limitup', kind='date'),
+    column('ReasonCategory', 'limitup'),
+    column('YesterdayChange', 'yesterday', 'change_percent', kind='float'),
+    column('YesterdayClose', 'yesterday', 'close', kind='float'),
+]
+
 # 全局变量存储股票代码
 stock_codes = []
 stock_codes_lock = gevent.lock.Semaphore()
@@ -57,8 +74,30 @@ def write_stock_codes(stock_codes_to_write, file_path='stocks.txt'):
         logger.error(f"Error writing stock codes to {file_path}: {str(e)}")
         return False
 
+def build_custom_stock_data(local_stock_codes, target_date, display_date, yesterday):
+    """生成 custom_stock_data 的静态部分（不含实时行情），返回 (payload, status_code)"""
+    with app.app_context():
+        recent_trading_dates = get_recent_trading_dates(target_date, 5, TradingDay)
+        if not recent_trading_dates:
+            logger.error("No recent trading dates available")
+            return {'error': 'No recent trading dates available'}, 404
+
+        pop_frame, turnover_frame, limitup_frame, daily_frame = merge_stock_data(
+            None, local_stock_codes, display_date, recent_trading_dates,
+            (StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData)
+        )
+
+        yesterday_frame = daily_bar_cache.get_frame(local_stock_codes, [yesterday]) if yesterday else None
+
+        base = pd.DataFrame({'StockCode': local_stock_codes})
+        stock_data = assemble_dashboard(
+            base,
+            {'popularity': pop_frame, 'turnover': turnover_frame, 'limitup': limitup_frame, 'yesterday': yesterday_frame},
+            CUSTOM_STOCK_COLUMNS, daily_frame, recent_days=5
+        )
+        return stock_data, 200
+
 @custom_stock_bp.route('/custom_stock_data', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
 def get_custom_stock_data():
     from blueprints.stock_pool_manager import update_stocks_pool, get_realtime_data #延迟导入
     global stock_codes
@@ -67,7 +106,7 @@ def get_custom_stock_data():
     
     try:
         beijing_time = get_beijing_time()
-        is_trading_day = db.session.query(TradingDay).filter_by(trading_date=target_date).first() is not None
+        is_trading_day = trading_calendar.is_trading_day(target_date)
 
         if not is_trading_day:
             display_date = get_nearest_trading_date(target_date, TradingDay)
@@ -100,67 +139,16 @@ def get_custom_stock_data():
 
         update_stocks_pool(local_stock_codes, caller='custom_stock')
 
-        with app.app_context():
-            recent_trading_dates = get_recent_trading_dates(target_date, 5, TradingDay)
-            if not recent_trading_dates:
-                logger.error("No recent trading dates available")
-                return jsonify({'error': 'No recent trading dates available'}), 404
-
-            pop_dict, turnover_dict, limitup_dict, daily_dict = merge_stock_data(
-                None, local_stock_codes, display_date, recent_trading_dates,
-                (StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData)
-            )
-
-            yesterday_data = db.session.query(DailyStockData).filter(
-                DailyStockData.StockCode.in_(local_stock_codes),
-                DailyStockData.trading_Date == yesterday
-            ).all() if yesterday else []
-            yesterday_dict = {d.StockCode: d for d in yesterday_data}
-
-            stock_data = []
-            realtime_data_copy = get_realtime_data() #get_realtime_data('realtime')
-            
-            for code in local_stock_codes:
-                yesterday_record = yesterday_dict.get(code)
-                limitup_record = limitup_dict.get(code)
-                realtime = realtime_data_copy.get(code, {'RealtimePrice': None, 'RealtimeChange': None})
-                
-                stock_info = {
-                    'StockCode': code,
-                    'StockName': getattr(pop_dict.get(code), 'StockName', 'Unknown'),
-                    'PopularityRank': getattr(pop_dict.get(code), 'PopularityRank', None),
-                    'TurnoverAmount': getattr(turnover_dict.get(code), 'TurnoverAmount', None),
-                    'TurnoverRank': getattr(turnover_dict.get(code), 'TurnoverRank', None),
-                    'LatestLimitUpDate': limitup_record.LatestLimitUpDate.strftime('%Y-%m-%d') if limitup_record and limitup_record.LatestLimitUpDate else None,
-                    'ReasonCategory': limitup_record.ReasonCategory if limitup_record else None,
-                    'RealtimeChange': realtime['RealtimeChange'],
-                    'RealtimePrice': realtime['RealtimePrice'],
-                    'YesterdayChange': float(yesterday_record.change_percent) if yesterday_record and yesterday_record.change_percent is not None else None,
-                    'YesterdayClose': float(yesterday_record.close) if yesterday_record and yesterday_record.close is not None else None,
-                    'recent_data': []
-                }
-
-                if code in daily_dict:
-                    daily_records = sorted(
-                        daily_dict[code],
-                        key=lambda x: x.trading_Date,
-                        reverse=True
-                    )
-                    for d in daily_records[:5]:
-                        day_data = {
-                            'trading_Date': d.trading_Date.strftime('%Y-%m-%d'),
-                            'change_percent': float(d.change_percent) if d.change_percent is not None else 0,
-                            'close': float(d.close) if d.close is not None else None,
-                            'high': float(d.high) if d.high is not None else None,
-                            'open': float(d.open) if d.open is not None else None,
-                            'low': float(d.low) if d.low is not None else None
-                        }
-                        stock_info['recent_data'].append(day_data)
-
-                stock_data.append(stock_info)
-
-            logger.debug(f"Returning {len(stock_data)} records")
-            return jsonify(stock_data)
+        payload, status = get_static_payload(
+            'custom_stock_data', (display_date, yesterday, target_date, ','.join(sorted(local_stock_codes))),
+            lambda: build_custom_stock_data(local_stock_codes, target_date, display_date, yesterday)
+        )
+        if not isinstance(payload, list):
+            return jsonify(payload), status
+
+        stock_data = overlay_realtime(payload, get_realtime_data())
+        logger.debug(f"Returning {len(stock_data)} records")
+        return jsonify(stock_data)
 
     except Exception as e:
         logger.error(f"Unexpected error for stock codes {stock_codes}: {str(e)}")
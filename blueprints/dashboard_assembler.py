@@ -0,0 +1,106 @@
+# blueprints/dashboard_assembler.py
+# 看板响应的列式组装：人气、成交额、涨停、日线在一次向量化流程中拼接，
+# 各个蓝图只需声明自己的列集合
+from collections import namedtuple
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# source: base / popularity / turnover / limitup / yesterday 等 frames 中的键
+# kind:   raw 原样输出，float 转浮点，date 格式化为 YYYY-MM-DD
+Column = namedtuple('Column', ['name', 'source', 'field', 'kind', 'default'])
+
+
+def column(name, source='base', field=None, kind='raw', default=None):
+    return Column(name, source, field or name, kind, default)
+
+
+RECENT_DATA_FIELDS = ['trading_Date', 'change_percent', 'close', 'high', 'open', 'low']
+DAILY_FIELDS = ['StockCode', 'trading_Date', 'open', 'high', 'low', 'close', 'change_percent']
+
+
+def frame_from_rows(rows, columns):
+    """把查询结果（ORM 对象或按 columns 顺序的元组）转成 DataFrame"""
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    first = rows[0]
+    if isinstance(first, tuple):
+        return pd.DataFrame.from_records(rows, columns=columns)
+    return pd.DataFrame.from_records([tuple(getattr(r, c) for c in columns) for r in rows], columns=columns)
+
+
+def _to_list(series, default):
+    values = series.to_numpy(dtype=object, copy=True)
+    mask = pd.isna(series).to_numpy()
+    if mask.any():
+        values[mask] = default
+    return values.tolist()
+
+
+def _convert(series, kind):
+    if kind == 'float':
+        return pd.to_numeric(series, errors='coerce')
+    if kind == 'date':
+        return pd.to_datetime(series, errors='coerce').dt.strftime('%Y-%m-%d')
+    return series
+
+
+def recent_data_lists(daily_frame, stock_codes, days):
+    """按股票聚合最近 days 个交易日的 K 线，返回与 stock_codes 对齐的列表"""
+    recent = {}
+    if daily_frame is not None and not daily_frame.empty:
+        daily = daily_frame.assign(_date=pd.to_datetime(daily_frame['trading_Date'], errors='coerce'))
+        daily = daily.sort_values(['StockCode', '_date'], ascending=[True, False])
+        daily = daily.groupby('StockCode', sort=False).head(days)
+        columns = [
+            _to_list(daily['_date'].dt.strftime('%Y-%m-%d'), None),
+            _to_list(pd.to_numeric(daily['change_percent'], errors='coerce').fillna(0), 0),
+        ]
+        for field in ('close', 'high', 'open', 'low'):
+            columns.append(_to_list(pd.to_numeric(daily[field], errors='coerce'), None))
+        for code, values in zip(daily['StockCode'].tolist(), zip(*columns)):
+            recent.setdefault(code, []).append(dict(zip(RECENT_DATA_FIELDS, values)))
+    return [recent.get(code, []) for code in stock_codes]
+
+
+def assemble_dashboard(base, frames, columns, daily_frame=None, recent_days=None):
+    """
+    以 base 的行顺序为准，按列声明从各个 frame 中取值并组装响应。
+
+    :param base: 看板主表 DataFrame，必须包含 StockCode 列
+    :param frames: {source: DataFrame}，每个 DataFrame 含 StockCode 列或以 StockCode 为索引
+    :param columns: Column 列表，决定输出字段及顺序
+    :param daily_frame: 日线 DataFrame（DAILY_FIELDS），非空时输出 recent_data
+    :param recent_days: recent_data 保留的交易日数量
+    :return: list[dict]，可直接 jsonify
+    """
+    codes = base['StockCode']
+    lookups = {}
+    for source, frame in frames.items():
+        if frame is None:
+            continue
+        if 'StockCode' in frame.columns:
+            frame = frame.drop_duplicates('StockCode', keep='last').set_index('StockCode')
+        lookups[source] = frame
+
+    names = []
+    values = []
+    for col in columns:
+        if col.source == 'base':
+            series = base[col.field] if col.field in base.columns else pd.Series([None] * len(base), index=base.index)
+        else:
+            frame = lookups.get(col.source)
+            if frame is None or col.field not in frame.columns:
+                series = pd.Series([None] * len(base), index=base.index, dtype=object)
+            else:
+                # 按 object 映射，避免缺失值把整数列提升为浮点
+                series = codes.map(frame[col.field].astype(object))
+        names.append(col.name)
+        values.append(_to_list(_convert(series, col.kind), col.default))
+
+    if recent_days:
+        names.append('recent_data')
+        values.append(recent_data_lists(daily_frame, codes.tolist(), recent_days))
+
+    return [dict(zip(names, row)) for row in zip(*values)]
@@ -0,0 +1,92 @@
+# blueprints/dashboard_cache.py
+# 看板响应拆分为“历史静态部分 + 实时行情叠加”：
+# 静态部分（排名、涨停信息、近期 K 线）按 (endpoint, 日期, 过滤条件, 盘后数据版本) 长时间缓存，
+# RealtimePrice / RealtimeChange 在返回前从行情存储中叠加，缓存命中也不会返回过期价格
+from app_init import app, db, config, DailyStockData, StockPopularityRanking, MaStrategies, LimitUpUnfilledOrdersStocks
+from blueprints.response_cache import response_cache
+from sqlalchemy import select, func
+import logging
+import time
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+_cache_config = config.get('cache', {})
+STATIC_TIMEOUT = _cache_config.get('dashboard_static_timeout', 4 * 3600)
+STATIC_STALE_TTL = _cache_config.get('dashboard_static_stale_ttl', 600)
+EOD_CHECK_INTERVAL = _cache_config.get('eod_check_interval', 60)
+
+REALTIME_FIELDS = ('RealtimeChange', 'RealtimePrice')
+
+
+class EodVersion:
+    """盘后数据版本：各 EOD 表的最新日期组合，新数据落库后版本变化，静态缓存随之失效"""
+
+    def __init__(self, check_interval=60):
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0
+        self._lock = gevent.lock.Semaphore()
+
+    def _query(self):
+        statement = select(
+            select(func.max(DailyStockData.trading_Date)).scalar_subquery(),
+            select(func.max(StockPopularityRanking.date)).scalar_subquery(),
+            select(func.max(MaStrategies.trading_Date)).scalar_subquery(),
+            select(func.max(LimitUpUnfilledOrdersStocks.LimitUpDate)).scalar_subquery()
+        )
+        with app.app_context():
+            with db.engine.connect() as conn:
+                row = conn.execute(statement).first()
+        return '|'.join(str(v) for v in row) if row else ''
+
+    def get(self):
+        if self._version is not None and time.time() - self._checked_at < self.check_interval:
+            return self._version
+        with self._lock:
+            if self._version is None or time.time() - self._checked_at >= self.check_interval:
+                try:
+                    version = self._query()
+                    if version != self._version:
+                        logger.info(f"EOD data version changed: {self._version} -> {version}")
+                    self._version = version
+                except Exception as e:
+                    logger.error(f"Error checking EOD data version: {str(e)}")
+                    if self._version is None:
+                        self._version = ''
+                self._checked_at = time.time()
+        return self._version
+
+
+eod_version = EodVersion(EOD_CHECK_INTERVAL)
+
+
+def static_cache_key(endpoint, *parts):
+    return f"dashboard_static:{endpoint}:{eod_version.get()}:" + ':'.join(str(p) for p in parts)
+
+
+def get_static_payload(endpoint, key_parts, builder, timeout=None):
+    """
+    取看板静态部分，未命中时调用 builder() 生成；同一个 key 并发请求时只生成一次。
+
+    :param builder: 返回 (payload, status_code)，payload 为行列表或错误信息字典
+    :return: (payload, status_code)
+    """
+    return response_cache.get_or_compute(
+        static_cache_key(endpoint, *key_parts), builder,
+        timeout=timeout or STATIC_TIMEOUT, stale_ttl=STATIC_STALE_TTL,
+        cacheable=lambda result: result[1] < 500
+    )
+
+
+def overlay_realtime(rows, realtime_data, default=None):
+    """在静态行上叠加实时行情，返回新的行列表，不修改缓存中的对象"""
+    overlaid = []
+    for row in rows:
+        quote = realtime_data.get(row['StockCode'])
+        item = dict(row)
+        for field in REALTIME_FIELDS:
+            value = quote.get(field) if quote else None
+            item[field] = default if value is None else value
+        overlaid.append(item)
+    return overlaid
@@ -0,0 +1,169 @@
+# blueprints/dashboard_snapshot.py
+# 盘后快照：收盘并且 EOD 数据落库后，把各看板某个交易日的静态结果（不含实时行情）写成压缩文件，
+# 浏览历史日期时直接读文件，不再查询 MySQL
+from app_init import app, config
+from blueprints.trading_calendar import trading_calendar
+from blueprints.dashboard_cache import eod_version
+from datetime import datetime, time as dt_time
+import gzip
+import json
+import logging
+import os
+import gevent
+import pytz
+
+logger = logging.getLogger(__name__)
+
+_snapshot_config = config.get('snapshots', {})
+SNAPSHOT_DIR = _snapshot_config.get('directory', 'snapshots')
+SNAPSHOT_BUILD_TIME = dt_time(*[int(x) for x in _snapshot_config.get('build_after', '21:30').split(':')])
+SNAPSHOT_CHECK_INTERVAL = _snapshot_config.get('check_interval', 300)
+SNAPSHOT_BACKFILL_DAYS = _snapshot_config.get('backfill_days', 5)
+
+
+def get_beijing_time():
+    return datetime.now(pytz.timezone('Asia/Shanghai'))
+
+
+def _builders():
+    # 延迟导入，避免与蓝图模块循环依赖
+    from blueprints.stock_data import build_stock_data
+    from blueprints.ma_strategy import build_ma_strategy_data
+    from blueprints.limitup_unfilled_orders import build_limitup_unfilled_orders_data
+    return {
+        'stock_data': lambda target_date, date_str: build_stock_data(target_date, date_str, None),
+        'ma_strategy_data': build_ma_strategy_data,
+        'limitup_unfilled_orders_data': build_limitup_unfilled_orders_data,
+    }
+
+
+SNAPSHOT_ENDPOINTS = ('stock_data', 'ma_strategy_data', 'limitup_unfilled_orders_data')
+
+_built_versions = {}  # (endpoint, date_str) -> 已写入快照的 EOD 版本，避免反复解压文件比对
+
+
+def snapshot_path(endpoint, date_str):
+    return os.path.join(SNAPSHOT_DIR, endpoint, f"{date_str}.json.gz")
+
+
+def read_snapshot_file(endpoint, date_str):
+    path = snapshot_path(endpoint, date_str)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading snapshot {path}: {str(e)}")
+        return None
+
+
+def write_snapshot(endpoint, date_str, payload, status, version):
+    path = snapshot_path(endpoint, date_str)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with app.app_context():
+        # app.json 能处理 Decimal / date 等类型，与 jsonify 的输出保持一致
+        content = app.json.dumps({'version': version, 'status': status, 'payload': payload})
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(content)
+    os.replace(tmp_path, path)  # 原子替换，读者不会读到写了一半的文件
+
+
+def is_persistable(payload, status):
+    # 空结果和 "no data" 提示可能只是 EOD 数据尚未落库，不写成快照
+    return status == 200 and isinstance(payload, list) and len(payload) > 0
+
+
+def load_snapshot(endpoint, date_str, version=None):
+    """历史日期（早于今天）且快照存在、版本与当前 EOD 版本一致时返回 (payload, status)，否则返回 None"""
+    if date_str >= get_beijing_time().strftime('%Y-%m-%d'):
+        return None
+    snapshot = read_snapshot_file(endpoint, date_str)
+    if snapshot is None:
+        return None
+    version = eod_version.get() if version is None else version
+    if snapshot.get('version') != version:
+        # 快照生成后 EOD 数据有修正，交给 builder 重新生成
+        logger.debug(f"Snapshot {endpoint} for {date_str} is stale: {snapshot.get('version')} != {version}")
+        return None
+    return snapshot['payload'], snapshot['status']
+
+
+def snapshot_or_build(endpoint, date_str, builder):
+    version = eod_version.get()
+    snapshot = load_snapshot(endpoint, date_str, version)
+    if snapshot is not None:
+        logger.debug(f"Serving {endpoint} for {date_str} from snapshot")
+        return snapshot
+    payload, status = builder()
+    if date_str < get_beijing_time().strftime('%Y-%m-%d') and is_persistable(payload, status):
+        # 历史日期的快照缺失或过期，用这次的结果按当前版本补写
+        try:
+            write_snapshot(endpoint, date_str, payload, status, version)
+            _built_versions[(endpoint, date_str)] = version
+        except Exception as e:
+            logger.error(f"Error writing {endpoint} snapshot for {date_str}: {str(e)}")
+    return payload, status
+
+
+def build_snapshots(trading_date, force=False, only_missing=False):
+    """为指定交易日生成全部看板快照；快照版本与当前 EOD 版本一致（only_missing 时快照已存在）则跳过"""
+    date_str = trading_date.strftime('%Y-%m-%d')
+    target_date = datetime.strptime(date_str, '%Y-%m-%d')
+    version = eod_version.get()
+    builders = _builders()
+    built = 0
+    for endpoint in SNAPSHOT_ENDPOINTS:
+        if not force:
+            if (endpoint, date_str) not in _built_versions:
+                existing = read_snapshot_file(endpoint, date_str)
+                if existing is not None:
+                    _built_versions[(endpoint, date_str)] = existing.get('version')
+            if (endpoint, date_str) in _built_versions and only_missing:
+                continue
+            if _built_versions.get((endpoint, date_str)) == version:
+                continue
+        try:
+            payload, status = builders[endpoint](target_date, date_str)
+            if not is_persistable(payload, status):
+                logger.debug(f"Skipping {endpoint} snapshot for {date_str}: no data (status {status})")
+                continue
+            write_snapshot(endpoint, date_str, payload, status, version)
+            _built_versions[(endpoint, date_str)] = version
+            built += 1
+            logger.info(f"Built {endpoint} snapshot for {date_str} ({len(payload)} rows)")
+        except Exception as e:
+            logger.error(f"Error building {endpoint} snapshot for {date_str}: {str(e)}", exc_info=True)
+    return built
+
+
+def snapshot_task():
+    logger.info("[global] Starting dashboard snapshot task")
+    # 启动时补齐最近几个交易日缺失的快照
+    try:
+        today = get_beijing_time().date()
+        for trading_date in trading_calendar.recent(today, SNAPSHOT_BACKFILL_DAYS + 1):
+            if trading_date < today:
+                build_snapshots(trading_date, only_missing=True)
+    except Exception as e:
+        logger.error(f"[global] Error backfilling snapshots: {str(e)}", exc_info=True)
+
+    while True:
+        try:
+            now = get_beijing_time()
+            today = now.date()
+            # 收盘数据落库后生成当天快照；前一交易日也再检查一次，兜住延迟到次日才落库的数据
+            for trading_date in trading_calendar.recent(today, 2):
+                if trading_date < today or now.time() >= SNAPSHOT_BUILD_TIME:
+                    build_snapshots(trading_date)
+        except Exception as e:
+            logger.error(f"[global] Error in snapshot task: {str(e)}", exc_info=True)
+        gevent.sleep(SNAPSHOT_CHECK_INTERVAL)
+
+
+if __name__ == '__main__':
+    # 手动生成：python -m blueprints.dashboard_snapshot 2025-01-02 [2025-01-03 ...]
+    import sys
+    for arg in sys.argv[1:]:
+        print(f"{arg}: built {build_snapshots(datetime.strptime(arg, '%Y-%m-%d').date(), force=True)} snapshots")
@@ -0,0 +1,121 @@
+# blueprints/endpoint_health.py
+# 行情接口健康度：按接口记录延迟 EWMA 和错误率，连续失败达到阈值后熔断（跳过该接口），
+# 由后台探测恢复；请求时按健康度从高到低选择接口
+import logging
+import time
+import gevent
+import gevent.event
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class EndpointHealth:
+    __slots__ = ('name', 'latency', 'error_rate', 'consecutive_failures', 'state',
+                 'opened_at', 'last_probe_at', 'successes', 'failures')
+
+    def __init__(self, name, initial_latency=0.5):
+        self.name = name
+        self.latency = initial_latency      # 成功请求耗时的 EWMA（秒）
+        self.error_rate = 0.0               # 失败率的 EWMA
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0
+        self.last_probe_at = 0
+        self.successes = 0
+        self.failures = 0
+
+    def score(self):
+        # 越小越健康：平均耗时按错误率放大，失败一次相当于多等一个超时
+        return self.latency * (1 + 4 * self.error_rate)
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'latency': round(self.latency, 3),
+            'error_rate': round(self.error_rate, 3),
+            'consecutive_failures': self.consecutive_failures,
+            'successes': self.successes,
+            'failures': self.failures,
+        }
+
+
+class EndpointRegistry:
+    def __init__(self, names, alpha=0.3, failure_threshold=3, probe_interval=15):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.endpoints = {name: EndpointHealth(name) for name in names}
+        self._lock = gevent.lock.Semaphore()
+        self._stopped = gevent.event.Event()
+
+    def record_success(self, name, latency):
+        with self._lock:
+            health = self.endpoints[name]
+            health.latency += self.alpha * (latency - health.latency)
+            health.error_rate *= (1 - self.alpha)
+            health.consecutive_failures = 0
+            health.successes += 1
+            if health.state == OPEN:
+                health.state = CLOSED
+                logger.info(f"Endpoint {name} recovered after {time.time() - health.opened_at:.0f} seconds")
+
+    def record_failure(self, name):
+        with self._lock:
+            health = self.endpoints[name]
+            health.error_rate += self.alpha * (1 - health.error_rate)
+            health.consecutive_failures += 1
+            health.failures += 1
+            if health.state == CLOSED and health.consecutive_failures >= self.failure_threshold:
+                health.state = OPEN
+                health.opened_at = time.time()
+                health.last_probe_at = health.opened_at
+                logger.warning(f"Endpoint {name} circuit opened after {health.consecutive_failures} consecutive failures")
+
+    def available(self, name):
+        return self.endpoints[name].state == CLOSED
+
+    def ordered(self, names):
+        """可用接口按健康度排序；全部熔断时返回得分最好的一个兜底，保证每次请求最多等一个超时"""
+        with self._lock:
+            candidates = [self.endpoints[name] for name in names]
+            closed = sorted((h for h in candidates if h.state == CLOSED), key=lambda h: h.score())
+            if closed:
+                return [h.name for h in closed]
+            return [min(candidates, key=lambda h: h.score()).name] if candidates else []
+
+    def due_for_probe(self):
+        now = time.time()
+        with self._lock:
+            due = [h.name for h in self.endpoints.values()
+                   if h.state == OPEN and now - h.last_probe_at >= self.probe_interval]
+            for name in due:
+                self.endpoints[name].last_probe_at = now
+        return due
+
+    def probe_task(self, probe):
+        """
+        后台探测熔断中的接口。
+
+        :param probe: probe(name) 发起一次探测请求，由调用方负责 record_success / record_failure
+        """
+        logger.info("[global] Starting endpoint probe task")
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            for name in self.due_for_probe():
+                try:
+                    probe(name)
+                except Exception as e:
+                    logger.debug(f"Probe of endpoint {name} failed: {str(e)}")
+            self._stopped.wait(timeout=max(1, self.probe_interval / 3))
+        logger.info("[global] Endpoint probe task stopped")
+
+    def stop(self):
+        self._stopped.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: health.to_dict() for name, health in self.endpoints.items()}
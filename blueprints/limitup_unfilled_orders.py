@@ -2,6 +2,9 @@
 from flask import Blueprint, jsonify, request
 from app_init import app, db, cache, socketio, LimitUpUnfilledOrdersStocks, StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData, TradingDay, LimitUpStreakStocks
 from blueprints.common import get_nearest_trading_date, get_recent_trading_dates, merge_stock_data
+from blueprints.dashboard_assembler import column, assemble_dashboard, frame_from_rows
+from blueprints.dashboard_cache import get_static_payload, overlay_realtime
+from blueprints.dashboard_snapshot import snapshot_or_build
 from blueprints.stock_pool_manager import update_stocks_pool, get_realtime_data
 from datetime import datetime, timedelta
 import pytz
@@ -12,6 +15,24 @@ logger = logging.getLogger(__name__)
 
 limitup_unfilled_orders_bp = Blueprint('limitup_unfilled_orders', __name__)
 
+LIMITUP_BASE_FIELDS = ['StockCode', 'StockName', 'OpeningAmount', 'LimitUpOrderAmount',
+                       'FirstLimitUpTime', 'FinalLimitUpTime', 'LimitUpOpenTimes']
+
+LIMITUP_UNFILLED_ORDERS_COLUMNS = [
+    column('StockCode'),
+    column('StockName'),
+    column('StreakDays'),
+    column('OpeningAmount', kind='float'),
+    column('LimitUpOrderAmount', kind='float'),
+    column('FirstLimitUpTime'),
+    column('FinalLimitUpTime'),
+    column('LimitUpOpenTimes'),
+    column('PopularityRank', 'popularity'),
+    column('TurnoverAmount', 'turnover'),
+    column('TurnoverRank', 'turnover'),
+    column('ReasonCategory', 'limitup'),
+]
+
 limitup_stock_codes = set()
 limitup_stock_codes_lock = gevent.lock.Semaphore()
 
@@ -58,8 +79,50 @@ def get_latest_limitup_stocks():
     return local_stock_codes 
 
 
+def build_limitup_unfilled_orders_data(target_date, date_str):
+    """生成 limitup_unfilled_orders_data 的静态部分（不含实时行情），返回 (payload, status_code)"""
+    with app.app_context():
+        nearest_trading_date = get_nearest_trading_date(target_date, TradingDay)
+        app.logger.debug(f"Nearest trading date: {nearest_trading_date}")
+        if not nearest_trading_date:
+            app.logger.info(f"No trading day found before the specified date: {date_str}")
+
+        recent_trading_dates = get_recent_trading_dates(target_date, 5, TradingDay) if nearest_trading_date else []
+        app.logger.debug(f"Recent trading dates: {recent_trading_dates}")
+
+        limitup_data = db.session.query(LimitUpUnfilledOrdersStocks).filter_by(LimitUpDate=target_date).all()
+        app.logger.debug(f"Limit up data count: {len(limitup_data)}")
+        if not limitup_data:
+            app.logger.info(f"No limit up unfilled orders data found for date: {date_str}")
+            return [], 200
+
+        stock_codes = [l.StockCode for l in limitup_data]
+        app.logger.debug(f" limitup_data Stock codes: {stock_codes}")
+
+        streak_data = db.session.query(LimitUpStreakStocks.StockCode, LimitUpStreakStocks.StreakDays).filter(
+            LimitUpStreakStocks.LimitUpDate == target_date,
+            LimitUpStreakStocks.StockCode.in_(stock_codes)
+        ).all()
+        streak_dict = {s.StockCode: s.StreakDays for s in streak_data}
+        app.logger.debug(f"Streak data: {streak_dict}")
+
+        merged = merge_stock_data(
+            None, stock_codes, nearest_trading_date, recent_trading_dates,
+            (StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData)
+        ) if nearest_trading_date else (None, None, None, None)
+        pop_frame, turnover_frame, limitup_frame, daily_frame = merged
+        app.logger.debug(f"Merged data - Pop/Turnover/LimitUp/Daily: {[len(f) if f is not None else 0 for f in merged]}")
+
+        base = frame_from_rows(limitup_data, LIMITUP_BASE_FIELDS)
+        base['StreakDays'] = base['StockCode'].map(streak_dict)
+        stock_data = assemble_dashboard(
+            base, {'popularity': pop_frame, 'turnover': turnover_frame, 'limitup': limitup_frame},
+            LIMITUP_UNFILLED_ORDERS_COLUMNS, daily_frame, recent_days=5
+        )
+        return stock_data, 200
+
+
 @limitup_unfilled_orders_bp.route('/limitup_unfilled_orders_data', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
 def get_limitup_unfilled_orders_data():
     date_str = request.args.get('date')
     
@@ -67,112 +130,29 @@ def get_limitup_unfilled_orders_data():
         app.logger.error("Date parameter is missing")
         return jsonify({'error': 'Date parameter is required'}), 400
 
-   
     try:
         target_date = datetime.strptime(date_str, '%Y-%m-%d')
         app.logger.debug(f"Processing request for date: {date_str}")
-        
-        with app.app_context():
-            nearest_trading_date = get_nearest_trading_date(target_date, TradingDay)
-            app.logger.debug(f"Nearest trading date: {nearest_trading_date}")
-            if not nearest_trading_date:
-                app.logger.info(f"No trading day found before the specified date: {date_str}")
-
-            recent_trading_dates = get_recent_trading_dates(target_date, 5, TradingDay) if nearest_trading_date else []
-            app.logger.debug(f"Recent trading dates: {recent_trading_dates}")
-
-            limitup_data = db.session.query(LimitUpUnfilledOrdersStocks).filter_by(LimitUpDate=target_date).all()
-            app.logger.debug(f"Limit up data count: {len(limitup_data)}")
-            if not limitup_data:
-                app.logger.info(f"No limit up unfilled orders data found for date: {date_str}")
-                return jsonify([]), 200
-                
-            stock_codes = [l.StockCode for l in limitup_data]
-            app.logger.debug(f" limitup_data Stock codes: {stock_codes}")
-
-            streak_data = db.session.query(LimitUpStreakStocks).filter(
-                LimitUpStreakStocks.LimitUpDate == target_date,
-                LimitUpStreakStocks.StockCode.in_(stock_codes)
-            ).all()
-            streak_dict = {s.StockCode: s.StreakDays for s in streak_data}
-            app.logger.debug(f"Streak data: {streak_dict}")
-
-            with limitup_stock_codes_lock:
-                limitup_stock_codes.update(stock_codes)
-                app.logger.debug(f"Updated limitup_stock_codes: {limitup_stock_codes}")
-
-            update_stocks_pool(limitup_stock_codes, caller='limitup_unfilled_orders')
-
-            pop_dict, turnover_dict, limitup_dict, daily_dict = merge_stock_data(
-                None, stock_codes, nearest_trading_date, recent_trading_dates,
-                (StockPopularityRanking, StockTurnoverRanking, DailyLimitUpStocks, DailyStockData)
-            ) if nearest_trading_date else ({}, {}, {}, {})
-            app.logger.debug(f"Merged data - Pop: {len(pop_dict)}, Turnover: {len(turnover_dict)}, LimitUp: {len(limitup_dict)}, Daily: {len(daily_dict)}")
-
-            realtime_data_copy = get_realtime_data()  #get_realtime_data('limitup_realtime')
-            app.logger.debug(f"Realtime data: {realtime_data_copy}")
-
-            stock_data = []
-
-            for limitup in limitup_data:
-                stock_info = {
-                    'StockCode': limitup.StockCode,
-                    'StockName': limitup.StockName,
-                    'StreakDays': streak_dict.get(limitup.StockCode, None),
-                    'OpeningAmount': float(limitup.OpeningAmount) if limitup.OpeningAmount is not None else None,
-                    'LimitUpOrderAmount': float(limitup.LimitUpOrderAmount) if limitup.LimitUpOrderAmount is not None else None,
-                    'FirstLimitUpTime': limitup.FirstLimitUpTime,
-                    'FinalLimitUpTime': limitup.FinalLimitUpTime,
-                    'LimitUpOpenTimes': limitup.LimitUpOpenTimes,
-                    'PopularityRank': None,
-                    'TurnoverAmount': None,
-                    'TurnoverRank': None,
-                    'ReasonCategory': None,
-                    'RealtimeChange': None,
-                    'RealtimePrice': None,
-                    'recent_data': []
-                }
-
-                if limitup.StockCode in pop_dict:
-                    p = pop_dict[limitup.StockCode]
-                    stock_info['PopularityRank'] = p.PopularityRank
-
-                if limitup.StockCode in turnover_dict:
-                    t = turnover_dict[limitup.StockCode]
-                    stock_info['TurnoverAmount'] = t.TurnoverAmount
-                    stock_info['TurnoverRank'] = t.TurnoverRank
-
-                if limitup.StockCode in limitup_dict:
-                    l = limitup_dict[limitup.StockCode]
-                    stock_info['ReasonCategory'] = l.ReasonCategory
-
-                if limitup.StockCode in realtime_data_copy:
-                    r = realtime_data_copy[limitup.StockCode]
-                    stock_info['RealtimeChange'] = r['RealtimeChange']
-                    stock_info['RealtimePrice'] = r['RealtimePrice']
-
-                if limitup.StockCode in daily_dict:
-                    daily_records = sorted(
-                        daily_dict[limitup.StockCode],
-                        key=lambda x: x.trading_Date,
-                        reverse=True
-                    )
-                    for d in daily_records[:5]:
-                        day_data = {
-                            'trading_Date': d.trading_Date.strftime('%Y-%m-%d'),
-                            'change_percent': float(d.change_percent) if d.change_percent is not None else 0,
-                            'close': float(d.close) if d.close is not None else None,
-                            'high': float(d.high) if d.high is not None else None,
-                            'open': float(d.open) if d.open is not None else None,
-                            'low': float(d.low) if d.low is not None else None
-                        }
-                        stock_info['recent_data'].append(day_data)
-
-                stock_data.append(stock_info)
-
-            app.logger.debug(f"Returning {len(stock_data)} records")
-
-            return jsonify(stock_data)
+
+        payload, status = get_static_payload(
+            'limitup_unfilled_orders_data', (date_str,),
+            lambda: snapshot_or_build('limitup_unfilled_orders_data', date_str, lambda: build_limitup_unfilled_orders_data(target_date, date_str))
+        )
+        if not isinstance(payload, list) or not payload:
+            return jsonify(payload), status
+
+        stock_codes = [row['StockCode'] for row in payload]
+        with limitup_stock_codes_lock:
+            limitup_stock_codes.update(stock_codes)
+            app.logger.debug(f"Updated limitup_stock_codes: {limitup_stock_codes}")
+
+        update_stocks_pool(limitup_stock_codes, caller='limitup_unfilled_orders')
+
+        stock_data = overlay_realtime(payload, get_realtime_data())  #get_realtime_data('limitup_realtime')
+
+        app.logger.debug(f"Returning {len(stock_data)} records")
+
+        return jsonify(stock_data)
 
     except ValueError:
         app.logger.error(f"Invalid date format: {date_str}")
@@ -180,4 +160,3 @@ def get_limitup_unfilled_orders_data():
     except Exception as e:
         app.logger.error(f"Unexpected error: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
-
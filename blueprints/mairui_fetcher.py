@@ -0,0 +1,165 @@
+# blueprints/mairui_fetcher.py
+# mairui 行情抓取：令牌桶控制请求速率，gevent 协程池让多个批次同时在途，
+# 复用带连接池的 requests.Session（keep-alive + gzip），吞吐接近接口允许的上限；
+# 按接口健康度选择 URL，熔断中的接口直接跳过
+from blueprints.endpoint_health import EndpointRegistry
+from requests.adapters import HTTPAdapter
+import logging
+import time
+import gevent
+import gevent.lock
+import requests
+from gevent.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个，acquire 在令牌不足时让出协程等待"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = gevent.lock.Semaphore()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens=1):
+        # 锁内排队，先到先得；等待期间持锁，后来者不会插队抢走补充的令牌
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                gevent.sleep((tokens - self._tokens) / self.rate)
+
+
+class MairuiFetcher:
+    def __init__(self, source_config):
+        self.main_url = source_config['main_url']
+        self.backup_url = source_config['backup_url']
+        self.licence = source_config['licence']
+        self.batch_size = source_config.get('batch_size', 20)
+        self.timeout = source_config.get('timeout', 5)
+        self.concurrency = source_config.get('max_concurrency', 4)
+        # rate_limit 原本是两次请求之间的间隔（秒），换算为每秒请求数
+        rate = 1.0 / source_config['rate_limit'] if source_config['rate_limit'] > 0 else 100.0
+        # burst 与并发数无关，默认 1：任何时刻都不超过 rate_limit 对应的请求频率
+        self.bucket = TokenBucket(rate, source_config.get('burst', 1))
+        self.session = self._create_session()
+        self.stats = {'requests': 0, 'errors': 0, 'batch_fallbacks': 0, 'skipped_batches': 0}
+        # batch 与 backup 使用同一个 URL 模板，但接口路径不同，分别记录健康度
+        self.url_templates = {'main': self.main_url, 'backup': self.backup_url, 'batch': self.backup_url}
+        self.probe_code = source_config.get('probe_code', '000001')
+        self.health = EndpointRegistry(
+            self.url_templates.keys(),
+            failure_threshold=source_config.get('circuit_failure_threshold', 3),
+            probe_interval=source_config.get('circuit_probe_interval', 15)
+        )
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.concurrency * 2, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        return session
+
+    def _url(self, endpoint, codes):
+        if endpoint == 'batch':
+            return self.url_templates[endpoint].format(licence=self.licence) + f"?stock_codes={','.join(codes)}"
+        return self.url_templates[endpoint].format(code=codes[0], licence=self.licence)
+
+    def _get_json(self, endpoint, url):
+        # 批量接口返回非列表（如额度用尽时的错误信息）同样计为失败
+        self.bucket.acquire()
+        self.stats['requests'] += 1
+        start_time = time.time()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            if endpoint == 'batch' and not isinstance(data, list):
+                raise ValueError(f"invalid batch response: {data}")
+        except (requests.RequestException, ValueError):
+            self.stats['errors'] += 1
+            self.health.record_failure(endpoint)
+            raise
+        self.health.record_success(endpoint, time.time() - start_time)
+        return data
+
+    def _fetch_single(self, code, caller):
+        # 每只股票都重新排序，批次中途熔断的接口不会再被后续股票尝试
+        for endpoint in self.health.ordered(('main', 'backup')):
+            url = self._url(endpoint, [code])
+            try:
+                return self._get_json(endpoint, url)
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"[{caller}] Mairui single request failed for {code} with {url}: {str(e)}")
+        logger.error(f"[{caller}] Failed to fetch {code} from mairui after trying all URLs")
+        return None
+
+    def _fetch_batch(self, batch, caller):
+        """返回 {code: 原始行情 dict}；批量接口失败或熔断时逐只回退到单股票接口"""
+        if not self.health.available('batch'):
+            self.stats['skipped_batches'] += 1
+            return self._fetch_codes_singly(batch, caller)
+        results = {}
+        url = self._url('batch', batch)
+        try:
+            data_list = self._get_json('batch', url)
+            wanted = set(batch)
+            for data in data_list:
+                code = data.get('dm', '') if isinstance(data, dict) else ''
+                if code in wanted:
+                    results[code] = data
+            return results
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"[{caller}] Mairui batch request failed for {batch} with {url}: {str(e)}")
+
+        self.stats['batch_fallbacks'] += 1
+        logger.info(f"[{caller}] Falling back to single stock query for {batch}")
+        return self._fetch_codes_singly(batch, caller)
+
+    def _fetch_codes_singly(self, batch, caller):
+        results = {}
+        for code in batch:
+            data = self._fetch_single(code, caller)
+            if data is not None:
+                results[code] = data
+        return results
+
+    def fetch(self, stock_codes, caller='global'):
+        """
+        并发抓取多只股票的行情。
+
+        :return: {code: 原始行情 dict}，抓取失败的股票不在结果中
+        """
+        start_time = time.time()
+        batches = [stock_codes[i:i + self.batch_size] for i in range(0, len(stock_codes), self.batch_size)]
+        results = {}
+        pool = Pool(self.concurrency)
+        for batch_results in pool.imap_unordered(lambda batch: self._fetch_batch(batch, caller), batches):
+            results.update(batch_results)
+        logger.debug(f"[{caller}] Mairui fetched {len(results)}/{len(stock_codes)} stocks in {len(batches)} batches, "
+                     f"{time.time() - start_time:.2f} seconds")
+        return results
+
+    def probe(self, endpoint):
+        url = self._url(endpoint, [self.probe_code])
+        try:
+            self._get_json(endpoint, url)
+        finally:
+            logger.info(f"Probe of mairui {endpoint} endpoint finished, state: {self.health.endpoints[endpoint].state}")
+
+    def probe_task(self):
+        self.health.probe_task(self.probe)
+
+    def stop(self):
+        self.health.stop()
@@ -0,0 +1,72 @@
+# blueprints/market_session.py
+# A 股交易时段（北京时间 + 交易日历）：集合竞价、连续竞价、午休、收盘集合竞价，
+# 不再依赖服务器本地时区，节假日按交易日历判断
+from blueprints.trading_calendar import trading_calendar
+from datetime import datetime, time as dt_time, timedelta
+import pytz
+
+TZ = pytz.timezone('Asia/Shanghai')
+
+CLOSED = 'closed'
+CALL_AUCTION = 'call_auction'           # 09:15-09:25 开盘集合竞价
+PRE_OPEN = 'pre_open'                   # 09:25-09:30 撮合完成，等待开盘
+CONTINUOUS = 'continuous'               # 09:30-11:30, 13:00-14:57 连续竞价
+LUNCH_BREAK = 'lunch_break'             # 11:30-13:00
+CLOSING_AUCTION = 'closing_auction'     # 14:57-15:00 收盘集合竞价
+
+# (开始, 结束, 阶段)，左闭右开
+SESSION_PHASES = (
+    (dt_time(9, 15), dt_time(9, 25), CALL_AUCTION),
+    (dt_time(9, 25), dt_time(9, 30), PRE_OPEN),
+    (dt_time(9, 30), dt_time(11, 30), CONTINUOUS),
+    (dt_time(11, 30), dt_time(13, 0), LUNCH_BREAK),
+    (dt_time(13, 0), dt_time(14, 57), CONTINUOUS),
+    (dt_time(14, 57), dt_time(15, 0), CLOSING_AUCTION),
+)
+
+# 行情会变化、需要按分层频率刷新的阶段
+ACTIVE_PHASES = (CALL_AUCTION, CONTINUOUS, CLOSING_AUCTION)
+# 每个活跃阶段的开始时间（09:15、09:30、13:00、14:57），由 SESSION_PHASES 推导，两者不会不一致
+ACTIVE_STARTS = tuple(start for start, _, name in SESSION_PHASES if name in ACTIVE_PHASES)
+
+
+def beijing_now():
+    return datetime.now(TZ)
+
+
+def phase(now=None):
+    now = now or beijing_now()
+    if not trading_calendar.is_trading_day(now.date()):
+        return CLOSED
+    current = now.time()
+    for start, end, name in SESSION_PHASES:
+        if start <= current < end:
+            return name
+    return CLOSED
+
+
+def is_active(now=None):
+    return phase(now) in ACTIVE_PHASES
+
+
+def next_active_start(now=None):
+    """下一次进入活跃阶段的时间（当前已处于活跃阶段时返回 now）"""
+    now = now or beijing_now()
+    if is_active(now):
+        return now
+    day = now.date()
+    if trading_calendar.is_trading_day(day):
+        for start in ACTIVE_STARTS:
+            candidate = TZ.localize(datetime.combine(day, start))
+            if candidate > now:
+                return candidate
+    next_day = trading_calendar.next_date(day)
+    if next_day is None:
+        # 日历尚未包含下一个交易日，保守地在次日开盘前再检查
+        next_day = day + timedelta(days=1)
+    return TZ.localize(datetime.combine(next_day, ACTIVE_STARTS[0]))
+
+
+def seconds_until_active(now=None):
+    now = now or beijing_now()
+    return max(0.0, (next_active_start(now) - now).total_seconds())
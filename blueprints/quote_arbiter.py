@@ -0,0 +1,115 @@
+# blueprints/quote_arbiter.py
+# 多数据源调度：按成本从低到高把股票分配给健康且仍有配额的数据源，
+# 某个数据源没有返回的股票在同一轮内转给下一个数据源；成功率持续偏低的数据源暂停一段时间
+from collections import deque
+import logging
+import time
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+
+class SourceState:
+    def __init__(self, name, cost, quota_per_minute):
+        self.name = name
+        self.cost = cost
+        self.quota_per_minute = quota_per_minute    # 每分钟可刷新的股票数
+        self.usage = deque()                        # (时间, 股票数)，最近 60 秒
+        self.success_rate = 1.0                     # 返回率的 EWMA
+        self.degraded_until = 0
+        self.requested = 0
+        self.received = 0
+
+    def used(self, now):
+        while self.usage and now - self.usage[0][0] >= 60:
+            self.usage.popleft()
+        return sum(n for _, n in self.usage)
+
+    def remaining(self, now):
+        return max(0, self.quota_per_minute - self.used(now))
+
+    def to_dict(self, now):
+        return {
+            'cost': self.cost,
+            'quota_per_minute': self.quota_per_minute,
+            'used': self.used(now),
+            'success_rate': round(self.success_rate, 3),
+            'degraded': now < self.degraded_until,
+            'requested': self.requested,
+            'received': self.received,
+        }
+
+
+class QuoteArbiter:
+    def __init__(self, sources, alpha=0.3, degrade_threshold=0.5, degrade_cooldown=120, health_checks=None):
+        """
+        :param sources: [(name, cost, quota_per_minute), ...]
+        :param health_checks: 可选，{name: callable}，返回 False 时该数据源视为不可用（如接口全部熔断）
+        """
+        self.sources = {name: SourceState(name, cost, quota) for name, cost, quota in sources}
+        self.alpha = alpha
+        self.degrade_threshold = degrade_threshold
+        self.degrade_cooldown = degrade_cooldown
+        self.health_checks = health_checks or {}
+        self._lock = gevent.lock.Semaphore()
+
+    def healthy(self, name, now=None):
+        now = time.time() if now is None else now
+        state = self.sources[name]
+        if now < state.degraded_until:
+            return False
+        check = self.health_checks.get(name)
+        if check is not None:
+            try:
+                return bool(check())
+            except Exception:
+                return False
+        return True
+
+    def ranked(self, exclude=()):
+        now = time.time()
+        return [state.name for state in sorted(self.sources.values(), key=lambda s: s.cost)
+                if state.name not in exclude and self.healthy(state.name, now)]
+
+    def assign(self, codes, exclude=()):
+        """
+        按成本分配股票，并预占配额。
+
+        :return: ({source: [code, ...]}, 本轮配额不足未分配的股票)
+        """
+        now = time.time()
+        remaining_codes = list(codes)
+        assignment = {}
+        with self._lock:
+            for name in self.ranked(exclude):
+                if not remaining_codes:
+                    break
+                state = self.sources[name]
+                take = min(len(remaining_codes), state.remaining(now))
+                if take <= 0:
+                    continue
+                assignment[name] = remaining_codes[:take]
+                remaining_codes = remaining_codes[take:]
+                state.usage.append((now, take))
+        return assignment, remaining_codes
+
+    def report(self, name, requested, received):
+        """记录一次抓取结果；返回率低于阈值时暂停该数据源，冷却结束后从阈值重新计算"""
+        if requested <= 0:
+            return
+        with self._lock:
+            state = self.sources[name]
+            state.requested += requested
+            state.received += received
+            state.success_rate += self.alpha * (received / requested - state.success_rate)
+            now = time.time()
+            if state.success_rate < self.degrade_threshold and now >= state.degraded_until:
+                state.degraded_until = now + self.degrade_cooldown
+                state.success_rate = self.degrade_threshold
+                logger.warning(f"Quote source {name} degraded ({received}/{requested} returned), "
+                               f"re-routing its codes for {self.degrade_cooldown} seconds")
+
+    def info(self):
+        now = time.time()
+        with self._lock:
+            return {name: state.to_dict(now) for name, state in self.sources.items()}
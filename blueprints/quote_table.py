@@ -0,0 +1,209 @@
+# blueprints/quote_table.py
+# 实时行情表：股票代码映射到行号，价格、涨跌幅、昨收、更新时间、来源分别存放在定长 NumPy 数组中。
+# 读者拿到的快照引用数组和索引，不加锁；数组被快照引用后，下一批写入先复制一份再改（写时复制），
+# 已发布的快照不会再变化，看板请求也不会再因为复制整个 realtime_data 字典而阻塞更新任务
+from collections.abc import Mapping
+import time
+import numpy as np
+
+QUOTE_SOURCES = ('', 'mairui', 'tushare', 'selenium')
+_SOURCE_IDS = {name: i for i, name in enumerate(QUOTE_SOURCES)}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _from_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+class QuoteSnapshot(Mapping):
+    """
+    某一版本的只读视图，按 Mapping 访问：snapshot[code] -> {'RealtimePrice', 'RealtimeChange', ...}。
+    引用的数组和索引此后不再被修改，持有期间看到的始终是同一版本。
+    """
+    __slots__ = ('version', '_index', '_codes', '_arrays')
+
+    def __init__(self, version, index, codes, arrays):
+        self.version = version
+        self._index = index
+        self._codes = codes
+        self._arrays = arrays
+
+    def _row(self, code):
+        row = self._index.get(code)
+        if row is None or self._codes[row] != code or not self._arrays['valid'][row]:
+            return None
+        return row
+
+    def __getitem__(self, code):
+        row = self._row(code)
+        if row is None:
+            raise KeyError(code)
+        arrays = self._arrays
+        return {
+            'RealtimePrice': _from_float(arrays['price'][row]),
+            'RealtimeChange': _from_float(arrays['change'][row]),
+            'PrevClose': _from_float(arrays['prev_close'][row]),
+            'last_updated': float(arrays['updated_at'][row]),
+            'source': QUOTE_SOURCES[arrays['source'][row]],
+        }
+
+    def __contains__(self, code):
+        return self._row(code) is not None
+
+    def __iter__(self):
+        return (code for code in list(self._index) if self._row(code) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def updated_at(self, code):
+        row = self._row(code)
+        return 0 if row is None else float(self._arrays['updated_at'][row])
+
+
+class QuoteTable:
+    def __init__(self, capacity=1024):
+        self.version = 0
+        self._index = {}            # code -> 行号；增删股票时整体替换，快照持有的旧索引不受影响
+        self._free_rows = []
+        self._size = 0
+        self._snapshot = None       # 最近发布的快照；非 None 时当前数组被其引用，写入前需要复制
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        arrays = {
+            'price': np.full(capacity, np.nan),
+            'change': np.full(capacity, np.nan),
+            'prev_close': np.full(capacity, np.nan),
+            'updated_at': np.zeros(capacity),
+            'source': np.zeros(capacity, dtype=np.int8),
+            'valid': np.zeros(capacity, dtype=bool),
+        }
+        codes = np.empty(capacity, dtype=object)
+        if getattr(self, '_arrays', None) is not None:
+            # 扩容时复制到新数组，旧快照继续引用旧数组
+            n = len(self._codes)
+            for field, array in arrays.items():
+                array[:n] = self._arrays[field]
+            codes[:n] = self._codes
+        self._arrays = arrays
+        self._codes = codes
+        self.capacity = capacity
+
+    def _writable(self):
+        # 写时复制：当前数组已被快照引用时，先换成副本再写，已发布的快照保持不变
+        if self._snapshot is not None:
+            self._arrays = {field: array.copy() for field, array in self._arrays.items()}
+            self._codes = self._codes.copy()
+            self._snapshot = None
+
+    def _assign_rows(self, codes):
+        new_codes = [code for code in dict.fromkeys(codes) if code not in self._index]
+        if not new_codes:
+            return
+        needed = len(new_codes) - len(self._free_rows)
+        if self._size + needed > self.capacity:
+            capacity = self.capacity
+            while self._size + needed > capacity:
+                capacity *= 2
+            self._allocate(capacity)
+        index = dict(self._index)
+        for code in new_codes:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = self._size
+                self._size += 1
+            index[code] = row
+            self._codes[row] = code
+        self._index = index
+
+    def update(self, quotes, source='', updated_at=None):
+        """
+        写入一批行情。
+
+        :param quotes: {code: {'RealtimePrice', 'RealtimeChange', 'PrevClose'(可选), 'last_updated'(可选)}}
+        """
+        if not quotes:
+            return self.version
+        now = time.time() if updated_at is None else updated_at
+        self._writable()
+        self._assign_rows(quotes.keys())
+        arrays = self._arrays
+        source_id = _SOURCE_IDS.get(source, 0)
+        for code, quote in quotes.items():
+            row = self._index[code]
+            arrays['price'][row] = _to_float(quote.get('RealtimePrice'))
+            arrays['change'][row] = _to_float(quote.get('RealtimeChange'))
+            arrays['prev_close'][row] = _to_float(quote.get('PrevClose'))
+            arrays['updated_at'][row] = quote.get('last_updated') or now
+            arrays['source'][row] = source_id
+            arrays['valid'][row] = True
+        self.version += 1
+        return self.version
+
+    def merge(self, quotes, source='', updated_at=None):
+        """
+        多数据源合并：以行情时间为准，较旧的行情（如抓取服务返回的缓存）不覆盖较新的行情。
+
+        :return: 实际写入的 {code: quote}
+        """
+        now = time.time() if updated_at is None else updated_at
+        index = self._index
+        arrays = self._arrays
+        accepted = {}
+        for code, quote in quotes.items():
+            row = index.get(code)
+            if row is not None and arrays['valid'][row] and arrays['updated_at'][row] > (quote.get('last_updated') or now):
+                continue
+            accepted[code] = quote
+        self.update(accepted, source, now)
+        return accepted
+
+    def origin(self, code):
+        """(来源, 更新时间)，没有行情时返回 (None, 0)"""
+        row = self._index.get(code)
+        if row is None or not self._arrays['valid'][row]:
+            return None, 0
+        return QUOTE_SOURCES[self._arrays['source'][row]], float(self._arrays['updated_at'][row])
+
+    def remove(self, codes):
+        codes = [code for code in codes if code in self._index]
+        if not codes:
+            return
+        self._writable()
+        index = dict(self._index)
+        for code in codes:
+            row = index.pop(code)
+            self._arrays['valid'][row] = False
+            self._codes[row] = None
+            self._free_rows.append(row)
+        self._index = index
+        self.version += 1
+
+    def snapshot(self):
+        # 两次写入之间的读者共用同一个快照
+        if self._snapshot is None:
+            self._snapshot = QuoteSnapshot(self.version, self._index, self._codes, self._arrays)
+        return self._snapshot
+
+    def stale_codes(self, codes, max_age):
+        """返回没有行情或行情早于 max_age 秒的股票"""
+        now = time.time()
+        index = self._index
+        arrays = self._arrays
+        stale = []
+        for code in codes:
+            row = index.get(code)
+            if row is None or not arrays['valid'][row] or now - arrays['updated_at'][row] > max_age:
+                stale.append(code)
+        return stale
+
+    def __len__(self):
+        return len(self._index)
@@ -0,0 +1,113 @@
+# blueprints/realtime_broadcaster.py
+# 合并推送：各数据源写入的行情先记入脏集合（同一股票只保留最新值），按固定节拍统一比对并推送，
+# 大批量刷新时客户端不再每秒收到几十条零碎的 realtime_update
+from app_init import config
+from blueprints.realtime_protocol import delta_encoder
+from blueprints.realtime_subscriptions import publish
+import logging
+import time
+import gevent
+import gevent.event
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingBroadcaster:
+    def __init__(self, tick=0.5, max_latency=1.0, stats_interval=300):
+        self.tick = tick
+        self.max_latency = max(max_latency, tick)   # 首个变化进入脏集合到推送出去的最长时间
+        self.stats_interval = stats_interval
+        self._dirty = {}            # code -> 最新行情
+        self._dirty_since = None
+        self._lock = gevent.lock.Semaphore()
+        self._wakeup = gevent.event.Event()
+        self._stopped = gevent.event.Event()
+        self._sources_for = lambda code: ()
+        self.stats = {
+            'marks': 0,             # 数据源提交次数，合并前每次都会推送一条消息
+            'codes_marked': 0,
+            'flushes': 0,
+            'events': 0,            # 实际推送的消息数（按房间）
+            'codes_sent': 0,
+            'bytes': 0,
+        }
+        self._stats_logged_at = time.time()
+
+    def mark(self, new_data):
+        """记入脏集合，由节拍统一推送"""
+        if not new_data:
+            return
+        with self._lock:
+            self._dirty.update(new_data)
+            if self._dirty_since is None:
+                self._dirty_since = time.time()
+            self.stats['marks'] += 1
+            self.stats['codes_marked'] += len(new_data)
+            overdue = time.time() - self._dirty_since >= self.max_latency
+        if overdue:
+            # 节拍协程被拖延时，由提交方唤醒立即推送
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._dirty_since = None
+        changes = delta_encoder.diff(dirty)
+        keyframe = delta_encoder.keyframe_due()
+        if keyframe:
+            changes = delta_encoder.snapshot()
+        if not changes:
+            return
+        events, size = publish(changes, self._sources_for, keyframe)
+        self.stats['flushes'] += 1
+        self.stats['events'] += events
+        self.stats['codes_sent'] += len(changes)
+        self.stats['bytes'] += size
+
+    def saved(self):
+        """估算合并节省的消息数与字节数：每次提交原本各自推送一条消息，每只股票按实际平均字节计"""
+        stats = self.stats
+        events_saved = max(0, stats['marks'] - stats['events'])
+        if not stats['codes_sent']:
+            return {'events_saved': events_saved, 'bytes_saved': 0}
+        bytes_per_code = stats['bytes'] / stats['codes_sent']
+        bytes_saved = max(0, int((stats['codes_marked'] - stats['codes_sent']) * bytes_per_code))
+        return {'events_saved': events_saved, 'bytes_saved': bytes_saved}
+
+    def info(self):
+        return dict(self.stats, pending=len(self._dirty), **self.saved())
+
+    def run(self, sources_for):
+        """
+        节拍循环。
+
+        :param sources_for: sources_for(code) 返回股票在 stocks_pool 中的 sources，用于按看板房间路由
+        """
+        self._sources_for = sources_for
+        logger.info(f"[global] Starting realtime broadcaster, tick {self.tick}s, max latency {self.max_latency}s")
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=self.tick)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[global] Error flushing realtime updates: {e}")
+            if time.time() - self._stats_logged_at >= self.stats_interval:
+                self._stats_logged_at = time.time()
+                logger.info(f"[global] Realtime broadcaster stats: {self.info()}")
+        logger.info("[global] Realtime broadcaster stopped")
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+
+_realtime_config = config.get('realtime', {})
+broadcaster = CoalescingBroadcaster(
+    tick=_realtime_config.get('tick', 0.5),
+    max_latency=_realtime_config.get('max_latency', 1.0)
+)
@@ -0,0 +1,129 @@
+# blueprints/realtime_protocol.py
+# realtime_update 推送格式：按字段比对上次推送的值（价格容差可配），只发送变化的字段，
+# 股票代码与字段值按列存放在数组里；定期发送全量关键帧，客户端可据此重新同步。
+#
+# 消息结构：
+#   {"k": 0|1, "f": ["RealtimePrice", "RealtimeChange"], "c": [code, ...], "v": [[price, ...], [change, ...]]}
+#   k=1 为关键帧（所列股票的全部字段），k=0 为增量帧，未变化的字段为 null
+# 比对只做一次，按订阅拆分后分别编码（见 realtime_subscriptions）
+from app_init import app, config
+import logging
+import time
+import gevent.lock
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+QUOTE_FIELDS = ('RealtimePrice', 'RealtimeChange')
+
+_realtime_config = config.get('realtime', {})
+USE_MSGPACK = _realtime_config.get('msgpack', False) and msgpack is not None
+if _realtime_config.get('msgpack', False) and msgpack is None:
+    logger.warning("realtime.msgpack is enabled but msgpack is not installed, falling back to JSON")
+app.config['REALTIME_MSGPACK'] = USE_MSGPACK  # 模板据此决定是否加载浏览器端 msgpack 解码库
+
+
+class DeltaEncoder:
+    def __init__(self, tolerances=None, keyframe_interval=60, use_msgpack=False):
+        # 字段 -> 绝对容差，变化不超过容差视为未变化
+        self.tolerances = tolerances or {'RealtimePrice': 0.001, 'RealtimeChange': 0.005}
+        self.keyframe_interval = keyframe_interval
+        self.use_msgpack = use_msgpack
+        self.last_sent = {}         # code -> [price, change]，客户端当前应持有的值
+        self.last_keyframe_at = time.time()
+        self._lock = gevent.lock.Semaphore()
+        self.stats = {'deltas': 0, 'keyframes': 0, 'fields_sent': 0, 'fields_skipped': 0}
+
+    def _changed(self, field, old, new):
+        if old is None or new is None:
+            return old != new
+        try:
+            return abs(float(new) - float(old)) > self.tolerances.get(field, 0)
+        except (TypeError, ValueError):
+            return old != new
+
+    def encode(self, changes, keyframe=False):
+        """把 {code: [字段值, ...]} 编码为一帧消息"""
+        codes = list(changes.keys())
+        columns = [[changes[code][i] for code in codes] for i in range(len(QUOTE_FIELDS))]
+        message = {'k': 1 if keyframe else 0, 'f': list(QUOTE_FIELDS), 'c': codes, 'v': columns}
+        if keyframe:
+            self.stats['keyframes'] += 1
+        else:
+            self.stats['deltas'] += 1
+        if self.use_msgpack:
+            return msgpack.packb(message, use_bin_type=True)
+        return message
+
+    def diff(self, new_data):
+        """
+        比对上次推送的值，并把变化记录为已发送。
+
+        :param new_data: {code: {field: value}}，可以包含 last_updated 等其它字段
+        :return: {code: [字段值, ...]}，未变化的字段为 None；没有变化的股票不在结果中
+        """
+        changes = {}
+        with self._lock:
+            for code, data in new_data.items():
+                previous = self.last_sent.get(code)
+                values = [data.get(field) for field in QUOTE_FIELDS]
+                if previous is None:
+                    changed = values
+                else:
+                    changed = [value if self._changed(field, old, value) else None
+                               for field, old, value in zip(QUOTE_FIELDS, previous, values)]
+                if all(value is None for value in changed):
+                    self.stats['fields_skipped'] += len(QUOTE_FIELDS)
+                    continue
+                changes[code] = changed
+                # 只更新实际发出的字段，微小变化不断累积超过容差后仍会发出
+                current = previous or [None] * len(QUOTE_FIELDS)
+                self.last_sent[code] = [value if value is not None else old for old, value in zip(current, changed)]
+                sent = sum(value is not None for value in changed)
+                self.stats['fields_sent'] += sent
+                self.stats['fields_skipped'] += len(QUOTE_FIELDS) - sent
+        return changes
+
+    def snapshot(self, codes=None):
+        """
+        关键帧内容：所列股票最近一次推送的全部字段。
+
+        :param codes: 只包含这些股票，默认全部已发送过的股票
+        """
+        with self._lock:
+            if codes is None:
+                codes = list(self.last_sent.keys())
+            return {code: list(self.last_sent[code]) for code in codes if code in self.last_sent}
+
+    def encode_keyframe(self, data):
+        """
+        把 {code: {field: value}} 直接编码为关键帧，用于只发给单个客户端的回复。
+        不改变已发送状态，这些行情仍由 broadcaster 在下一个节拍比对后推送给其它订阅方。
+        """
+        return self.encode({code: [quote.get(field) for field in QUOTE_FIELDS] for code, quote in data.items()},
+                           keyframe=True)
+
+    def keyframe_due(self):
+        if time.time() - self.last_keyframe_at >= self.keyframe_interval:
+            self.last_keyframe_at = time.time()
+            return True
+        return False
+
+    def forget(self, codes):
+        with self._lock:
+            for code in codes:
+                self.last_sent.pop(code, None)
+
+
+delta_encoder = DeltaEncoder(
+    tolerances={
+        'RealtimePrice': _realtime_config.get('price_tolerance', 0.001),
+        'RealtimeChange': _realtime_config.get('change_tolerance', 0.005),
+    },
+    keyframe_interval=_realtime_config.get('keyframe_interval', 60),
+    use_msgpack=USE_MSGPACK
+)
@@ -0,0 +1,201 @@
+# blueprints/realtime_subscriptions.py
+# /stocks_realtime 订阅：客户端按看板或自选代码集合加入房间，行情按股票路由到关心它的房间，
+# 不再向所有客户端广播整池更新
+from app_init import socketio
+from blueprints.realtime_protocol import delta_encoder
+import hashlib
+import json
+import logging
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = '/stocks_realtime'
+ALL_ROOM = 'all'
+
+# 看板 -> stocks_pool 中为其提供股票的 sources。
+# stock_dashboard 显示按板块查询的股票，这些股票不经过股票池的任何 source，
+# 行情按客户端订阅的代码集合路由，刷新时也取该客户端订阅的代码
+STOCK_DASHBOARD = 'stock_dashboard'
+DASHBOARD_SOURCES = {
+    STOCK_DASHBOARD: (),
+    'ma_strategy_dashboard': ('ma_strategy',),
+    'custom_stock_dashboard': ('custom_stock',),
+    'limitup_unfilled_orders_dashboard': ('limitup_unfilled_orders',)
+}
+
+
+def dashboard_room(dashboard):
+    return f"dashboard:{dashboard}"
+
+
+def codes_room(codes):
+    # 相同代码集合的客户端共用一个房间
+    digest = hashlib.sha1(','.join(sorted(codes)).encode('utf-8')).hexdigest()[:16]
+    return f"codes:{digest}"
+
+
+def target_room(rooms):
+    # 连接实际加入的 socket.io 房间：订阅组合相同的客户端共用一个，每个连接只在一个房间里，
+    # 同时订阅看板和代码集合时每条行情也只收到一次
+    digest = hashlib.sha1(','.join(sorted(rooms)).encode('utf-8')).hexdigest()[:16]
+    return f"sub:{digest}"
+
+
+class SubscriptionRegistry:
+    def __init__(self):
+        self.sid_rooms = {}         # sid -> 该连接加入的房间
+        self.room_members = {}      # 房间 -> 连接数
+        self.room_codes = {}        # 代码集合房间 -> frozenset(codes)
+        self.code_rooms = {}        # code -> 订阅了该代码的代码集合房间
+        self.sid_targets = {}       # sid -> 推送房间
+        self.target_rooms = {}      # 推送房间 -> frozenset(看板/代码集合房间)
+        self.target_members = {}    # 推送房间 -> 连接数
+        self.source_rooms = {source: dashboard_room(dashboard)
+                             for dashboard, sources in DASHBOARD_SOURCES.items() for source in sources}
+        self._lock = gevent.lock.Semaphore()
+
+    def _join(self, sid, room, codes=None):
+        self.sid_rooms.setdefault(sid, set()).add(room)
+        self.room_members[room] = self.room_members.get(room, 0) + 1
+        if codes is not None and room not in self.room_codes:
+            self.room_codes[room] = codes
+            for code in codes:
+                self.code_rooms.setdefault(code, set()).add(room)
+
+    def _leave(self, sid, room):
+        self.sid_rooms.get(sid, set()).discard(room)
+        count = self.room_members.get(room, 0) - 1
+        if count > 0:
+            self.room_members[room] = count
+            return
+        self.room_members.pop(room, None)
+        for code in self.room_codes.pop(room, ()):
+            rooms = self.code_rooms.get(code)
+            if rooms is not None:
+                rooms.discard(room)
+                if not rooms:
+                    del self.code_rooms[code]
+
+    def _set_target(self, sid, rooms):
+        """把连接移到 rooms 组合对应的推送房间，返回 (新房间, 旧房间)，无变化或无订阅时为 None"""
+        old = self.sid_targets.pop(sid, None)
+        new = target_room(rooms) if rooms else None
+        if new == old:
+            if new is not None:
+                self.sid_targets[sid] = new
+            return None, None
+        if old is not None:
+            count = self.target_members.get(old, 0) - 1
+            if count > 0:
+                self.target_members[old] = count
+            else:
+                self.target_members.pop(old, None)
+                self.target_rooms.pop(old, None)
+        if new is not None:
+            self.sid_targets[sid] = new
+            self.target_rooms[new] = frozenset(rooms)
+            self.target_members[new] = self.target_members.get(new, 0) + 1
+        return new, old
+
+    def subscribe(self, sid, dashboards=None, codes=None):
+        """
+        替换连接的订阅。
+
+        :return: (joined, left)，连接需要加入和离开的 socket.io 房间
+        """
+        rooms = {}
+        for dashboard in dashboards or []:
+            if dashboard == ALL_ROOM:
+                rooms[ALL_ROOM] = None
+            elif dashboard in DASHBOARD_SOURCES:
+                rooms[dashboard_room(dashboard)] = None
+        codes = frozenset(code for code in (codes or []) if code)
+        if codes:
+            rooms[codes_room(codes)] = codes
+
+        with self._lock:
+            current = set(self.sid_rooms.get(sid, ()))
+            for room in current - set(rooms):
+                self._leave(sid, room)
+            for room in rooms:
+                if room not in current:
+                    self._join(sid, room, rooms[room])
+            new, old = self._set_target(sid, rooms)
+        return [new] if new else [], {old} if old else set()
+
+    def unsubscribe_all(self, sid):
+        with self._lock:
+            for room in list(self.sid_rooms.get(sid, ())):
+                self._leave(sid, room)
+            self.sid_rooms.pop(sid, None)
+            self._set_target(sid, ())
+
+    def codes_for(self, sid):
+        """连接订阅的代码集合"""
+        with self._lock:
+            codes = set()
+            for room in self.sid_rooms.get(sid, ()):
+                codes.update(self.room_codes.get(room, ()))
+            return codes
+
+    def rooms_for(self, code, sources):
+        rooms = set(self.code_rooms.get(code, ()))
+        for source in sources:
+            room = self.source_rooms.get(source)
+            if room is not None and room in self.room_members:
+                rooms.add(room)
+        if ALL_ROOM in self.room_members:
+            rooms.add(ALL_ROOM)
+        return rooms
+
+    def route(self, codes, sources_for):
+        """
+        按推送房间分组股票，同一连接订阅的多个房间命中同一只股票时只计一次。
+
+        :param sources_for: sources_for(code) 返回该股票在 stocks_pool 中的 sources
+        :return: {推送房间: [code, ...]}
+        """
+        routed = {}
+        with self._lock:
+            by_room = {}
+            for code in codes:
+                for room in self.rooms_for(code, sources_for(code)):
+                    by_room.setdefault(room, []).append(code)
+            for target, rooms in self.target_rooms.items():
+                seen = set()
+                for room in rooms:
+                    seen.update(by_room.get(room, ()))
+                if seen:
+                    routed[target] = list(seen)
+        return routed
+
+    def info(self):
+        with self._lock:
+            return {'connections': len(self.sid_rooms), 'rooms': dict(self.room_members),
+                    'targets': len(self.target_members)}
+
+
+subscriptions = SubscriptionRegistry()
+
+
+def message_size(message):
+    if isinstance(message, (bytes, bytearray)):
+        return len(message)
+    return len(json.dumps(message, separators=(',', ':')))
+
+
+def publish(changes, sources_for, keyframe=False):
+    """
+    把一次比对结果按房间拆分编码并推送，每个房间只收到其订阅的股票。
+
+    :return: (推送的消息数, 消息总字节数)
+    """
+    events = 0
+    size = 0
+    for room, codes in subscriptions.route(changes.keys(), sources_for).items():
+        message = delta_encoder.encode({code: changes[code] for code in codes}, keyframe)
+        socketio.emit('realtime_update', message, namespace=NAMESPACE, to=room)
+        events += 1
+        size += message_size(message)
+    return events, size
@@ -0,0 +1,152 @@
+# blueprints/refresh_scheduler.py
+# 分层刷新调度：按股票所属看板决定刷新频率（涨停板候选最快、均线策略次之、自选股最慢），
+# 到期时间放在最小堆里按先到期先派发；非交易阶段统一降到空闲频率，并在开盘时准时恢复
+from app_init import config
+from blueprints import market_session
+import heapq
+import logging
+import time
+import gevent
+import gevent.event
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIERS = [
+    {'name': 'limitup', 'sources': ['limitup_unfilled_orders'], 'interval': 5},
+    {'name': 'ma_strategy', 'sources': ['ma_strategy'], 'interval': 30},
+    {'name': 'custom', 'sources': ['custom_stock'], 'interval': 180},
+]
+
+
+class RefreshScheduler:
+    def __init__(self, tiers=None, default_interval=60, idle_interval=600, max_batch=200):
+        self.tiers = tiers or DEFAULT_TIERS
+        self.default_interval = default_interval    # 不属于任何分层的股票
+        self.idle_interval = idle_interval          # 非交易阶段
+        self.max_batch = max_batch                  # 每次派发的最大股票数，超出部分按到期先后等下一次
+        self._heap = []                             # (到期时间, code)
+        self._deadlines = {}                        # code -> 当前有效的到期时间，堆中其它项视为作废
+        self._lock = gevent.lock.Semaphore()
+        self._wakeup = gevent.event.Event()
+        self._stopped = gevent.event.Event()
+        self.stats = {'dispatches': 0, 'codes': 0, 'lateness': 0.0}
+        self.tier_counts = {}
+
+    def tier_for(self, sources):
+        """返回 (分层名, 交易阶段刷新间隔)，股票属于多个看板时取最快的一层"""
+        best = ('default', self.default_interval)
+        for tier in self.tiers:
+            if tier['interval'] < best[1] and any(source in sources for source in tier['sources']):
+                best = (tier['name'], tier['interval'])
+        return best
+
+    def _push(self, code, deadline):
+        self._deadlines[code] = deadline
+        heapq.heappush(self._heap, (deadline, code))
+
+    def schedule(self, codes, deadline=None):
+        """安排股票在 deadline（默认立即）之前刷新；已有更早的到期时间时保持不变"""
+        deadline = time.time() if deadline is None else deadline
+        with self._lock:
+            for code in codes:
+                current = self._deadlines.get(code)
+                if current is None or deadline < current:
+                    self._push(code, deadline)
+        self._wakeup.set()
+
+    def unschedule(self, codes):
+        with self._lock:
+            for code in codes:
+                self._deadlines.pop(code, None)
+
+    def pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and len(due) < self.max_batch:
+                deadline, code = self._heap[0]
+                if self._deadlines.get(code) != deadline:
+                    heapq.heappop(self._heap)   # 已重新安排或已移出股票池
+                    continue
+                if deadline > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._deadlines[code]
+                due.append(code)
+                self.stats['lateness'] += 0.1 * ((now - deadline) - self.stats['lateness'])
+        return due
+
+    def reschedule(self, codes, sources_for):
+        now = time.time()
+        if market_session.is_active():
+            next_active = None
+        else:
+            next_active = now + market_session.seconds_until_active()
+        with self._lock:
+            for code in codes:
+                if code in self._deadlines:
+                    continue
+                tier, interval = self.tier_for(sources_for(code))
+                if next_active is not None:
+                    # 非交易阶段降频，但不晚于下一次开盘
+                    deadline = min(now + self.idle_interval, max(next_active, now + 1))
+                else:
+                    deadline = now + interval
+                self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+                self._push(code, deadline)
+
+    def next_wait(self, now):
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return 60
+            return min(60, max(0, self._heap[0][0] - now))
+
+    def run(self, dispatch, sources_for, is_pooled):
+        """
+        调度循环。
+
+        :param dispatch: dispatch(codes) 抓取一批股票的行情
+        :param sources_for: sources_for(code) 返回股票所属的 sources，用于确定分层
+        :param is_pooled: is_pooled(code) 股票是否仍在股票池中，移出的股票不再安排
+        """
+        logger.info(f"[global] Starting refresh scheduler with tiers {self.tiers}")
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                codes = [code for code in self.pop_due(time.time()) if is_pooled(code)]
+                if codes:
+                    try:
+                        dispatch(codes)
+                    finally:
+                        self.stats['dispatches'] += 1
+                        self.stats['codes'] += len(codes)
+                        self.reschedule(codes, sources_for)
+                    gevent.sleep(0)
+                    continue
+                self._wakeup.wait(timeout=self.next_wait(time.time()))
+                self._wakeup.clear()
+            except Exception as e:
+                logger.error(f"[global] Error in refresh scheduler: {str(e)}", exc_info=True)
+                self._stopped.wait(timeout=5)
+        logger.info("[global] Refresh scheduler stopped")
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, scheduled=len(self._deadlines), tiers=dict(self.tier_counts))
+
+
+_scheduler_config = config.get('scheduler', {})
+# 默认关闭，沿用原有的整池轮询；确认分层刷新在实盘中行情及时后再在配置中打开
+SCHEDULER_ENABLED = _scheduler_config.get('enabled', False)
+refresh_scheduler = RefreshScheduler(
+    tiers=_scheduler_config.get('tiers'),
+    default_interval=_scheduler_config.get('default_interval', 60),
+    idle_interval=_scheduler_config.get('idle_interval', 600),
+    max_batch=_scheduler_config.get('max_batch', 200)
+)
@@ -0,0 +1,193 @@
+# blueprints/response_cache.py
+# 进程内响应缓存：按字节预算做 LRU 淘汰，同一个 key 只允许一个 greenlet 重建（single-flight），
+# 可选在过期后的一段时间内先返回旧值、后台重建（stale-while-revalidate）
+from app_init import config
+from flask import request, make_response, copy_current_request_context
+from collections import OrderedDict
+import functools
+import logging
+import pickle
+import time
+import gevent
+import gevent.event
+import gevent.lock
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until')
+
+    def __init__(self, value, size, expires_at, stale_until):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class CachedResponse:
+    """Flask 响应的可缓存形式，每次命中时重新生成 Response 对象"""
+    __slots__ = ('body', 'status', 'headers')
+
+    def __init__(self, response):
+        self.body = response.get_data()
+        self.status = response.status_code
+        self.headers = [(k, v) for k, v in response.headers if k.lower() not in ('content-length', 'set-cookie')]
+
+    def to_response(self):
+        response = make_response(self.body, self.status)
+        for key, value in self.headers:
+            response.headers[key] = value
+        return response
+
+
+def estimate_size(value):
+    if isinstance(value, CachedResponse):
+        return len(value.body) + sum(len(k) + len(v) for k, v in value.headers) + 64
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024, default_timeout=300, stale_ttl=0):
+        self.max_bytes = max_bytes
+        self.default_timeout = default_timeout
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._inflight = {}  # key -> AsyncResult
+        self._bytes = 0
+        self._lock = gevent.lock.Semaphore()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'waits': 0, 'evictions': 0, 'rejected': 0}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.stale_until:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key, value, timeout=None, stale_ttl=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            self.stats['rejected'] += 1
+            logger.warning(f"Cache value for {key} is {size} bytes, exceeds budget {self.max_bytes}, not cached")
+            return False
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = CacheEntry(value, size, now + timeout, now + timeout + stale_ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._bytes -= old_entry.size
+                self.stats['evictions'] += 1
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _compute(self, key, result, builder, timeout, stale_ttl, cacheable):
+        # result 已在锁内登记到 _inflight，等待者都挂在它上面
+        try:
+            value = builder()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, timeout, stale_ttl)
+            result.set(value)
+            return value
+        except BaseException as e:
+            result.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh(self, key, result, builder, timeout, stale_ttl, cacheable):
+        try:
+            self._compute(key, result, builder, timeout, stale_ttl, cacheable)
+        except Exception as e:
+            logger.error(f"Background refresh failed for {key}: {str(e)}")
+
+    def get_or_compute(self, key, builder, timeout=None, stale_ttl=None, cacheable=None, background_builder=None):
+        """
+        命中直接返回；过期但仍在 stale 窗口内时返回旧值并在后台重建；
+        否则只有一个调用方执行 builder，其余调用方等待同一结果。
+
+        :param cacheable: 可选，判断结果是否写入缓存（如只缓存 200 响应）
+        :param background_builder: 后台重建使用的 builder，默认与 builder 相同
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.stale_until:
+                self._entries.move_to_end(key)
+                if now < entry.expires_at:
+                    self.stats['hits'] += 1
+                    return entry.value
+                self.stats['stale_hits'] += 1
+                if key not in self._inflight:
+                    result = self._inflight[key] = gevent.event.AsyncResult()
+                    gevent.spawn(self._refresh, key, result, background_builder or builder, timeout, stale_ttl, cacheable)
+                return entry.value
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                result = self._inflight[key] = gevent.event.AsyncResult()
+                self.stats['misses'] += 1
+            else:
+                self.stats['waits'] += 1
+
+        if inflight is not None:
+            return inflight.get()
+        return self._compute(key, result, builder, timeout, stale_ttl, cacheable)
+
+    def cached(self, timeout=None, query_string=True, stale_ttl=None, key_prefix='view'):
+        """视图装饰器，用法与 flask-caching 的 cache.cached 相同，只缓存 200 响应"""
+        def decorator(f):
+            @functools.wraps(f)
+            def decorated_function(*args, **kwargs):
+                key = f"{key_prefix}:{request.path}"
+                if query_string:
+                    key += '?' + '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+
+                def build():
+                    return CachedResponse(make_response(f(*args, **kwargs)))
+
+                cached_response = self.get_or_compute(
+                    key, build, timeout, stale_ttl,
+                    cacheable=lambda value: value.status == 200,
+                    background_builder=copy_current_request_context(build)
+                )
+                return cached_response.to_response()
+            return decorated_function
+        return decorator
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes, inflight=len(self._inflight))
+
+
+_response_cache_config = config.get('cache', {}).get('response', {})
+response_cache = ResponseCache(
+    max_bytes=_response_cache_config.get('max_bytes', 256 * 1024 * 1024),
+    default_timeout=_response_cache_config.get('default_timeout', 300),
+    stale_ttl=_response_cache_config.get('stale_ttl', 0)
+)
@@ -0,0 +1,142 @@
+# blueprints/scraper_client.py
+# 抓取服务客户端：一个 DEALER socket，由接收协程按请求 ID 把回复分发到各自的队列，
+# 多个调用方可以同时请求，不会互相收走或等待对方的结果；定时 ping 检测抓取服务是否在线
+from blueprints import scraper_protocol as protocol
+import logging
+import time
+import uuid
+import gevent
+import gevent.queue
+import zmq.green as zmq
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperClient:
+    def __init__(self, endpoint=protocol.DEFAULT_ENDPOINT, heartbeat_interval=5, heartbeat_liveness=3):
+        self.endpoint = endpoint
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_liveness = heartbeat_liveness    # 连续这么多个心跳周期没有任何消息视为离线
+        self.context = zmq.Context()
+        self.socket = self._connect()
+        self.pending = {}           # 请求ID -> gevent.queue.Queue
+        self.last_seen = 0
+        self.running = False
+        self.stats = {'requests': 0, 'quotes': 0, 'late_replies': 0}
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            gevent.spawn(self._receive_loop)
+            gevent.spawn(self._heartbeat_loop)
+            logger.info(f"[global] Scraper client connected to {self.endpoint}")
+
+    def close(self):
+        self.running = False
+        self.socket.close()
+        self.context.term()
+
+    def _connect(self):
+        socket = self.context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.endpoint)
+        return socket
+
+    def _reconnect(self):
+        try:
+            self.socket.close()
+        except zmq.ZMQError:
+            pass
+        self.socket = self._connect()
+
+    def _fail_pending(self, reason):
+        # 通知所有在途请求立即结束，而不是各自等到超时
+        for queue in list(self.pending.values()):
+            queue.put({'type': protocol.ERROR, 'reason': reason})
+
+    @property
+    def alive(self):
+        return time.time() - self.last_seen < self.heartbeat_interval * self.heartbeat_liveness
+
+    def _send(self, message):
+        self.socket.send(protocol.pack(message))
+
+    def _receive_loop(self):
+        while self.running:
+            try:
+                message = protocol.unpack(self.socket.recv())
+                if not isinstance(message, dict):
+                    raise ValueError(f"unexpected message {message!r}")
+            except zmq.ZMQError as e:
+                if not self.running:
+                    break
+                # socket 出错后重建连接，接收协程继续运行；在途请求的回复已无法收到，立即结束它们
+                logger.error(f"[global] Scraper socket error: {e}, reconnecting to {self.endpoint}")
+                self._fail_pending(f"socket error: {e}")
+                self._reconnect()
+                gevent.sleep(1)
+                continue
+            except Exception as e:
+                logger.error(f"[global] Invalid message from scraper: {e}")
+                continue
+            self.last_seen = time.time()
+            if message.get('type') == protocol.PONG:
+                continue
+            queue = self.pending.get(message.get('id'))
+            if queue is None:
+                # 已超时放弃的请求，丢弃迟到的回复
+                self.stats['late_replies'] += 1
+                continue
+            queue.put(message)
+
+    def _heartbeat_loop(self):
+        was_alive = False
+        while self.running:
+            try:
+                self._send({'type': protocol.PING})
+            except zmq.ZMQError as e:
+                logger.error(f"[global] Failed to ping scraper: {e}")
+            gevent.sleep(self.heartbeat_interval)
+            alive = self.alive
+            if was_alive and not alive:
+                logger.warning(f"[global] Scraper at {self.endpoint} stopped responding")
+                self._fail_pending('scraper unavailable')
+            elif alive and not was_alive:
+                logger.info(f"[global] Scraper at {self.endpoint} is online")
+            was_alive = alive
+
+    def stream(self, stock_codes, caller='global', idle_timeout=15):
+        """
+        请求一批股票，按到达顺序逐条产出 {code: quote}。
+
+        :param idle_timeout: 连续这么多秒没有收到该请求的任何回复时放弃
+        """
+        request_id = uuid.uuid4().hex
+        queue = gevent.queue.Queue()
+        self.pending[request_id] = queue
+        self.stats['requests'] += 1
+        try:
+            self._send({'type': protocol.REQUEST, 'id': request_id, 'stocks': list(stock_codes)})
+            logger.debug(f"[{caller}] Sent scraper request {request_id} for {len(stock_codes)} stocks")
+            while True:
+                try:
+                    message = queue.get(timeout=idle_timeout)
+                except gevent.queue.Empty:
+                    logger.warning(f"[{caller}] Scraper request {request_id} idle for {idle_timeout}s, giving up")
+                    return
+                kind = message.get('type')
+                if kind == protocol.QUOTE:
+                    self.stats['quotes'] += len(message['data'])
+                    yield message['data']
+                elif kind == protocol.DONE:
+                    if message.get('missing'):
+                        logger.debug(f"[{caller}] Scraper request {request_id} missing {len(message['missing'])} stocks")
+                    return
+                elif kind == protocol.ERROR:
+                    logger.warning(f"[{caller}] Scraper request {request_id} failed: {message.get('reason')}")
+                    return
+        finally:
+            self.pending.pop(request_id, None)
+
+    def info(self):
+        return dict(self.stats, alive=self.alive, in_flight=len(self.pending))
@@ -0,0 +1,63 @@
+# blueprints/scraper_protocol.py
+# 行情更新服务与抓取服务（selenium_server）之间的 ZMQ 协议。
+# 抓取服务绑定 ROUTER，更新服务用 DEALER 连接；每帧是一个消息字典，有 msgpack 时用 msgpack 编码，否则用 JSON。
+#
+#   更新服务 -> 抓取服务：
+#     {"type": "request", "id": 请求ID, "stocks": [code, ...]}
+#     {"type": "ping"}
+#   抓取服务 -> 更新服务：
+#     {"type": "quote", "id": 请求ID, "data": {code: quote, ...}}   每抓到一只（或一批缓存）发送一次
+#     {"type": "done", "id": 请求ID, "missing": [code, ...]}          该请求结束
+#     {"type": "error", "id": 请求ID, "reason": "..."}
+#     {"type": "pong"}
+#
+# 回复按请求 ID 对应到发起方，多个请求可以同时在途，互不影响
+#
+# 多进程部署时由 scraper_broker.py 绑定上述 ROUTER（前端），抓取 worker 用 DEALER 连接 broker 的后端：
+#   worker -> broker：
+#     {"type": "ready", "credit": n}          还能再接收 n 个任务
+#     {"type": "quote", "id": 任务ID, "data": {...}} / {"type": "done", "id": 任务ID, "missing": [...]}
+#     {"type": "heartbeat"}
+#   broker -> worker：
+#     {"type": "job", "id": 任务ID, "stocks": [code, ...]}
+#     {"type": "heartbeat"}
+#     {"type": "reset"}                        broker 不认识该 worker（broker 重启或判定其离线），worker 重新发送 ready
+#   前端另外支持 {"type": "stats"}，返回 {"type": "stats", "workers": {...}, "queued": n}
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+REQUEST = 'request'
+QUOTE = 'quote'
+DONE = 'done'
+ERROR = 'error'
+PING = 'ping'
+PONG = 'pong'
+READY = 'ready'
+JOB = 'job'
+HEARTBEAT = 'heartbeat'
+RESET = 'reset'
+STATS = 'stats'
+
+DEFAULT_ENDPOINT = 'tcp://127.0.0.1:5555'
+DEFAULT_BIND = 'tcp://*:5555'
+DEFAULT_BACKEND_ENDPOINT = 'tcp://127.0.0.1:5557'
+DEFAULT_BACKEND_BIND = 'tcp://*:5557'
+
+
+def pack(message):
+    if msgpack is not None:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+
+def unpack(frame):
+    # JSON 帧以 '{' 开头，msgpack 的 map 不会以 0x7b 开头，两种编码的进程可以混用
+    if frame[:1] == b'{':
+        return json.loads(frame.decode('utf-8'))
+    if msgpack is None:
+        raise ValueError("Received a msgpack frame but msgpack is not installed")
+    return msgpack.unpackb(frame, raw=False)
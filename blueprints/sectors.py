@@ -1,7 +1,8 @@
 import mysql.connector
 from flask import Blueprint, jsonify
 import mysql.connector
-from app_init import config, cache
+from app_init import config
+from blueprints.response_cache import response_cache
 
 db_config = config['database']
 if db_config is None:
@@ -11,7 +12,7 @@ sectors_bp = Blueprint('sectors', __name__)
    
 # API 端点：获取所有板块信息
 @sectors_bp.route('/sectors', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@response_cache.cached(timeout=300, query_string=True)
 def get_sectors():
     try:
         conn = mysql.connector.connect(**db_config)
@@ -0,0 +1,43 @@
+# blueprints/source_index.py
+# stocks_pool 的反向索引：source -> 股票集合，随股票池增删增量维护，
+# 按看板/数据源取股票时只与结果规模相关，不再遍历整个股票池
+import gevent.lock
+
+
+class SourceIndex:
+    def __init__(self):
+        self._codes = {}        # source -> set(code)
+        self._sources = {}      # code -> set(source)
+        self._lock = gevent.lock.Semaphore()
+
+    def add(self, code, source):
+        """登记 (code, source)，返回是否为新增（重复提交同一看板时为 False）"""
+        with self._lock:
+            sources = self._sources.setdefault(code, set())
+            if source in sources:
+                return False
+            sources.add(source)
+            self._codes.setdefault(source, set()).add(code)
+            return True
+
+    def discard_code(self, code):
+        """股票移出股票池时清除它的全部来源"""
+        with self._lock:
+            for source in self._sources.pop(code, ()):
+                codes = self._codes.get(source)
+                if codes is not None:
+                    codes.discard(code)
+                    if not codes:
+                        del self._codes[source]
+
+    def codes(self, source):
+        with self._lock:
+            return set(self._codes.get(source, ()))
+
+    def sources(self, code):
+        # 路由时逐只调用，直接返回内部集合，调用方只读不改
+        return self._sources.get(code, frozenset())
+
+    def counts(self):
+        with self._lock:
+            return {source: len(codes) for source, codes in self._codes.items()}
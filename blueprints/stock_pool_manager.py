@@ -1,4 +1,4 @@
-# Monkey patch 以支持 gevent 对 zmq 的非阻塞
+# Monkey patch 以支持 gevent 的非阻塞 IO（zmq 通过 zmq.green 协作）
 from gevent import monkey
 import gevent.lock
 import gevent.queue
@@ -9,11 +9,23 @@ from app_init import app, socketio
 import tushare as ts
 import gevent
 import time
-import requests
+import heapq
 import yaml
-from datetime import datetime, time as dt_time
-import zmq
 from gevent.pool import Pool
+from blueprints.trading_calendar import trading_calendar
+from blueprints.bar_cache import daily_bar_cache
+from blueprints.mairui_fetcher import MairuiFetcher
+from blueprints.tushare_fetcher import TushareFetcher
+from blueprints.realtime_protocol import delta_encoder
+from blueprints.realtime_broadcaster import broadcaster
+from blueprints.quote_table import QuoteTable
+from blueprints.source_index import SourceIndex
+from blueprints.quote_arbiter import QuoteArbiter
+from blueprints.scraper_client import ScraperClient
+from blueprints.scraper_protocol import DEFAULT_ENDPOINT
+from blueprints import market_session
+from blueprints.refresh_scheduler import refresh_scheduler, SCHEDULER_ENABLED
+import pandas as pd
 
 logger = app.logger
 with open('config.yaml', 'r') as f:
@@ -39,35 +51,43 @@ ts.set_token(DATA_SOURCES['tushare']['token'])
 pro = ts.pro_api()
 
 stock_update_queue = gevent.queue.Queue()
+POOL_EXPIRE_SECONDS = 14400  # 股票超过 4 小时没有被看板请求就移出股票池
+mairui_fetcher = MairuiFetcher(DATA_SOURCES['mairui'])
+tushare_fetcher = TushareFetcher(DATA_SOURCES['tushare'])
+scraper_client = ScraperClient(
+    endpoint=DATA_SOURCES['selenium'].get('endpoint', DEFAULT_ENDPOINT),
+    heartbeat_interval=DATA_SOURCES['selenium'].get('heartbeat_interval', 5)
+)
+
+ARBITRATION_CONFIG = config.get('arbitration', {})
+
+
+def build_quote_arbiter():
+    # 配额按“每分钟可刷新的股票数”计算
+    mairui, tushare, selenium = DATA_SOURCES['mairui'], DATA_SOURCES['tushare'], DATA_SOURCES['selenium']
+    quotas = {
+        'mairui': int(60 / mairui['rate_limit'] * mairui.get('batch_size', 20)) if mairui['rate_limit'] > 0 else 100000,
+        'tushare': tushare['limits']['per_minute'] * tushare.get('batch_size', 10),
+        'selenium': selenium.get('quota_per_minute', 120),
+    }
+    default_costs = {'mairui': 1, 'tushare': 2, 'selenium': 5}
+    names = ARBITRATION_CONFIG.get('sources', ['mairui', 'tushare', 'selenium'])
+    return QuoteArbiter(
+        [(name, DATA_SOURCES[name].get('cost', default_costs[name]), quotas[name]) for name in names],
+        degrade_threshold=ARBITRATION_CONFIG.get('degrade_threshold', 0.5),
+        degrade_cooldown=ARBITRATION_CONFIG.get('degrade_cooldown', 120),
+        health_checks={
+            'mairui': lambda: any(mairui_fetcher.health.available(name) for name in ('main', 'backup', 'batch')),
+            'selenium': lambda: scraper_client.alive,
+        }
+    )
+
+
+quote_arbiter = build_quote_arbiter()
 
 def is_trading_time():
-    now = datetime.now()
-    weekday = now.weekday()
-    if weekday > 4:  # 周末
-        return False
-    current_time = now.time()
-    morning_start = dt_time(9, 30)
-    morning_end = dt_time(11, 30)
-    afternoon_start = dt_time(13, 0)
-    afternoon_end = dt_time(15, 0)
-    return (morning_start <= current_time <= morning_end) or (afternoon_start <= current_time <= afternoon_end)
-
-def get_target_time(current_time):
-    morning_start = dt_time(9, 10)
-    morning_end = dt_time(11, 30)
-    afternoon_start = dt_time(13, 0)
-    
-    if current_time < morning_start:
-        return dt_time(9, 10)
-    elif morning_end < current_time < afternoon_start:
-        return dt_time(13, 0)
-    return None
-
-def sleep_until_target(target_time):
-    now = datetime.now()
-    time_diff = (now.replace(hour=target_time.hour, minute=target_time.minute, second=0, microsecond=0) - now).total_seconds()
-    if time_diff > 0:
-        gevent.sleep(time_diff)
+    # 按北京时间和交易日历判断，含开盘/收盘集合竞价
+    return market_session.is_active()
 
 
 def get_stock_prefix(stock_code):
@@ -82,17 +102,17 @@ def get_stock_prefix(stock_code):
 class DataAdapter:
     @staticmethod
     def tushare_adapter(df):
-        updated_data = {}
-        if not df.empty:
-            for _, row in df.iterrows():
-                code = row['TS_CODE'].split('.')[0]
-                prev_close = float(row['PRE_CLOSE']) if row['PRE_CLOSE'] else 0
-                price = float(row['PRICE']) if row['PRICE'] else 0
-                updated_data[code] = {
-                    'RealtimePrice': price,
-                    'RealtimeChange': round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2)
-                }
-        return updated_data
+        # 整列运算，避免 iterrows 逐行构造 Series 和逐个 float 解析
+        if df is None or df.empty:
+            return {}
+        codes = df['TS_CODE'].astype(str).str.split('.').str[0]
+        price = pd.to_numeric(df['PRICE'], errors='coerce').fillna(0).astype(float)
+        prev_close = pd.to_numeric(df['PRE_CLOSE'], errors='coerce').fillna(0).astype(float)
+        change = ((price - prev_close) / prev_close.where(prev_close != 0) * 100).fillna(0).round(2)
+        return {
+            code: {'RealtimePrice': p, 'RealtimeChange': c, 'PrevClose': pc}
+            for code, p, c, pc in zip(codes.tolist(), price.tolist(), change.tolist(), prev_close.tolist())
+        }
     
     @staticmethod
     def mairui_adapter(data, stock_code):
@@ -102,7 +122,8 @@ class DataAdapter:
             prev_close = round(float(data.get('yc', 0)), 2)  # MODIFIED - 保留小数点后两位
             updated_data[stock_code] = {
                 'RealtimePrice': price,
-                'RealtimeChange': round(float(data.get('pc', 0)), 2) if data.get('pc') else round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2)
+                'RealtimeChange': round(float(data.get('pc', 0)), 2) if data.get('pc') else round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2),
+                'PrevClose': prev_close
             }
         return updated_data
 
@@ -117,7 +138,8 @@ class DataAdapter:
             prev_close = float(prev_close_str.replace(',', '')) if prev_close_str else 0
             updated_data[code] = {
                 'RealtimePrice': price,
-                'RealtimeChange': round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2)
+                'RealtimeChange': round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2),
+                'PrevClose': prev_close
             }
         except (ValueError, TypeError) as e:
             logger.warning(f"Failed to parse Playwright data for {code}: {e}")
@@ -126,18 +148,36 @@ class DataAdapter:
 class RealtimeUpdater:
     def __init__(self):
         self.stocks_pool = {}
-        self.realtime_data = {}
+        self.source_index = SourceIndex()   # source -> codes，随 stocks_pool 增量维护
+        self.expiry_heap = []               # (到期时间, code)，每只股票一项
+        self.quotes = QuoteTable()     # 实时行情，读者通过 snapshot() 无锁读取
         self.realtime_lock = gevent.lock.Semaphore()
         self.running = False
         self.source_tasks = {}
         self.custom_stocks = []
-        self.zmq_context = zmq.Context()
-        self.pub_socket = self.zmq_context.socket(zmq.PUB)
-        self.pub_socket.connect("tcp://127.0.0.1:5556")
-        self.sub_socket = self.zmq_context.socket(zmq.SUB)
-        self.sub_socket.connect("tcp://127.0.0.1:5555")
-        self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, "")
-        self.last_emitted_data = {}
+
+    def add_to_pool(self, codes, source, current_time):
+        # 调用方持有 realtime_lock；同时维护 source -> codes 反向索引
+        scheduled = []
+        for code in codes:
+            if code in self.stocks_pool:
+                self.stocks_pool[code]['sources'].add(source)
+                self.stocks_pool[code]['last_updated'] = current_time
+            else:
+                self.stocks_pool[code] = {'sources': {source}, 'last_updated': current_time}
+                heapq.heappush(self.expiry_heap, (current_time + POOL_EXPIRE_SECONDS, code))
+            if self.source_index.add(code, source):
+                # 新股票或新看板（分层可能变快）：立即刷新一次，之后按所在分层的频率刷新
+                scheduled.append(code)
+        if scheduled and SCHEDULER_ENABLED:
+            # 调度器未启用时没有消费者，不往堆里放
+            refresh_scheduler.schedule(scheduled)
+
+    def codes_for_source(self, source):
+        return self.source_index.codes(source)
+
+    def sources_for(self, code):
+        return self.source_index.sources(code)
 
     def get_stock_suffix(self, stock_code):
         first_char = stock_code[0]
@@ -152,66 +192,45 @@ class RealtimeUpdater:
         start_time = time.time()
         total_stocks = len(stock_codes)
         received_stocks = set()
-        timeout = max(15000, total_stocks * 500)
+        idle_timeout = DATA_SOURCES['selenium'].get('idle_timeout', 15)
         retries = 2
 
         remaining_codes = set(stock_codes)
         for attempt in range(retries + 1):
             if not remaining_codes:
                 break
-            self.pub_socket.send_json({"stocks": list(remaining_codes)})
-            logger.debug(f"[{caller}] Sent request (attempt {attempt + 1}/{retries + 1}) for {len(remaining_codes)} stocks to port 5556")
-            gevent.sleep(1)
-
-            done = False
-            while not done:
-                try:
-                    if self.sub_socket.poll(timeout):
-                        data = self.sub_socket.recv_json()
-                        if "done" in data and data["done"]:
-                            logger.debug(f"[{caller}] Received completion signal")
-                            done = True
-                        else:
-                            logger.debug(f"[{caller}] Received batch data with {len(data)} items")
-                            with self.realtime_lock:
-                                current_time = time.time()
-                                for code, info in data.items():
-                                    info['last_updated'] = current_time
-                                    self.realtime_data[code] = info
-                                    received_stocks.add(code)
-                            with app.app_context():
-                                self.emit_updates(data)
-                    else:
-                        logger.warning(f"[{caller}] Timeout waiting for batch data, received {len(received_stocks)}/{total_stocks} stocks")
-                        done = True
-                except Exception as e:
-                    logger.error(f"[{caller}] Error receiving batch: {e}")
-                    done = True
+            logger.debug(f"[{caller}] Requesting {len(remaining_codes)} stocks from scraper (attempt {attempt + 1}/{retries + 1})")
+            try:
+                # 抓取服务逐只返回，收到即写入行情表
+                for data in scraper_client.stream(list(remaining_codes), caller, idle_timeout):
+                    # 抓取服务可能返回缓存的旧行情，只接受比现有行情新的部分
+                    accepted = self.quotes.merge(data, 'selenium')
+                    received_stocks.update(data.keys())
+                    with app.app_context():
+                        self.emit_updates(accepted)
+            except Exception as e:
+                logger.error(f"[{caller}] Error receiving scraper data: {e}")
             remaining_codes = set(stock_codes) - received_stocks
             if remaining_codes and attempt < retries:
+                if not scraper_client.alive:
+                    break
                 logger.info(f"[{caller}] Retrying {len(remaining_codes)} missing stocks: {remaining_codes}")
 
         if remaining_codes:
             logger.error(f"[{caller}] Failed to fetch data for stocks after retries: {remaining_codes}")
                 
         logger.info(f"[{caller}] Fetching {total_stocks} stocks via Selenium took {time.time() - start_time:.2f} seconds, received {len(received_stocks)} stocks")
+        return received_stocks
 
 
     def emit_updates(self, new_data):
-        updates = {}
-        with self.realtime_lock:
-            for code, data in new_data.items():
-                if code not in self.last_emitted_data or self.last_emitted_data[code] != data:
-                    updates[code] = data
-            if updates:
-                try:
-                    socketio.emit('realtime_update', updates, namespace='/stocks_realtime')
-                    #logger.debug(f"[global] Emitted updates: {updates}")
-                    self.last_emitted_data.update(updates)
-                except Exception as e:
-                    logger.error(f"[global] Error emitting updates: {e}")
+        # 记入脏集合，由 broadcaster 按节拍比对、合并后推送
+        try:
+            broadcaster.mark(new_data)
+        except Exception as e:
+            logger.error(f"[global] Error emitting updates: {e}")
 
-    def get_realtime_data(self, stock_codes, source, caller='global'):
+    def get_realtime_data(self, stock_codes, source, caller='global', force=False):
         with app.app_context():
             try:
                 updated_data = {}
@@ -219,90 +238,29 @@ class RealtimeUpdater:
                 logger.debug(f"[{caller}] Fetching {source} for {len(stock_codes)} stocks: {stock_codes}")
 
                 if source == 'selenium':
-                    current_time = time.time()
-                    expired_codes = [
-                        code for code in stock_codes
-                        if code not in self.realtime_data or
-                        (current_time - self.realtime_data[code].get('last_updated', 0) > 300)
-                    ]
+                    expired_codes = self.quotes.stale_codes(stock_codes, 300)
                     if expired_codes:
                         gevent.spawn(self.fetch_selenium_async, expired_codes, caller)
-                    with self.realtime_lock:
-                        updated_data = {code: self.realtime_data.get(code, {}) for code in stock_codes}
-                    filtered_data = {k: v for k, v in updated_data.items() if v}
+                    snapshot = self.quotes.snapshot()
+                    filtered_data = {code: snapshot[code] for code in stock_codes if code in snapshot}
                     logger.debug(f"[{caller}] 'selenium' get realtime data: {filtered_data}")
                     return filtered_data
 
                 elif source == 'tushare':
                     ts_codes = [f"{code}{self.get_stock_suffix(code)}" for code in stock_codes]
-                    batch_size = DATA_SOURCES[source].get('batch_size', 10)
-                    for i in range(0, len(ts_codes), batch_size):
-                        batch = ts_codes[i:i + batch_size]
-                        df = ts.realtime_quote(ts_code=','.join(batch))
-                        batch_data = DataAdapter.tushare_adapter(df)
-                        updated_data.update(batch_data)
-                        gevent.sleep(60 / DATA_SOURCES[source]['limits']['per_minute'])
+                    # 批次并发在途，已返回的批次先解析
+                    for df in tushare_fetcher.iter_frames(ts_codes, caller):
+                        updated_data.update(DataAdapter.tushare_adapter(df))
 
                 elif source == 'mairui':
                     # 对于 refresh_request，强制更新所选股票，忽略缓存
-                    codes_to_fetch = stock_codes if caller == 'refresh_request' else [
-                        code for code in stock_codes
-                        if code not in self.realtime_data or
-                        (time.time() - self.realtime_data[code].get('last_updated', 0) > 300)
-                    ]
-                    batch_size = DATA_SOURCES[source].get('batch_size', 20)  # NEW - 批量查询支持
-                    for i in range(0, len(codes_to_fetch), batch_size):
-                        batch = codes_to_fetch[i:i + batch_size]
-                        # NEW - 批量查询支持：尝试使用批量查询接口
-                        success = False
-                        url_template = DATA_SOURCES[source]['backup_url']
-                        url = url_template.format(licence=DATA_SOURCES[source]['licence']) + f"?stock_codes={','.join(batch)}"
-                        try:
-                            response = requests.get(url, timeout=5)
-                            response.raise_for_status()
-                            data_list = response.json()
-                            if isinstance(data_list, list):
-                                for data in data_list:
-                                    code = data.get('dm', '')
-                                    if code in batch:
-                                        batch_data = DataAdapter.mairui_adapter(data, code)
-                                        updated_data.update(batch_data)
-                                success = True
-                            else:
-                                logger.warning(f"[{caller}] Mairui batch request returned invalid data for {batch}: {data_list}")
-                        except requests.RequestException as e:
-                            logger.warning(f"[{caller}] Mairui batch request failed for {batch} with {url}: {str(e)}")
-                        gevent.sleep(DATA_SOURCES[source]['rate_limit'])  # NEW - 添加批量查询的 rate_limit
-
-                        # NEW - 批量查询支持：如果批量查询失败，回退到单股票查询
-                        if not success:
-                            logger.info(f"[{caller}] Falling back to single stock query for {batch}")
-                            for code in batch:
-                                urls = [DATA_SOURCES[source]['main_url'], DATA_SOURCES[source]['backup_url']]
-                                single_success = False
-                                for url_template in urls:
-                                    url = url_template.format(code=code, licence=DATA_SOURCES[source]['licence'])
-                                    try:
-                                        response = requests.get(url, timeout=5)
-                                        response.raise_for_status()
-                                        data = response.json()
-                                        batch_data = DataAdapter.mairui_adapter(data, code)
-                                        updated_data.update(batch_data)
-                                        single_success = True
-                                        break
-                                    except requests.RequestException as e:
-                                        logger.warning(f"[{caller}] Mairui single request failed for {code} with {url}: {str(e)}")
-                                if not single_success:
-                                    logger.error(f"[{caller}] Failed to fetch {code} from mairui after trying all URLs")
-                                gevent.sleep(DATA_SOURCES[source]['rate_limit'])  # 每请求一个股票后休眠
+                    codes_to_fetch = stock_codes if force or caller == 'refresh_request' else self.quotes.stale_codes(stock_codes, 300)
+                    # 令牌桶限速 + 协程池并发抓取，批量接口失败时由 fetcher 回退到单股票查询
+                    for code, data in mairui_fetcher.fetch(codes_to_fetch, caller).items():
+                        updated_data.update(DataAdapter.mairui_adapter(data, code))
 
                 if updated_data:
-                    with self.realtime_lock:
-                        current_time = time.time()
-                        for code, data in updated_data.items():
-                            data['last_updated'] = current_time
-                            self.realtime_data[code] = data
-                    self.emit_updates(updated_data)
+                    self.emit_updates(self.quotes.merge(updated_data, source))
                 logger.debug(f"[{caller}] {source} returned {len(updated_data)} stocks: ")    # {updated_data}
                 return updated_data
             except Exception as e:
@@ -310,60 +268,82 @@ class RealtimeUpdater:
                 return {}
 
     def pool_update_task(self):
+        # 阻塞等待队列，超时时间取到下一只股票到期为止；队列里积压的提交合并后一次写入
         logger.info("[global] Starting pool update task")
         print("Starting pool update task")
         while self.running:
             try:
-                updated = False
-                while True:
-                    try:
-                        new_stocks = stock_update_queue.get_nowait()
-                        caller = new_stocks.get('caller', 'unknown')
-                        codes = new_stocks.get('codes', [])
-                        logger.debug(f"[global] Retrieved from queue: {codes} from {caller}")
-                        print(f"Updated stocks from {caller}: {codes}")
-                        current_time = time.time()
-                        with self.realtime_lock:
-                            for code in codes:
-                                if code in self.stocks_pool:
-                                    self.stocks_pool[code]['sources'].add(caller)
-                                    self.stocks_pool[code]['last_updated'] = current_time
-                                else:
-                                    self.stocks_pool[code] = {'sources': {caller}, 'last_updated': current_time}
-                            logger.debug(f"[global] Updated stocks_pool: ") #{self.stocks_pool}
-                        updated = True
-                    except gevent.queue.Empty:
-                        break
-
-                # stocks_pool里面的stocks，如果超过两小时(改为4小时)，还没有接到前端来的更新要求，将从池子里删去。
-                with self.realtime_lock:
-                    expired = [code for code, info in self.stocks_pool.items() 
-                              if time.time() - info['last_updated'] > 14400]
-                    for code in expired:
-                        del self.stocks_pool[code]
-                        if code in self.realtime_data:
-                            del self.realtime_data[code]
-                    if expired:
-                        logger.debug(f"[global] Removed expired stocks: {expired}")
-                        print(f"Removed expired stocks: {expired}")
-                gevent.sleep(5)
+                try:
+                    first = stock_update_queue.get(timeout=self.next_expiry_timeout())
+                except gevent.queue.Empty:
+                    first = None
+                if first is not None:
+                    pending = {}  # caller -> codes，合并重复提交
+                    item = first
+                    while item is not None:
+                        pending.setdefault(item.get('caller', 'unknown'), set()).update(item.get('codes', []))
+                        try:
+                            item = stock_update_queue.get_nowait()
+                        except gevent.queue.Empty:
+                            item = None
+                    current_time = time.time()
+                    with self.realtime_lock:
+                        for caller, codes in pending.items():
+                            self.add_to_pool(codes, caller, current_time)
+                            logger.debug(f"[global] Retrieved from queue: {len(codes)} codes from {caller}")
+                            print(f"Updated stocks from {caller}: {sorted(codes)}")
+
+                self.expire_due_stocks()
             except Exception as e:
                 logger.error(f"[global] Error in pool update task: {str(e)}", exc_info=True)
                 gevent.sleep(5)
 
+    def next_expiry_timeout(self):
+        # 最长等待 60 秒，保证 stop() 之后任务能及时退出
+        if not self.expiry_heap:
+            return 60
+        return min(60, max(0, self.expiry_heap[0][0] - time.time()))
+
+    def expire_due_stocks(self):
+        # stocks_pool里面的stocks，如果超过4小时还没有接到前端来的更新要求，将从池子里删去。
+        # 堆中每只股票只有一项；弹出时若期间被刷新过，按新的到期时间放回
+        now = time.time()
+        expired = []
+        with self.realtime_lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                _, code = heapq.heappop(self.expiry_heap)
+                info = self.stocks_pool.get(code)
+                if info is None:
+                    continue
+                deadline = info['last_updated'] + POOL_EXPIRE_SECONDS
+                if deadline > now:
+                    heapq.heappush(self.expiry_heap, (deadline, code))
+                    continue
+                del self.stocks_pool[code]
+                self.source_index.discard_code(code)
+                expired.append(code)
+        if expired:
+            if SCHEDULER_ENABLED:
+                refresh_scheduler.unschedule(expired)
+            self.quotes.remove(expired)
+            delta_encoder.forget(expired)
+            logger.debug(f"[global] Removed expired stocks: {expired}")
+            print(f"Removed expired stocks: {expired}")
+
     def data_update_task(self, source):
         logger.info(f"[global] Starting {source} data update task")
         print(f"Starting {source} data update task")
         while self.running:
             try:
                 with self.realtime_lock:
-                    self.custom_stocks = [key for key, value in self.stocks_pool.items() if 'custom_stock' in value['sources']]
+                    custom_codes = self.source_index.codes('custom_stock')
+                    self.custom_stocks = list(custom_codes)
                     if source == 'mairui':
-                        local_stock_codes = [code for code in self.stocks_pool.keys() ] # if code not in self.custom_stocks] # 由mairui更新的股票池
+                        local_stock_codes = list(self.stocks_pool.keys()) # if code not in self.custom_stocks] # 由mairui更新的股票池
                     elif source == 'tushare':
-                        local_stock_codes = [code for code in self.stocks_pool.keys() if code not in self.custom_stocks]
+                        local_stock_codes = [code for code in self.stocks_pool.keys() if code not in custom_codes]
                     elif source == 'selenium':
-                        local_stock_codes = [code for code in self.stocks_pool.keys() if code not in self.custom_stocks]
+                        local_stock_codes = [code for code in self.stocks_pool.keys() if code not in custom_codes]
                     else:
                         logger.error(f"[global] Error source {source} ")
                         return
@@ -376,61 +356,126 @@ class RealtimeUpdater:
                         if source == 'selenium':
                             self.get_realtime_data(local_stock_codes, source, caller=f'{source}_task')
                         else:
-                            expired_codes = [code for code in local_stock_codes if code not in self.realtime_data or 
-                                            (time.time() - self.realtime_data[code].get('last_updated', 0) > 300)]
+                            expired_codes = self.quotes.stale_codes(local_stock_codes, 300)
                             if expired_codes:
                                 logger.debug(f"[global] {source} updating {len(expired_codes)} expired stocks")
-                                updated_data = self.get_realtime_data(expired_codes, source, caller=f'{source}_task')
-                                if updated_data:
-                                    with self.realtime_lock:
-                                        for code, data in updated_data.items():
-                                            data['last_updated'] = time.time()
-                                            self.realtime_data[code] = data
-                                    self.emit_updates(updated_data)
-
-                in_trading_time = is_trading_time()
-                sleep_time = DATA_SOURCES[source]['update_interval']['non_trading_time'] if not in_trading_time else DATA_SOURCES[source]['update_interval']['trading_time']
-                
-                # 交易日，盘前时间特别处理
-                from blueprints.common import is_tradingday
-                is_trading_day_flag = is_tradingday(datetime.now().date())
-                if is_trading_day_flag:
-                    current_time = datetime.now().time()
-                    target_time = get_target_time(current_time)
-                    
-                    if target_time:
-                        sleep_until_target(target_time)
-                    else:
-                        gevent.sleep(sleep_time)
+                                # get_realtime_data 内部已写入行情表并推送
+                                self.get_realtime_data(expired_codes, source, caller=f'{source}_task')
+
+                # 非交易阶段降频，但在下一次集合竞价/午后开盘时准时醒来
+                intervals = DATA_SOURCES[source]['update_interval']
+                if is_trading_time():
+                    gevent.sleep(intervals['trading_time'])
                 else:
-                    gevent.sleep(sleep_time)
-                              
+                    gevent.sleep(min(intervals['non_trading_time'], max(1, market_session.seconds_until_active())))
+
             except Exception as e:
                 logger.error(f"[global] Error in {source} data update task: {str(e)}", exc_info=True)
                 gevent.sleep(60)
         logger.info(f"[global] {source} data update task stopped")
 
+    def fetch_from_source(self, stock_codes, source, caller):
+        """从指定数据源抓取，返回实际拿到行情的股票集合"""
+        if source == 'selenium':
+            return self.fetch_selenium_async(stock_codes, caller)
+        return set(self.get_realtime_data(stock_codes, source, caller=caller, force=True).keys())
+
+    def refresh_codes(self, stock_codes, caller='arbiter'):
+        """
+        按成本把股票分配给各数据源并行抓取，某个数据源没有返回的股票在本轮内转给下一个数据源。
+
+        :return: 拿到行情的股票集合
+        """
+        pending = list(dict.fromkeys(stock_codes))
+        tried = set()
+        received = set()
+        while pending:
+            assignment, deferred = quote_arbiter.assign(pending, exclude=tried)
+            if deferred:
+                logger.debug(f"[{caller}] Quota exhausted, deferring {len(deferred)} stocks to next cycle")
+            if not assignment:
+                break
+            jobs = {source: gevent.spawn(self.fetch_from_source, codes, source, caller)
+                    for source, codes in assignment.items()}
+            gevent.joinall(list(jobs.values()))
+            pending = []
+            for source, job in jobs.items():
+                codes = assignment[source]
+                got = (job.value or set()) & set(codes)
+                quote_arbiter.report(source, len(codes), len(got))
+                received |= got
+                pending.extend(code for code in codes if code not in got)
+                tried.add(source)
+            if pending:
+                logger.debug(f"[{caller}] Re-routing {len(pending)} stocks after {sorted(tried)} missed them")
+        return received
+
+    def dispatch_refresh(self, stock_codes):
+        """分层调度器派发的一批到期股票"""
+        with app.app_context():
+            if ARBITRATION_CONFIG.get('enabled', False):
+                self.refresh_codes(stock_codes, caller='scheduler')
+            else:
+                self.get_realtime_data(stock_codes, 'mairui', caller='scheduler', force=True)
+
+    def arbitration_task(self):
+        logger.info("[global] Starting quote arbitration task")
+        print("Starting quote arbitration task")
+        intervals = ARBITRATION_CONFIG.get('interval', {'trading_time': 10, 'non_trading_time': 300})
+        while self.running:
+            try:
+                trading = is_trading_time()
+                interval = intervals['trading_time'] if trading else intervals['non_trading_time']
+                stale_codes = self.quotes.stale_codes(list(self.stocks_pool.keys()), interval)
+                if stale_codes:
+                    with app.app_context():
+                        received = self.refresh_codes(stale_codes, caller='arbiter')
+                    logger.debug(f"[global] Arbitration refreshed {len(received)}/{len(stale_codes)} stocks: {quote_arbiter.info()}")
+                gevent.sleep(interval if trading else min(interval, max(1, market_session.seconds_until_active())))
+            except Exception as e:
+                logger.error(f"[global] Error in quote arbitration task: {str(e)}", exc_info=True)
+                gevent.sleep(60)
+
     def start(self):
         if not self.running:
             with app.app_context():
                 self.sync_latest_stocks()
+                try:
+                    trading_calendar.load()
+                except Exception as e:
+                    # 交易日历加载失败不影响启动，首次查询时按重试间隔再次加载
+                    logger.error(f"[global] Failed to load trading calendar, will retry lazily: {str(e)}")
                 logger.debug(f"[global] Initial stocks_pool: {self.stocks_pool}")
                 print(f"Initial stocks pool synced with {len(self.stocks_pool)} stocks")
             
             self.running = True
+            socketio.start_background_task(daily_bar_cache.prefill, list(self.stocks_pool.keys()))
             socketio.start_background_task(self.pool_update_task)
-            self.source_tasks['mairui'] = socketio.start_background_task(self.data_update_task, 'mairui')
-            #self.source_tasks['selenium'] = socketio.start_background_task(self.data_update_task, 'selenium')
-            #self.source_tasks['tushare'] = socketio.start_background_task(self.data_update_task, 'tushare')
+            socketio.start_background_task(broadcaster.run, self.sources_for)
+            socketio.start_background_task(mairui_fetcher.probe_task)
+            scraper_client.start()
+            if SCHEDULER_ENABLED:
+                # 按看板分层、按到期时间刷新；启用 arbitration 时每批股票再在数据源之间分配
+                self.source_tasks['scheduler'] = socketio.start_background_task(
+                    refresh_scheduler.run, self.dispatch_refresh, self.sources_for, self.stocks_pool.__contains__)
+            elif ARBITRATION_CONFIG.get('enabled', False):
+                # 由调度器在多个数据源之间分配股票，取代各数据源独立刷新
+                self.source_tasks['arbiter'] = socketio.start_background_task(self.arbitration_task)
+            else:
+                self.source_tasks['mairui'] = socketio.start_background_task(self.data_update_task, 'mairui')
+                #self.source_tasks['selenium'] = socketio.start_background_task(self.data_update_task, 'selenium')
+                if DATA_SOURCES['tushare'].get('enabled', False):
+                    self.source_tasks['tushare'] = socketio.start_background_task(self.data_update_task, 'tushare')
             logger.info("[global] Realtime updater started with multi-source tasks")
             print("Realtime updater started with mairui ,tushare,and selenium tasks")
             gevent.sleep(1)
 
     def stop(self):
         self.running = False
-        self.sub_socket.close()
-        self.pub_socket.close()
-        self.zmq_context.term()
+        mairui_fetcher.stop()
+        broadcaster.stop()
+        refresh_scheduler.stop()
+        scraper_client.close()
         logger.info("[global] Realtime updater stopped")
         print("Realtime updater stopped")
 
@@ -444,24 +489,9 @@ class RealtimeUpdater:
             ma_strategy_stocks = get_latest_ma_strategy_stocks()
             current_time = time.time()
             with self.realtime_lock:
-                for code in custom_stocks:
-                    if code in self.stocks_pool:
-                        self.stocks_pool[code]['sources'].add('custom_stock')
-                        self.stocks_pool[code]['last_updated'] = current_time
-                    else:
-                        self.stocks_pool[code] = {'sources': {'custom_stock'}, 'last_updated': current_time}
-                for code in limitup_stocks:
-                    if code in self.stocks_pool:
-                        self.stocks_pool[code]['sources'].add('limitup_unfilled_orders')
-                        self.stocks_pool[code]['last_updated'] = current_time
-                    else:
-                        self.stocks_pool[code] = {'sources': {'limitup_unfilled_orders'}, 'last_updated': current_time}
-                for code in ma_strategy_stocks:
-                    if code in self.stocks_pool:
-                        self.stocks_pool[code]['sources'].add('ma_strategy')
-                        self.stocks_pool[code]['last_updated'] = current_time
-                    else:
-                        self.stocks_pool[code] = {'sources': {'ma_strategy'}, 'last_updated': current_time}
+                self.add_to_pool(custom_stocks, 'custom_stock', current_time)
+                self.add_to_pool(limitup_stocks, 'limitup_unfilled_orders', current_time)
+                self.add_to_pool(ma_strategy_stocks, 'ma_strategy', current_time)
                 logger.debug(f"[global] Synced initial stocks_pool: {self.stocks_pool}")
 
 global_updater = RealtimeUpdater()
@@ -474,5 +504,5 @@ def update_stocks_pool(new_stock_codes, caller='unknown'):
         stock_update_queue.put({'caller': caller, 'codes': list(new_stock_codes)})
 
 def get_realtime_data():
-    with global_updater.realtime_lock:
-        return global_updater.realtime_data.copy()
+    # 返回行情表的只读快照（Mapping），不复制、不加锁
+    return global_updater.quotes.snapshot()
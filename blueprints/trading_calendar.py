@@ -0,0 +1,112 @@
+# blueprints/trading_calendar.py
+# 交易日历内存索引：一次性加载 trading_day 表到有序数组，日期查询全部走二分查找
+from app_init import app, db, TradingDay
+import bisect
+import datetime
+import logging
+import time
+import gevent.lock
+import pytz
+
+logger = logging.getLogger(__name__)
+
+
+def get_beijing_today():
+    return datetime.datetime.now(pytz.timezone('Asia/Shanghai')).date()
+
+
+def to_date(value):
+    """把 datetime / date / 'YYYY-MM-DD' 字符串统一转换为 datetime.date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError("Invalid date format. Use 'YYYY-MM-DD'.")
+    raise TypeError(f"Unsupported date type: {type(value)}")
+
+
+class TradingCalendar:
+    def __init__(self, refresh_interval=86400, miss_retry_interval=60):
+        self._dates = []              # 升序排列的 datetime.date
+        self._date_set = frozenset()
+        self._loaded_at = 0
+        self._loaded_day = None
+        self._last_attempt = 0        # 最近一次尝试加载的时间，无论成功与否
+        self.refresh_interval = refresh_interval        # 定时全量刷新（默认每天一次）
+        self.miss_retry_interval = miss_retry_interval  # 两次重新加载尝试之间的最短间隔，数据库不可用时避免每次查询都重试
+        self._lock = gevent.lock.Semaphore()
+
+    def load(self):
+        self._last_attempt = time.time()
+        with app.app_context():
+            rows = db.session.query(TradingDay.trading_date).order_by(TradingDay.trading_date.asc()).all()
+        dates = sorted({to_date(r[0]) for r in rows if r[0] is not None})
+        # 整体替换引用，读者无需加锁
+        self._dates = dates
+        self._date_set = frozenset(dates)
+        self._loaded_at = time.time()
+        self._loaded_day = get_beijing_today()
+        logger.debug(f"Trading calendar loaded with {len(dates)} dates, latest: {dates[-1] if dates else None}")
+        return len(dates)
+
+    def _reload(self, reason):
+        with self._lock:
+            try:
+                logger.debug(f"Reloading trading calendar: {reason}")
+                self.load()
+            except Exception as e:
+                logger.error(f"Error loading trading calendar: {str(e)}")
+
+    def _ensure_loaded(self, target=None):
+        now = time.time()
+        if now - self._last_attempt < self.miss_retry_interval:
+            return
+        if not self._dates:
+            self._reload('initial load')
+        elif now - self._loaded_at > self.refresh_interval or get_beijing_today() != self._loaded_day:
+            self._reload('daily refresh')
+        elif target is not None and target > self._dates[-1]:
+            # 查询日期晚于已知最新交易日，可能是表里新增了日期
+            self._reload(f'date {target} beyond latest {self._dates[-1]}')
+
+    def latest(self):
+        self._ensure_loaded()
+        return self._dates[-1] if self._dates else None
+
+    def nearest(self, target_date):
+        """返回 <= target_date 的最近交易日"""
+        target = to_date(target_date)
+        self._ensure_loaded(target)
+        dates = self._dates
+        idx = bisect.bisect_right(dates, target)
+        return dates[idx - 1] if idx > 0 else None
+
+    def recent(self, target_date, days):
+        """返回 <= target_date 的最近 days 个交易日，按日期倒序"""
+        target = to_date(target_date)
+        self._ensure_loaded(target)
+        dates = self._dates
+        idx = bisect.bisect_right(dates, target)
+        return dates[max(0, idx - days):idx][::-1]
+
+    def next_date(self, target_date):
+        """返回 > target_date 的下一个交易日"""
+        target = to_date(target_date)
+        self._ensure_loaded(target)
+        dates = self._dates
+        idx = bisect.bisect_right(dates, target)
+        return dates[idx] if idx < len(dates) else None
+
+    def is_trading_day(self, target_date):
+        target = to_date(target_date)
+        self._ensure_loaded(target)
+        return target in self._date_set
+
+
+trading_calendar = TradingCalendar()
@@ -0,0 +1,42 @@
+# blueprints/tushare_fetcher.py
+# tushare 实时行情批量抓取：按 limits.per_minute 用令牌桶限速，多个批次同时在途，
+# 已返回的批次边解析边等待其余批次，不再“请求-休眠-请求”串行执行
+from blueprints.mairui_fetcher import TokenBucket
+import logging
+import time
+import tushare as ts
+from gevent.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+
+class TushareFetcher:
+    def __init__(self, source_config):
+        self.batch_size = source_config.get('batch_size', 10)
+        self.concurrency = source_config.get('max_concurrency', 3)
+        per_minute = source_config['limits']['per_minute']
+        self.bucket = TokenBucket(per_minute / 60.0, source_config.get('burst', 1))
+        self.stats = {'requests': 0, 'errors': 0}
+
+    def _fetch_batch(self, batch, caller):
+        self.bucket.acquire()
+        self.stats['requests'] += 1
+        try:
+            return ts.realtime_quote(ts_code=','.join(batch))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"[{caller}] Tushare realtime_quote failed for {batch}: {str(e)}")
+            return None
+
+    def iter_frames(self, ts_codes, caller='global'):
+        """按完成顺序逐批产出 realtime_quote 的 DataFrame，调用方解析时其余批次仍在请求中"""
+        start_time = time.time()
+        batches = [ts_codes[i:i + self.batch_size] for i in range(0, len(ts_codes), self.batch_size)]
+        pool = Pool(self.concurrency)
+        received = 0
+        for df in pool.imap_unordered(lambda batch: self._fetch_batch(batch, caller), batches):
+            if df is not None and not df.empty:
+                received += len(df)
+                yield df
+        logger.debug(f"[{caller}] Tushare fetched {received}/{len(ts_codes)} stocks in {len(batches)} batches, "
+                     f"{time.time() - start_time:.2f} seconds")
@@ -0,0 +1,266 @@
+import zmq
+import zmq.asyncio
+import logging
+import yaml
+import asyncio
+import time
+from collections import deque
+from blueprints import scraper_protocol as protocol
+
+# 抓取任务 broker：前端与 selenium_server 单进程模式的协议相同，更新服务无需改动；
+# 每个请求拆成小任务排队，抓取 worker（python selenium_server.py --worker）按自己的空闲额度拉取，
+# 处理快的 worker 自然拿到更多任务。增加 worker 进程（本机更多核或其他机器）即可提高抓取吞吐
+
+logging.basicConfig(
+    level=logging.ERROR,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='C:\\WebApp\\server\\scraper_broker.log',
+    filemode='a',
+    encoding='utf-8'  # 强制 UTF-8 编码
+)
+
+logger = logging.getLogger(__name__)
+
+with open('config.yaml', 'r') as f:
+    config = yaml.safe_load(f)
+BROKER_CONFIG = config['data_sources']['selenium'].get('broker', {})
+
+
+class WorkerState:
+    def __init__(self, identity):
+        self.identity = identity
+        self.credit = 0             # 还能再派发的任务数
+        self.jobs = set()           # 已派发、未完成的任务ID
+        self.last_seen = time.time()
+        self.completed_jobs = 0
+        self.quotes = 0
+        self.rate = 0.0             # 最近一个统计周期的行情数/秒
+        self._quotes_at_last_stats = 0
+
+    def to_dict(self):
+        return {
+            'credit': self.credit,
+            'jobs': len(self.jobs),
+            'completed_jobs': self.completed_jobs,
+            'quotes': self.quotes,
+            'rate': round(self.rate, 2),
+            'idle_seconds': round(time.time() - self.last_seen, 1),
+        }
+
+
+class Job:
+    def __init__(self, job_id, request, codes):
+        self.id = job_id
+        self.request = request
+        self.pending = set(codes)   # 尚未收到行情的股票
+        self.worker = None
+        self.enqueued_at = time.time()  # 最近一次进入队列的时间，worker 离线转派时重置
+
+
+class Request:
+    def __init__(self, request_id, client):
+        self.id = request_id
+        self.client = client
+        self.jobs = set()
+        self.missing = []
+
+
+class ScraperBroker:
+    def __init__(self, frontend, backend, chunk_size=10, heartbeat_interval=5, heartbeat_liveness=3,
+                 job_timeout=60, stats_interval=60):
+        self.frontend = frontend
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_liveness = heartbeat_liveness
+        self.job_timeout = job_timeout          # 排队超过这么久仍没有 worker 处理的任务按缺失返回
+        self.stats_interval = stats_interval
+        self.workers = {}                       # identity -> WorkerState
+        self.jobs = {}                          # 任务ID -> Job
+        self.queue = deque()                    # 等待派发的 Job
+        self._job_seq = 0
+
+    async def reply(self, client, message):
+        await self.frontend.send_multipart([client, protocol.pack(message)])
+
+    async def send_worker(self, identity, message):
+        await self.backend.send_multipart([identity, protocol.pack(message)])
+
+    # ---- 前端：更新服务 ----
+    async def frontend_loop(self):
+        while True:
+            try:
+                client, frame = await self.frontend.recv_multipart()
+                message = protocol.unpack(frame)
+            except Exception as e:
+                logger.error(f"Invalid frontend message: {e}")
+                continue
+            kind = message.get('type')
+            if kind == protocol.PING:
+                await self.reply(client, {'type': protocol.PONG})
+            elif kind == protocol.STATS:
+                await self.reply(client, {'type': protocol.STATS, 'workers': self.info(), 'queued': len(self.queue)})
+            elif kind == protocol.REQUEST:
+                await self.submit(client, message)
+            else:
+                logger.warning(f"Unknown frontend message type: {kind}")
+
+    async def submit(self, client, message):
+        request = Request(message.get('id'), client)
+        codes = list(dict.fromkeys(message.get('stocks', [])))
+        logger.debug(f"Request {request.id} for {len(codes)} stocks")
+        if not codes:
+            await self.reply(client, {'type': protocol.DONE, 'id': request.id, 'missing': []})
+            return
+        for i in range(0, len(codes), self.chunk_size):
+            self._job_seq += 1
+            job = Job(f"{self._job_seq}", request, codes[i:i + self.chunk_size])
+            request.jobs.add(job.id)
+            self.jobs[job.id] = job
+            self.queue.append(job)
+        await self.dispatch()
+
+    async def finish_job(self, job, missing=()):
+        self.jobs.pop(job.id, None)
+        request = job.request
+        request.jobs.discard(job.id)
+        request.missing.extend(missing)
+        if not request.jobs:
+            await self.reply(request.client, {'type': protocol.DONE, 'id': request.id, 'missing': request.missing})
+            logger.debug(f"Request {request.id} done, missing {len(request.missing)} stocks")
+
+    # ---- 后端：抓取 worker ----
+    async def backend_loop(self):
+        while True:
+            try:
+                identity, frame = await self.backend.recv_multipart()
+                message = protocol.unpack(frame)
+            except Exception as e:
+                logger.error(f"Invalid backend message: {e}")
+                continue
+            kind = message.get('type')
+            worker = self.workers.get(identity)
+            if worker is None:
+                worker = self.workers[identity] = WorkerState(identity)
+                logger.info(f"Worker {identity.hex()} connected, {len(self.workers)} workers")
+                if kind != protocol.READY:
+                    # broker 重启或曾判定该 worker 离线，让它重新报告空闲额度
+                    await self.send_worker(identity, {'type': protocol.RESET})
+            worker.last_seen = time.time()
+
+            if kind == protocol.READY:
+                worker.credit += message.get('credit', 1)
+                await self.dispatch()
+            elif kind == protocol.HEARTBEAT:
+                await self.send_worker(identity, {'type': protocol.HEARTBEAT})
+            elif kind == protocol.QUOTE:
+                job = self.jobs.get(message.get('id'))
+                if job is None:
+                    continue
+                data = message.get('data', {})
+                job.pending.difference_update(data.keys())
+                worker.quotes += len(data)
+                await self.reply(job.request.client, {'type': protocol.QUOTE, 'id': job.request.id, 'data': data})
+            elif kind in (protocol.DONE, protocol.ERROR):
+                job = self.jobs.get(message.get('id'))
+                worker.jobs.discard(message.get('id'))
+                # 只有仍归属该 worker 的任务才归还额度；broker 已遗忘或已转派的任务，
+                # worker 在收到 reset 时记下，结束后自行补发 ready(1)，这里不重复归还
+                if job is None or job.worker != identity:
+                    continue
+                worker.credit += 1
+                worker.completed_jobs += 1
+                await self.finish_job(job, sorted(job.pending))
+                await self.dispatch()
+            else:
+                logger.warning(f"Unknown backend message type: {kind}")
+
+    async def dispatch(self):
+        while self.queue:
+            available = [w for w in self.workers.values() if w.credit > 0]
+            if not available:
+                return
+            # 额度最多的 worker 优先，额度相同时选在途任务少的
+            worker = max(available, key=lambda w: (w.credit, -len(w.jobs)))
+            job = self.queue.popleft()
+            job.worker = worker.identity
+            worker.credit -= 1
+            worker.jobs.add(job.id)
+            await self.send_worker(worker.identity, {'type': protocol.JOB, 'id': job.id, 'stocks': sorted(job.pending)})
+
+    # ---- 维护：worker 存活、排队超时、吞吐统计 ----
+    async def purge_workers(self):
+        deadline = time.time() - self.heartbeat_interval * self.heartbeat_liveness
+        for identity, worker in list(self.workers.items()):
+            if worker.last_seen >= deadline:
+                continue
+            del self.workers[identity]
+            requeued = [self.jobs[job_id] for job_id in worker.jobs if job_id in self.jobs]
+            for job in requeued:
+                job.worker = None
+                job.enqueued_at = time.time()
+                self.queue.appendleft(job)
+            logger.warning(f"Worker {identity.hex()} lost, re-queued {len(requeued)} jobs")
+        await self.dispatch()
+
+    async def expire_jobs(self):
+        now = time.time()
+        expired = [job for job in self.queue if now - job.enqueued_at > self.job_timeout]
+        if not expired:
+            return
+        logger.warning(f"{len(expired)} jobs waited over {self.job_timeout}s without a worker")
+        for job in expired:
+            self.queue.remove(job)
+            await self.finish_job(job, sorted(job.pending))
+
+    def update_rates(self, elapsed):
+        for worker in self.workers.values():
+            worker.rate = (worker.quotes - worker._quotes_at_last_stats) / elapsed
+            worker._quotes_at_last_stats = worker.quotes
+
+    def info(self):
+        return {identity.hex(): worker.to_dict() for identity, worker in self.workers.items()}
+
+    async def maintain(self):
+        last_stats = time.time()
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.purge_workers()
+                await self.expire_jobs()
+                now = time.time()
+                if now - last_stats >= self.stats_interval:
+                    self.update_rates(now - last_stats)
+                    last_stats = now
+                    logger.info(f"Workers: {self.info()}, queued jobs: {len(self.queue)}")
+            except Exception as e:
+                logger.error(f"Error in broker maintenance: {e}")
+
+    async def serve(self):
+        asyncio.create_task(self.backend_loop())
+        asyncio.create_task(self.maintain())
+        await self.frontend_loop()
+
+
+async def main():
+    context = zmq.asyncio.Context()
+    frontend = context.socket(zmq.ROUTER)
+    frontend_bind = BROKER_CONFIG.get('frontend', protocol.DEFAULT_BIND)
+    frontend.bind(frontend_bind)
+    backend = context.socket(zmq.ROUTER)
+    backend_bind = BROKER_CONFIG.get('backend', protocol.DEFAULT_BACKEND_BIND)
+    backend.bind(backend_bind)
+    logger.info(f"Scraper broker started, frontend {frontend_bind}, backend {backend_bind}")
+
+    broker = ScraperBroker(
+        frontend, backend,
+        chunk_size=BROKER_CONFIG.get('chunk_size', 10),
+        heartbeat_interval=BROKER_CONFIG.get('heartbeat_interval', 5),
+        heartbeat_liveness=BROKER_CONFIG.get('heartbeat_liveness', 3),
+        job_timeout=BROKER_CONFIG.get('job_timeout', 60),
+        stats_interval=BROKER_CONFIG.get('stats_interval', 60)
+    )
+    await broker.serve()
+
+if __name__ == "__main__":
+    asyncio.run(main())
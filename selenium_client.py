@@ -1,56 +1,65 @@
 import zmq
 import time
+import uuid
+from blueprints import scraper_protocol as protocol
 
 class RealtimeUpdater:
-    def __init__(self):
+    def __init__(self, endpoint=protocol.DEFAULT_ENDPOINT):
         self.context = zmq.Context()
-        # 用于发送请求的 PUB socket
-        self.pub_socket = self.context.socket(zmq.PUB)
-        self.pub_socket.connect("tcp://127.0.0.1:5556")
-        # 用于接收数据的 SUB socket
-        self.sub_socket = self.context.socket(zmq.SUB)
-        self.sub_socket.connect("tcp://127.0.0.1:5555")
-        self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
+        # DEALER socket：请求和回复都走同一个连接，回复按请求 ID 对应
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(endpoint)
 
-    def get_realtime_data(self, stock_codes):
-        """向 Selenium 服务器请求实时股票数据并接收分片结果"""
+    def get_realtime_data(self, stock_codes, idle_timeout=10):
+        """向 Selenium 服务器请求实时股票数据，逐只接收结果"""
         updated_data = {}
+        request_id = uuid.uuid4().hex
         try:
-            # 发送请求
-            request = {"stocks": stock_codes}
-            self.pub_socket.send_json(request)
-            print(f"Sent request for stocks: {stock_codes}")
-            time.sleep(1)  # 短暂延迟，确保订阅生效
+            # 发送请求，不需要等待订阅生效
+            self.socket.send(protocol.pack({"type": protocol.REQUEST, "id": request_id, "stocks": stock_codes}))
+            print(f"Sent request {request_id} for stocks: {stock_codes}")
 
-            # 接收分片数据
-            done = False
-            while not done:
-                if self.sub_socket.poll(10000):  # 等待最多 10 秒
-                    data = self.sub_socket.recv_json()
-                    if "done" in data and data["done"]:
-                        print("Received completion signal")
-                        done = True
-                    else:
-                        print(f"Received batch data: {data}")
-                        updated_data.update(data)
-                else:
+            while True:
+                if not self.socket.poll(idle_timeout * 1000):  # 连续 idle_timeout 秒没有回复
                     print("[Error] Timeout waiting for Selenium response")
                     break
+                message = protocol.unpack(self.socket.recv())
+                if message.get("id") != request_id:
+                    continue  # 之前超时请求的迟到回复
+                if message["type"] == protocol.QUOTE:
+                    print(f"Received data: {message['data']}")
+                    updated_data.update(message["data"])
+                elif message["type"] == protocol.DONE:
+                    print(f"Received completion signal, missing: {message.get('missing', [])}")
+                    break
+                elif message["type"] == protocol.ERROR:
+                    print(f"[Error] Request failed: {message.get('reason')}")
+                    break
         except Exception as e:
             print(f"[Error] ZMQ communication failed: {e}")
         finally:
             return updated_data
 
+    def ping(self, timeout=3):
+        """检查 Selenium 服务器是否在线"""
+        start = time.time()
+        self.socket.send(protocol.pack({"type": protocol.PING}))
+        while self.socket.poll(timeout * 1000):
+            if protocol.unpack(self.socket.recv()).get("type") == protocol.PONG:
+                return time.time() - start
+        return None
+
     def close(self):
         """清理资源"""
-        self.sub_socket.close()
-        self.pub_socket.close()
+        self.socket.close()
         self.context.term()
 
 # 使用示例
 if __name__ == "__main__":
     updater = RealtimeUpdater()
+    print("Ping:", updater.ping())
     stocks = ["600519", "000158", "600602"]  # 需要查询的股票代码
     result = updater.get_realtime_data(stocks)
     print("Received Realtime Data:", result)
-    updater.close()
\ No newline at end of file
+    updater.close()
@@ -3,10 +3,21 @@ import logging
 from playwright.async_api import async_playwright
 import yaml
 import asyncio
+import argparse
 import zmq.asyncio
-from concurrent.futures import ThreadPoolExecutor
-import math
+from blueprints import scraper_protocol as protocol
+from contextlib import asynccontextmanager
+import os
 import time
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import aiohttp
+    import lxml.html
+except ImportError:
+    aiohttp = None
 
 # 设置日志级别为 DEBUG，输出到文件
 logging.basicConfig(
@@ -35,130 +46,358 @@ def get_stock_prefix(stock_code):
         return 'sh'
     return ''
 
-async def fetch_one_stock(browser, code, url_template):
+# 行情表由服务端渲染，提取时不需要这些资源
+DEFAULT_BLOCKED_RESOURCES = ('image', 'stylesheet', 'font', 'media', 'script', 'xhr', 'fetch', 'websocket', 'other')
+
+class BrowserPool:
+    """
+    常驻的 Chromium：浏览器只启动一次，context/page 用完放回空闲列表复用，
+    并发页面数由信号量限制。导航次数达到 recycle_after 或浏览器进程内存超过 max_rss_mb 时
+    启动新浏览器替换旧的，旧浏览器在其页面全部归还后关闭。
+    """
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
+    def __init__(self, max_pages=10, recycle_after=500, max_rss_mb=1024, check_interval=60, blocked_resources=()):
+        self.max_pages = max_pages
+        self.blocked_resources = frozenset(blocked_resources)   # 直接中止的资源类型，如 image/stylesheet
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.check_interval = check_interval
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self.browser = None
+        self.generation = 0
+        self.navigations = 0        # 当前浏览器的导航次数
+        self._idle = []             # [(generation, context, page)]
+        self._in_use = {}           # generation -> 借出的页面数
+        self._retired = {}          # generation -> 等待关闭的旧浏览器
+        self.stats = {'recycles': 0, 'pages_created': 0, 'blocked_requests': 0}
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(headless=True)
+        logger.info(f"Browser pool started with {self.max_pages} pages")
+
+    async def _ensure_started(self):
+        # HTTP 模式下只有回退时才需要浏览器，首次借页面时再启动
+        if self.browser is None:
+            await self.start()
+
+    async def close(self):
+        for _, context, _ in self._idle:
+            await self._close_context(context)
+        self._idle.clear()
+        for browser in [self.browser, *self._retired.values()]:
+            if browser is not None:
+                await browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    async def _close_context(self, context):
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context: {e}")
+
+    async def _new_slot(self):
+        # 设置明确的语言和编码头
+        context = await self.browser.new_context(
+            user_agent=self.USER_AGENT,
+            locale="zh-CN",
+            timezone_id="Asia/Shanghai",
+            extra_http_headers={
+                "Accept-Language": "zh-CN,zh;q=0.9",
+                "Accept-Encoding": "gzip, deflate, br",
+                "Content-Type": "text/html; charset=utf-8"
+            }
+        )
+        if self.blocked_resources:
+            await context.route("**/*", self._route)
+        page = await context.new_page()
+        self.stats['pages_created'] += 1
+        return self.generation, context, page
+
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked_resources:
+            self.stats['blocked_requests'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def page(self):
+        """借出一个页面；页面出错时丢弃，不放回空闲列表"""
+        async with self._semaphore:
+            async with self._lock:
+                await self._ensure_started()
+                slot = self._idle.pop() if self._idle else await self._new_slot()
+            generation, context, page = slot
+            self._in_use[generation] = self._in_use.get(generation, 0) + 1
+            self.navigations += 1
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                self._in_use[generation] -= 1
+                await self._release(slot, healthy)
+
+    async def _release(self, slot, healthy):
+        generation, context, page = slot
+        if healthy and generation == self.generation and not page.is_closed():
+            self._idle.append(slot)
+        else:
+            await self._close_context(context)
+        browser = self._retired.get(generation)
+        if browser is not None and not self._in_use.get(generation):
+            del self._retired[generation]
+            await browser.close()
+            logger.info(f"Closed retired browser generation {generation}")
+
+    def rss_mb(self):
+        """浏览器相关子进程的常驻内存（MB），未安装 psutil 时返回 None"""
+        if psutil is None:
+            return None
+        try:
+            children = psutil.Process(os.getpid()).children(recursive=True)
+            return sum(child.memory_info().rss for child in children) / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    def needs_recycle(self):
+        if self.navigations >= self.recycle_after:
+            return f"{self.navigations} navigations"
+        rss = self.rss_mb()
+        if rss is not None and rss > self.max_rss_mb:
+            return f"RSS {rss:.0f}MB"
+        return None
+
+    async def recycle(self, reason):
+        async with self._lock:
+            old_generation, old_browser = self.generation, self.browser
+            self.browser = await self._playwright.chromium.launch(headless=True)
+            self.generation += 1
+            self.navigations = 0
+            idle, self._idle = self._idle, []
+            self.stats['recycles'] += 1
+        for _, context, _ in idle:
+            await self._close_context(context)
+        if self._in_use.get(old_generation):
+            self._retired[old_generation] = old_browser
+        else:
+            await old_browser.close()
+        logger.info(f"Recycled browser ({reason}), generation {self.generation}")
+
+    async def maintain(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if self.browser is None:
+                continue
+            try:
+                reason = self.needs_recycle()
+                if reason:
+                    await self.recycle(reason)
+            except Exception as e:
+                logger.error(f"Error recycling browser: {e}")
+
+
+# 一次 evaluate 取回整张键值表，避免逐个单元格 inner_text 的往返
+EXTRACT_TABLE_JS = """
+(table) => {
+    const data = {};
+    for (const td of table.querySelectorAll('td')) {
+        const parts = td.innerText.split('：');
+        if (parts.length === 2) {
+            const key = parts[0].trim();
+            if (key) data[key] = parts[1].trim();
+        }
+    }
+    return data;
+}
+"""
+
+async def extract_table_legacy(table, code):
+    rows = await table.query_selector_all("tr")
+    data = {}
+    for row in rows:
+        tds = await row.query_selector_all("td")
+        for td in tds:
+            text = await td.inner_text()
+            # 确保文本正确解码
+            try:
+                text = text.encode().decode('utf-8', errors='replace')  # 强制 UTF-8，替换无效字符
+            except Exception as decode_err:
+                logger.warning(f"Decoding error for {code}: {decode_err}, raw text: {text}")
+                continue
+
+            key_value = text.split("：")
+            if len(key_value) == 2:
+                key, value = key_value
+                key = key.strip()
+                value = value.strip()
+                if key:  # 跳过空键
+                    data[key] = value
+    return data
+
+def parse_quote(code, data):
+    """把行情表的键值对转换为 {code: {'RealtimePrice', 'RealtimeChange', 'last_updated'}}"""
     updated_data = {}
-    prefixed_code = f"{get_stock_prefix(code)}{code}"
-    url = url_template.format(code=prefixed_code)
+    price_str = data.get("最新", "0")
+    prev_close_str = data.get("昨收", "0")
     
-    # 设置明确的语言和编码头
-    context = await browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        locale="zh-CN",
-        timezone_id="Asia/Shanghai",
-        extra_http_headers={
-            "Accept-Language": "zh-CN,zh;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Content-Type": "text/html; charset=utf-8"
+    try:
+        price = float(price_str.replace(',', '')) if price_str and price_str != '-' else 0
+        prev_close = float(prev_close_str.replace(',', '')) if prev_close_str and prev_close_str != '-' else 0
+        updated_data[code] = {
+            'RealtimePrice': price,
+            'RealtimeChange': round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2),
+            'last_updated': time.time()
         }
-    )
-    page = await context.new_page()
-    
+        logger.debug(f"Parsed data for {code}: {updated_data[code]}")
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Failed to parse price data for {code}: {e}, price_str: '{price_str}', prev_close_str: '{prev_close_str}', raw data: {data}")
+        updated_data[code] = {
+            'RealtimePrice': 0,
+            'RealtimeChange': 0,
+            'last_updated': time.time()
+        }
+    return updated_data
+
+async def fetch_one_stock(pool, code, url_template):
+    prefixed_code = f"{get_stock_prefix(code)}{code}"
+    url = url_template.format(code=prefixed_code)
+    fast = DATA_SOURCES['selenium'].get('extraction', 'fast') == 'fast'
+
     try:
-        print(f"Fetching data for stock {code} from {url}")
-        logger.debug(f"Navigating to {url} for {code}")
-        goto_timeout = DATA_SOURCES['selenium'].get('timeouts', {}).get('goto', 30000)
-        selector_timeout = DATA_SOURCES['selenium'].get('timeouts', {}).get('selector', 10000)
-        await page.goto(url, wait_until="domcontentloaded", timeout=goto_timeout)
-        
-        # 检查页面内容和编码
-        html_content = await page.content()
-        logger.debug(f"Page content preview for {code}: {html_content[:200]}")  # 记录前 200 字符
-        
-        table = await page.wait_for_selector("div.sider_brief table.t1", timeout=selector_timeout)
-        if not table:
-            logger.warning(f"Table 'div.sider_brief table.t1' not found for {code} at {url}")
-            return updated_data
-
-        rows = await table.query_selector_all("tr")
-        data = {}
-        for row in rows:
-            tds = await row.query_selector_all("td")
-            for td in tds:
-                text = await td.inner_text()
-                # 确保文本正确解码
-                try:
-                    text = text.encode().decode('utf-8', errors='replace')  # 强制 UTF-8，替换无效字符
-                except Exception as decode_err:
-                    logger.warning(f"Decoding error for {code}: {decode_err}, raw text: {text}")
-                    continue
-                
-                key_value = text.split("：")
-                if len(key_value) == 2:
-                    key, value = key_value
-                    key = key.strip()
-                    value = value.strip()
-                    if key:  # 跳过空键
-                        data[key] = value
-        
+        async with pool.page() as page:
+            logger.debug(f"Fetching data for stock {code} from {url}")
+            goto_timeout = DATA_SOURCES['selenium'].get('timeouts', {}).get('goto', 30000)
+            selector_timeout = DATA_SOURCES['selenium'].get('timeouts', {}).get('selector', 10000)
+            await page.goto(url, wait_until="domcontentloaded", timeout=goto_timeout)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                # 检查页面内容和编码
+                html_content = await page.content()
+                logger.debug(f"Page content preview for {code}: {html_content[:200]}")  # 记录前 200 字符
+
+            table = await page.wait_for_selector("div.sider_brief table.t1", state="attached", timeout=selector_timeout)
+            if not table:
+                logger.warning(f"Table 'div.sider_brief table.t1' not found for {code} at {url}")
+                return {}
+
+            if fast:
+                data = await table.evaluate(EXTRACT_TABLE_JS)
+            else:
+                data = await extract_table_legacy(table, code)
+
         logger.debug(f"Raw data for {code}: {data}")
-        
-        price_str = data.get("最新", "0")
-        prev_close_str = data.get("昨收", "0")
-        
-        try:
-            price = float(price_str.replace(',', '')) if price_str and price_str != '-' else 0
-            prev_close = float(prev_close_str.replace(',', '')) if prev_close_str and prev_close_str != '-' else 0
-            updated_data[code] = {
-                'RealtimePrice': price,
-                'RealtimeChange': round(((price - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2),
-                'last_updated': time.time()
-            }
-            logger.debug(f"Parsed data for {code}: {updated_data[code]}")
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Failed to parse price data for {code}: {e}, price_str: '{price_str}', prev_close_str: '{prev_close_str}', raw data: {data}")
-            updated_data[code] = {
-                'RealtimePrice': 0,
-                'RealtimeChange': 0,
-                'last_updated': time.time()
-            }
-        return updated_data
+        return parse_quote(code, data)
     except Exception as e:
         logger.error(f"Error fetching {code} from {url}: {e}")
         return {}
-    finally:
+
+QUOTE_TABLE_XPATH = ("//div[contains(concat(' ', normalize-space(@class), ' '), ' sider_brief ')]"
+                     "//table[contains(concat(' ', normalize-space(@class), ' '), ' t1 ')]")
+
+def parse_table_html(content):
+    """从页面 HTML 中解析 sider_brief 行情表，找不到表或缺少最新价时返回 None"""
+    document = lxml.html.fromstring(content)
+    tables = document.xpath(QUOTE_TABLE_XPATH)
+    if not tables:
+        return None
+    data = {}
+    for td in tables[0].iter('td'):
+        key_value = td.text_content().split("：")
+        if len(key_value) == 2:
+            key = key_value[0].strip()
+            if key:
+                data[key] = key_value[1].strip()
+    return data if "最新" in data else None
+
+class HttpQuoteFetcher:
+    """
+    不经过浏览器，直接请求服务端渲染的行情页并解析表格。
+    解析失败（页面结构变化、反爬页面等）的股票由调用方交给 Playwright。
+    """
+    def __init__(self, max_connections=20, timeout=10):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+        self.stats = {'parsed': 0, 'fallbacks': 0}
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "User-Agent": BrowserPool.USER_AGENT,
+                "Accept-Language": "zh-CN,zh;q=0.9",
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        logger.info(f"HTTP quote fetcher started with {self.max_connections} connections")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch_one(self, code, url_template):
+        """返回 {code: quote}；请求或解析失败时返回 None"""
+        url = url_template.format(code=f"{get_stock_prefix(code)}{code}")
         try:
-            await page.close()
-            await context.close()
-        except Exception as close_err:
-            logger.warning(f"Error closing page/context for {code}: {close_err}")
-
-async def fetch_stock_batch(batch_codes, url_template):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        tasks = [fetch_one_stock(browser, code, url_template) for code in batch_codes]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        await browser.close()
-    
-    valid_results = {}
-    missing_codes = set(batch_codes)
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                body = await response.read()
+                # 响应头声明了编码时按其解码，否则交给 lxml 根据 meta charset 判断
+                content = body.decode(response.charset, errors='replace') if response.charset else body
+            data = parse_table_html(content)
+        except Exception as e:
+            logger.warning(f"HTTP fetch failed for {code} from {url}: {e}")
+            data = None
+        if data is None:
+            self.stats['fallbacks'] += 1
+            return None
+        self.stats['parsed'] += 1
+        logger.debug(f"Raw data for {code} (http): {data}")
+        return parse_quote(code, data)
+
+async def fetch_code(pool, code, url_template, http_fetcher=None):
+    """HTTP 优先，解析失败时交给浏览器；返回 quote，失败返回 None"""
+    result = None
+    if http_fetcher is not None:
+        result = await http_fetcher.fetch_one(code, url_template)
+        if result is None:
+            logger.debug(f"Falling back to browser for {code}")
+    if result is None:
+        result = await fetch_one_stock(pool, code, url_template)
+    data = result.get(code) if result else None
+    if not data or 'RealtimePrice' not in data:
+        logger.warning(f"Invalid data for {code}: {data}")
+        return None
     async with data_lock:
-        for result in results:
-            if isinstance(result, dict):
-                valid_results.update(result)
-                for code in result:
-                    missing_codes.discard(code)
-        
-        for code, data in valid_results.items():
-            if not data or 'RealtimePrice' not in data:
-                logger.warning(f"Invalid data for {code}: {data}")
-                del valid_results[code]
-                missing_codes.add(code)
-            else:
-                realtime_data[code] = data
-    
-    if missing_codes:
-        logger.warning(f"Missing or invalid data in batch for codes: {missing_codes}")
-    return valid_results
+        realtime_data[code] = data
+    return data
+
+async def fetch_code_with_retry(pool, code, url_template, http_fetcher=None, retries=2, timeout=60):
+    for attempt in range(retries + 1):
+        try:
+            data = await asyncio.wait_for(fetch_code(pool, code, url_template, http_fetcher), timeout=timeout)
+            if data is not None:
+                return code, data
+        except Exception as e:
+            logger.warning(f"Fetching {code} failed on attempt {attempt + 1}/{retries + 1}: {e}")
+    return code, None
 
-def process_batch_sync(batch_codes, url_template):
-    return asyncio.run(fetch_stock_batch(batch_codes, url_template))
+async def fetch_stock_data(stock_codes, send, fetch):
+    """
+    抓取一批股票，每拿到一只就通过 send({code: quote}) 发送。
 
-async def fetch_stock_data(stock_codes, url_template, socket):
-    batch_size = 30
-    num_batches = math.ceil(len(stock_codes) / batch_size)
-    max_workers = min(10, max(1, len(stock_codes) // 20))
-    
-    logger.debug(f"Processing {len(stock_codes)} stocks in {num_batches} batches with {max_workers} workers")
+    :param fetch: fetch(code) -> (code, quote 或 None)
+
+    :return: 没有拿到行情的股票
+    """
+    logger.debug(f"Processing {len(stock_codes)} stocks")
     
     current_time = time.time()
     cached_data = {}
@@ -174,29 +413,22 @@ async def fetch_stock_data(stock_codes, url_template, socket):
                 to_fetch.append(code)
     
     if cached_data:
-        await socket.send_json(cached_data)
+        await send(cached_data)
         logger.debug(f"Sent cached data for {len(cached_data)} stocks: {cached_data}")
     
-    if to_fetch:
-        batches = [to_fetch[i:i + batch_size] for i in range(0, len(to_fetch), batch_size)]
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(process_batch_sync, batch, url_template) for batch in batches]
-            for idx, future in enumerate(futures, 1):
-                retries = 2
-                for attempt in range(retries + 1):
-                    try:
-                        data = future.result(timeout=60)
-                        await socket.send_json(data)
-                        logger.debug(f"Sent batch {idx}/{num_batches} data: {data}")
-                        break
-                    except Exception as e:
-                        if attempt < retries:
-                            logger.warning(f"Batch {idx} failed on attempt {attempt + 1}/{retries + 1}: {e}, retrying...")
-                        else:
-                            logger.error(f"Batch {idx} failed after {retries + 1} attempts: {e}")
+    missing = []
+    # 哪只先完成先发送
+    tasks = [fetch(code) for code in to_fetch]
+    for future in asyncio.as_completed(tasks):
+        code, data = await future
+        if data is None:
+            missing.append(code)
+        else:
+            await send({code: data})
     
-    await socket.send_json({"done": True})
-    logger.debug("Sent completion signal: {'done': True}")
+    if missing:
+        logger.warning(f"Missing or invalid data for codes: {missing}")
+    return missing
 
 async def clean_expired_data():
     while True:
@@ -211,33 +443,210 @@ async def clean_expired_data():
             logger.debug(f"Cleaned {len(expired)} expired entries from realtime_data: {expired}")
         await asyncio.sleep(3600)
 
-async def main():
-    context = zmq.asyncio.Context()
-    socket = context.socket(zmq.PUB)
-    socket.bind("tcp://*:5555")
-    logger.info("Selenium Server (PUB) started on port 5555...")
-    print("Selenium Server started on port 5555...")
+class SingleFlight:
+    """
+    同一只股票同时只抓一次：后到的请求挂到正在进行的抓取上共享结果。
+    抓取在独立任务中执行，发起它的请求被取消也不影响其它等待者；
+    所有请求共用一个信号量限制同时抓取的股票数。
+    """
+    def __init__(self, max_concurrency=32):
+        self.inflight = {}          # code -> asyncio.Task
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = {'started': 0, 'joined': 0}
 
-    sub_socket = context.socket(zmq.SUB)
-    sub_socket.bind("tcp://*:5556")
-    sub_socket.setsockopt_string(zmq.SUBSCRIBE, "")
+    async def _run(self, fetch):
+        async with self.semaphore:
+            return await fetch()
 
-    url_template = DATA_SOURCES['selenium']['url_template']
+    async def run(self, code, fetch):
+        task = self.inflight.get(code)
+        if task is None:
+            task = asyncio.create_task(self._run(fetch))
+            self.inflight[code] = task
+            task.add_done_callback(lambda _: self.inflight.pop(code, None))
+            self.stats['started'] += 1
+        else:
+            self.stats['joined'] += 1
+            logger.debug(f"Joining in-flight fetch for {code}")
+        return await asyncio.shield(task)
 
-    asyncio.create_task(clean_expired_data())
+class ScraperServer:
+    """
+    ROUTER 端：按请求 ID 逐只回复行情，ping 由接收循环立即回复，不受抓取进度影响。
+    每个请求在独立任务中处理，大批量刷新不会阻塞之后的小请求。
+    """
+    def __init__(self, socket, url_template, pool, http_fetcher=None, max_concurrency=32):
+        self.socket = socket
+        self.url_template = url_template
+        self.pool = pool
+        self.http_fetcher = http_fetcher
+        self.flights = SingleFlight(max_concurrency)
+        self.tasks = set()
+
+    def fetch(self, code):
+        return self.flights.run(code, lambda: fetch_code_with_retry(self.pool, code, self.url_template, self.http_fetcher))
+
+    async def reply(self, identity, message):
+        await self.socket.send_multipart([identity, protocol.pack(message)])
+
+    def _orphan_done(self, task):
+        # broker 不会为已遗忘的任务归还额度，任务结束时由 worker 自行补报一个空闲额度
+        self.orphaned.discard(task)
+        asyncio.create_task(self.ready(1))
+
+    async def receive_loop(self):
+        while True:
+            try:
+                identity, frame = await self.socket.recv_multipart()
+                message = protocol.unpack(frame)
+            except Exception as e:
+                logger.error(f"Invalid message: {e}")
+                continue
+            kind = message.get('type')
+            if kind == protocol.PING:
+                await self.reply(identity, {'type': protocol.PONG})
+            elif kind == protocol.REQUEST:
+                logger.debug(f"Received request {message.get('id')} for stocks: {message.get('stocks', [])}")
+                task = asyncio.create_task(self.handle(identity, message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            else:
+                logger.warning(f"Unknown message type: {kind}")
+
+    async def handle(self, identity, message):
+        request_id = message.get('id')
+
+        async def send(data):
+            await self.reply(identity, {'type': protocol.QUOTE, 'id': request_id, 'data': data})
 
-    logger.debug("Server entering main loop")
-    while True:
         try:
-            logger.debug("Waiting for request on port 5556")
-            message = await sub_socket.recv_json()
-            stock_codes = message.get("stocks", [])
-            print(f"Received request for stocks: {stock_codes}")
-            logger.debug(f"Received request for stocks: {stock_codes}")
-            await fetch_stock_data(stock_codes, url_template, socket)
+            missing = await fetch_stock_data(message.get('stocks', []), send, self.fetch)
+            await self.reply(identity, {'type': protocol.DONE, 'id': request_id, 'missing': missing})
+            logger.debug(f"Request {request_id} done, missing {len(missing)} stocks")
         except Exception as e:
-            logger.error(f"Error in main loop: {e}")
-            await socket.send_json({})
+            logger.error(f"Error handling request {request_id}: {e}")
+            await self.reply(identity, {'type': protocol.ERROR, 'id': request_id, 'reason': str(e)})
+
+    async def serve(self):
+        logger.debug("Server entering main loop")
+        await self.receive_loop()
+
+class ScraperWorker(ScraperServer):
+    """
+    broker 模式下的抓取 worker：DEALER 连接 broker 后端，按空闲额度领取任务，
+    任务的处理与单进程模式相同，回复发给 broker 转发给请求方。
+    """
+    def __init__(self, socket, url_template, pool, http_fetcher=None, max_concurrency=32,
+                 capacity=4, heartbeat_interval=5):
+        super().__init__(socket, url_template, pool, http_fetcher, max_concurrency)
+        self.capacity = capacity                    # 同时领取的任务数
+        self.heartbeat_interval = heartbeat_interval
+        self.orphaned = set()                       # 收到 reset 时仍在处理的任务，broker 已不再为其记账
+
+    async def reply(self, identity, message):
+        await self.socket.send(protocol.pack(message))
+
+    async def ready(self, credit):
+        if credit > 0:
+            await self.reply(None, {'type': protocol.READY, 'credit': credit})
+
+    def _orphan_done(self, task):
+        # broker 不会为已遗忘的任务归还额度，任务结束时由 worker 自行补报一个空闲额度
+        self.orphaned.discard(task)
+        asyncio.create_task(self.ready(1))
+
+    async def receive_loop(self):
+        while True:
+            try:
+                message = protocol.unpack(await self.socket.recv())
+            except Exception as e:
+                logger.error(f"Invalid message from broker: {e}")
+                continue
+            kind = message.get('type')
+            if kind == protocol.JOB:
+                logger.debug(f"Received job {message.get('id')} for stocks: {message.get('stocks', [])}")
+                task = asyncio.create_task(self.handle(None, message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            elif kind == protocol.RESET:
+                # 在途任务不计入本次额度，各自结束时再补发 ready(1)
+                for task in self.tasks - self.orphaned:
+                    self.orphaned.add(task)
+                    task.add_done_callback(self._orphan_done)
+                await self.ready(self.capacity - len(self.tasks))
+            elif kind != protocol.HEARTBEAT:
+                logger.warning(f"Unknown message type from broker: {kind}")
+
+    async def heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.reply(None, {'type': protocol.HEARTBEAT})
+            except Exception as e:
+                logger.error(f"Failed to send heartbeat: {e}")
+
+    async def serve(self):
+        await self.ready(self.capacity)
+        asyncio.create_task(self.heartbeat_loop())
+        logger.debug("Worker entering main loop")
+        await self.receive_loop()
+
+async def main(worker=False):
+    context = zmq.asyncio.Context()
+    if worker:
+        socket = context.socket(zmq.DEALER)
+        endpoint = DATA_SOURCES['selenium'].get('broker', {}).get('endpoint', protocol.DEFAULT_BACKEND_ENDPOINT)
+        socket.connect(endpoint)
+        logger.info(f"Selenium worker connected to broker {endpoint}...")
+        print(f"Selenium worker connected to broker {endpoint}...")
+    else:
+        socket = context.socket(zmq.ROUTER)
+        bind = DATA_SOURCES['selenium'].get('bind', protocol.DEFAULT_BIND)
+        socket.bind(bind)
+        logger.info(f"Selenium Server (ROUTER) started on {bind}...")
+        print(f"Selenium Server started on {bind}...")
+
+    url_template = DATA_SOURCES['selenium']['url_template']
+
+    pool_config = DATA_SOURCES['selenium'].get('browser_pool', {})
+    # legacy 提取模式保持完整页面加载
+    fast = DATA_SOURCES['selenium'].get('extraction', 'fast') == 'fast'
+    pool = BrowserPool(
+        max_pages=pool_config.get('max_pages', 10),
+        recycle_after=pool_config.get('recycle_after', 500),
+        max_rss_mb=pool_config.get('max_rss_mb', 1024),
+        check_interval=pool_config.get('check_interval', 60),
+        blocked_resources=pool_config.get('blocked_resources', DEFAULT_BLOCKED_RESOURCES) if fast else ()
+    )
+    http_fetcher = None
+    if DATA_SOURCES['selenium'].get('fetch_mode', 'http') == 'http':
+        if aiohttp is None:
+            logger.warning("aiohttp/lxml not installed, using browser fetch mode")
+        else:
+            http_config = DATA_SOURCES['selenium'].get('http', {})
+            http_fetcher = HttpQuoteFetcher(
+                max_connections=http_config.get('max_connections', 20),
+                timeout=http_config.get('timeout', 10)
+            )
+            await http_fetcher.start()
+    if http_fetcher is None:
+        await pool.start()
+    asyncio.create_task(pool.maintain())
+    asyncio.create_task(clean_expired_data())
+
+    max_concurrency = DATA_SOURCES['selenium'].get('max_concurrency', 32)
+    if worker:
+        broker_config = DATA_SOURCES['selenium'].get('broker', {})
+        server = ScraperWorker(socket, url_template, pool, http_fetcher, max_concurrency,
+                               capacity=broker_config.get('worker_capacity', 4),
+                               heartbeat_interval=broker_config.get('heartbeat_interval', 5))
+    else:
+        server = ScraperServer(socket, url_template, pool, http_fetcher, max_concurrency)
+    await server.serve()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Realtime quote scraper")
+    parser.add_argument('--worker', action='store_true',
+                        help="run as a worker of scraper_broker.py instead of a standalone server")
+    args = parser.parse_args()
+    asyncio.run(main(worker=args.worker))
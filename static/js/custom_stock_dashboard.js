@@ -9,7 +9,7 @@ import {
     bindSortEvents,
     makeTableSortable,
 } from './utils.js';
-import { registerUpdateHandler, updateData } from './realtime.js';
+import { registerUpdateHandler, updateData, subscribe } from './realtime.js';
 
 let pagination = initPagination();
 let stockData = [];
@@ -33,12 +33,18 @@ function throttle(fn, delay) {
 
 const throttledSaveState = throttle(saveState, 5000);
 
+// 订阅本看板及表格中股票的实时行情，服务端只推送这些股票
+function subscribeRealtime() {
+    subscribe(['custom_stock_dashboard'], stockData.map(stock => stock.StockCode));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     const savedState = JSON.parse(sessionStorage.getItem(`${PAGE_KEY}_state`));
     if (savedState) {
         pagination.currentPage = savedState.currentPage || 1;
         pagination.perPage = savedState.perPage || 30;
         stockData = savedState.stockData || [];
+        subscribeRealtime();
         filteredData = savedState.filteredData || [...stockData]; 
         sortRules = savedState.sortRules || [];
         deletedStocks = new Set(savedState.deletedStocks || []);
@@ -136,6 +142,7 @@ function fetchData(newStockCode = null) {
             } else {
                 stockData = data;
             }
+            subscribeRealtime();
             applyFilters(); // 同步 filteredData
             updatePagination(pagination, filteredData.length);
             renderTable();
@@ -181,6 +188,7 @@ function addStock() {
 function deleteStock(stockCode) {
     deletedStocks.add(stockCode);
     stockData = stockData.filter(stock => stock.StockCode !== stockCode);
+    subscribeRealtime();
     applyFilters();
     updatePagination(pagination, filteredData.length);
     renderTable();
@@ -9,7 +9,7 @@ import {
     bindSortEvents,
     makeTableSortable,
 } from './utils.js';
-import { registerUpdateHandler, updateData } from './realtime.js';
+import { registerUpdateHandler, updateData, subscribe } from './realtime.js';
 
 let pagination = initPagination();
 let stockData = [];
@@ -34,12 +34,18 @@ function throttle(fn, delay) {
 
 const throttledSaveState = throttle(saveState, 5000);
 
+// 订阅本看板及表格中股票的实时行情，服务端只推送这些股票
+function subscribeRealtime() {
+    subscribe(['limitup_unfilled_orders_dashboard'], stockData.map(stock => stock.StockCode));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     const savedState = JSON.parse(sessionStorage.getItem(`${PAGE_KEY}_state`));
     if (savedState) {
         pagination.currentPage = savedState.currentPage || 1;
         pagination.perPage = savedState.perPage || 30;
         stockData = savedState.stockData || [];
+        subscribeRealtime();
         filteredData = savedState.filteredData || [...stockData]; // 确保初始化
         sortRules = savedState.sortRules || [];
         document.getElementById('perPage').value = pagination.perPage;
@@ -125,6 +131,7 @@ function fetchData() {
                 stockData = data;
                 filteredData = [...stockData]; // 明确初始化
             }
+            subscribeRealtime();
             populateStreakFilter();
             applyFilters();
             saveState();
@@ -10,7 +10,7 @@ import {
     makeTableSortable,
 } from './utils.js';
 
-import { registerUpdateHandler, updateData } from './realtime.js';
+import { registerUpdateHandler, updateData, subscribe } from './realtime.js';
 
 let pagination = initPagination();
 let stockData = [];
@@ -39,6 +39,11 @@ const throttledSaveState = throttle(saveState, 5000);
 // 直接关闭log的简单粗暴方法（可选）
 // console.log = function() {};
 
+// 订阅本看板及表格中股票的实时行情，服务端只推送这些股票
+function subscribeRealtime() {
+    subscribe(['ma_strategy_dashboard'], stockData.map(stock => stock.StockCode));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM loaded, registering handler');
     // 注册实时更新处理, 用于更新股票数据,第一个参数实际上不是命名空间，而是特定的event名称
@@ -57,6 +62,7 @@ document.addEventListener('DOMContentLoaded', function() {
         pagination.currentPage = savedState.currentPage || 1;
         pagination.perPage = savedState.perPage || 30;
         stockData = savedState.stockData || [];
+        subscribeRealtime();
         filteredData = savedState.filteredData || stockData;  // 初始化 filteredData
         sortRules = savedState.sortRules || [];
         document.getElementById('perPage').value = pagination.perPage;
@@ -117,6 +123,7 @@ function fetchData() {
 
             stockData = data;
             filteredData = [...stockData];  // 初始化 filteredData
+            subscribeRealtime();
             populateTypeFilter();
             applyFilters();
         })
@@ -15,12 +15,70 @@ const socket = io.connect(`http://${window.HOST}:${window.PORT}/stocks_realtime`
 // 实时更新处理函数映射
 const updateHandlers = new Map();
 
+// 当前订阅，断线重连后重新发送
+let currentSubscription = null;
+
+// 订阅看板和/或股票代码集合，服务端只推送订阅范围内的行情；再次调用会替换之前的订阅
+function subscribe(dashboards = [], codes = []) {
+    currentSubscription = { dashboards, codes };
+    if (socket.connected) {
+        socket.emit('subscribe', currentSubscription);
+    }
+}
+
+// 各股票当前行情，增量帧只带变化的字段，解码时与此合并
+const quoteCache = new Map();
+
+// 解码 realtime_update：{k, f, c, v} 列式增量/关键帧（可能为 msgpack 二进制），
+// 还原为 {code: {RealtimePrice, RealtimeChange}}，处理函数拿到的格式不变
+function decodeRealtimeUpdate(payload) {
+    if (payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)) {
+        if (!window.MessagePack) {
+            console.error('Received msgpack realtime_update but MessagePack decoder is not loaded');
+            return {};
+        }
+        payload = window.MessagePack.decode(payload instanceof ArrayBuffer ? new Uint8Array(payload) : payload);
+    }
+    if (!payload || !Array.isArray(payload.c)) {
+        return payload || {};  // 旧格式：{code: {...}}
+    }
+    const result = {};
+    payload.c.forEach((code, i) => {
+        const quote = payload.k ? {} : { ...(quoteCache.get(code) || {}) };
+        payload.f.forEach((field, j) => {
+            const value = payload.v[j][i];
+            if (value !== null && value !== undefined) {
+                quote[field] = value;
+            }
+        });
+        quoteCache.set(code, quote);
+        result[code] = quote;
+    });
+    return result;
+}
+
 // 初始化 WebSocket
 function initRealtime() {
-    socket.on('connect', () => console.log('WebSocket connected'));
+    socket.on('connect', () => {
+        console.log('WebSocket connected');
+        if (currentSubscription) {
+            socket.emit('subscribe', currentSubscription);
+        }
+    });
     socket.on('disconnect', () => console.log('WebSocket disconnected'));
     socket.on('connect_error', (error) => console.error('WebSocket connect error:', error));
     socket.on('reconnect_attempt', (attempt) => console.log('Reconnection attempt:', attempt));
+    socket.on('realtime_update', (payload) => {
+        const data = decodeRealtimeUpdate(payload);
+        if (Object.keys(data).length === 0) {
+            return;
+        }
+        updateHandlers.forEach((handler, key) => {
+            if (key.startsWith('realtime_update:') && handler) {
+                handler(data);
+            }
+        });
+    });
 }
 
 // 注册实时更新处理函数
@@ -31,6 +89,10 @@ function registerUpdateHandler(event, dataKey, handler) {
     }
     updateHandlers.set(key, handler);
 
+    // realtime_update 由 initRealtime 统一解码后分发
+    if (event === 'realtime_update') {
+        return;
+    }
     socket.on(`${event}`, (data) => {
         console.log(`Received ${event}:`, data);
         if (handler) {
@@ -51,5 +113,6 @@ function updateData(data, stockData, key) {
 }
 
 initRealtime();
+window.socket = socket;
 
-export { registerUpdateHandler, updateData };
\ No newline at end of file
+export { socket, registerUpdateHandler, updateData, decodeRealtimeUpdate, subscribe };
\ No newline at end of file
@@ -9,7 +9,7 @@ import {
     bindSortEvents,
     makeTableSortable,
 } from './utils.js';
-import { registerUpdateHandler, updateData } from './realtime.js';
+import { registerUpdateHandler, updateData, subscribe } from './realtime.js';
 
 let pagination = initPagination();
 let stockData = [];
@@ -68,6 +68,11 @@ function hideLoadingSpinner(isFetchData = false) {
     }
 }
 
+// 订阅本看板及表格中股票的实时行情，服务端只推送这些股票
+function subscribeRealtime() {
+    subscribe([], stockData.map(stock => stock.StockCode));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM loaded, registering handler');
     registerUpdateHandler('realtime_update', 'StockCode', (data) => {
@@ -86,6 +91,7 @@ document.addEventListener('DOMContentLoaded', function() {
         pagination.currentPage = savedState.currentPage || 1;
         pagination.perPage = savedState.perPage || 30;
         stockData = savedState.stockData || [];
+        subscribeRealtime();
         filteredData = savedState.filteredData || [...stockData];
         sortRules = savedState.sortRules || [];
         recentDates = savedState.recentDates || [];
@@ -268,6 +274,7 @@ function fetchData() {
             }));
             filteredData = [...stockData];
             recentDates = []; // 重置 recentDates
+            subscribeRealtime();
             sortRules = sortRules.filter(rule => !rule.field.startsWith('recentChange')); // 移除动态列排序
             populateTypeFilter();
             applyFilters();
@@ -0,0 +1,33 @@
+# 单元测试用的 app_init 替身：真实的 app_init 在导入时读取 config.yaml 并连接 MySQL，
+# 这里只提供 blueprints 模块导入时需要的对象
+import contextlib
+import logging
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _App:
+    def __init__(self):
+        self.config = {}
+        self.logger = logging.getLogger('app')
+
+    @contextlib.contextmanager
+    def app_context(self):
+        yield
+
+
+if 'app_init' not in sys.modules:
+    app_init = types.ModuleType('app_init')
+    app_init.app = _App()
+    app_init.config = {}
+    app_init.socketio = None
+    app_init.db = None
+    app_init.TradingDay = None
+    app_init.DailyStockData = None
+    app_init.StockPopularityRanking = None
+    app_init.MaStrategies = None
+    app_init.LimitUpUnfilledOrdersStocks = None
+    sys.modules['app_init'] = app_init
@@ -0,0 +1,48 @@
+from datetime import date
+
+import numpy as np
+
+from blueprints import bar_cache
+from blueprints.bar_cache import DailyBarCache
+from blueprints.bar_store import DailyBarStore
+
+DATES = [date(2024, 1, d) for d in (2, 3, 4, 5, 8, 9)]
+
+
+def _store(tmp_path):
+    store = DailyBarStore(directory=str(tmp_path), history_days=10, resync_days=2)
+    store.load()
+    for date_ in DATES:
+        store._append_date(date_)
+    for i, date_ in enumerate(DATES):
+        store._write_rows([('600519', date_, 10 + i, 11 + i, 9 + i, 10.5 + i, 1.0)])
+    store._write_rows([('000001', DATES[1], 5, 6, 4, 5.5, -1.0)])
+    store.synced_through = DATES[-1]
+    return store
+
+
+def test_window_returns_views_up_to_settled_dates(tmp_path):
+    store = _store(tmp_path)
+
+    codes, dates, views = store.window(DATES[1], None)
+
+    assert codes == ['600519', '000001']
+    assert dates == DATES[1:4]      # 最近 resync_days 个交易日不在窗口内
+    assert np.shares_memory(views['close'], store.arrays['close'])
+    assert views['close'][0].tolist() == [11.5, 12.5, 13.5]
+    assert np.isnan(views['close'][1, 1])
+
+
+def test_frame_reads_settled_dates_from_store(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    monkeypatch.setattr(bar_cache, 'daily_bar_store', store)
+    monkeypatch.setattr(bar_cache, 'BAR_STORE_ENABLED', True)
+    cache = DailyBarCache()
+    queried = []
+    monkeypatch.setattr(cache, 'get_rows', lambda codes, dates, engine=None: queried.append((codes, dates)) or [])
+
+    frame = cache.get_frame(['000001', '600519', '300750'], DATES[1:5])
+
+    assert sorted(zip(frame['StockCode'], frame['trading_Date'])) == [
+        ('000001', DATES[1]), ('600519', DATES[1]), ('600519', DATES[2]), ('600519', DATES[3])]
+    assert queried == [(['000001', '600519', '300750'], [DATES[4]]), (['300750'], DATES[1:4])]
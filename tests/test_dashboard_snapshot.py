@@ -0,0 +1,51 @@
+import gzip
+import json
+import os
+
+from blueprints import dashboard_snapshot
+
+ROWS = [{'StockCode': '600519'}]
+
+
+def _setup(tmp_path, monkeypatch, version):
+    monkeypatch.setattr(dashboard_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(dashboard_snapshot.eod_version, 'get', lambda: version)
+    written = []
+    monkeypatch.setattr(dashboard_snapshot, 'write_snapshot', lambda *args: written.append(args))
+    return written
+
+
+def _write(endpoint, date_str, payload, version):
+    path = dashboard_snapshot.snapshot_path(endpoint, date_str)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump({'version': version, 'status': 200, 'payload': payload}, f)
+
+
+def test_stale_snapshot_is_rebuilt(tmp_path, monkeypatch):
+    written = _setup(tmp_path, monkeypatch, 'v2')
+    _write('ma_strategy_data', '2024-01-02', {'message': 'No MA strategy data found'}, 'v1')
+
+    result = dashboard_snapshot.snapshot_or_build('ma_strategy_data', '2024-01-02', lambda: (ROWS, 200))
+
+    assert result == (ROWS, 200)
+    assert written == [('ma_strategy_data', '2024-01-02', ROWS, 200, 'v2')]
+
+
+def test_current_snapshot_is_served(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch, 'v1')
+    _write('ma_strategy_data', '2024-01-02', ROWS, 'v1')
+
+    result = dashboard_snapshot.snapshot_or_build('ma_strategy_data', '2024-01-02', lambda: ([], 200))
+
+    assert result == (ROWS, 200)
+
+
+def test_no_data_payload_is_not_persisted(tmp_path, monkeypatch):
+    written = _setup(tmp_path, monkeypatch, 'v1')
+
+    result = dashboard_snapshot.snapshot_or_build(
+        'ma_strategy_data', '2024-01-02', lambda: ({'message': 'No MA strategy data found'}, 200))
+
+    assert result[1] == 200
+    assert written == []
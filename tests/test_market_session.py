@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+from blueprints import market_session
+from blueprints.market_session import TZ
+
+
+class _Calendar:
+    def is_trading_day(self, day):
+        return day.weekday() < 5
+
+    def next_date(self, day):
+        return None
+
+
+def test_pre_open_waits_for_continuous_trading(monkeypatch):
+    monkeypatch.setattr(market_session, 'trading_calendar', _Calendar())
+    now = TZ.localize(datetime(2026, 10, 16, 9, 26))   # 周五
+
+    assert market_session.phase(now) == market_session.PRE_OPEN
+    assert market_session.next_active_start(now) == TZ.localize(datetime(2026, 10, 16, 9, 30))
+    assert market_session.seconds_until_active(now) == 240
+
+
+def test_lunch_break_waits_for_afternoon_open(monkeypatch):
+    monkeypatch.setattr(market_session, 'trading_calendar', _Calendar())
+    now = TZ.localize(datetime(2026, 10, 16, 12, 0))
+
+    assert market_session.next_active_start(now) == TZ.localize(datetime(2026, 10, 16, 13, 0))
+    assert market_session.next_active_start(now).date() == date(2026, 10, 16)
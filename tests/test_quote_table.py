@@ -0,0 +1,23 @@
+from blueprints.quote_table import QuoteTable
+
+
+def test_published_snapshot_is_not_changed_by_later_writes():
+    table = QuoteTable(capacity=2)
+    table.update({'600519': {'RealtimePrice': 1500.0, 'RealtimeChange': 1.2}}, 'mairui', updated_at=1)
+    snapshot = table.snapshot()
+
+    table.update({'600519': {'RealtimePrice': 1510.0, 'RealtimeChange': 1.9}}, 'mairui', updated_at=2)
+    table.update({'000001': {'RealtimePrice': 10.0, 'RealtimeChange': 0.1}}, 'mairui', updated_at=2)
+    table.remove(['600519'])
+
+    assert snapshot['600519']['RealtimePrice'] == 1500.0
+    assert list(snapshot) == ['600519']
+    assert table.snapshot().version == table.version
+    assert list(table.snapshot()) == ['000001']
+
+
+def test_snapshot_is_shared_between_writes():
+    table = QuoteTable()
+    table.update({'600519': {'RealtimePrice': 1500.0}}, 'mairui')
+
+    assert table.snapshot() is table.snapshot()
@@ -0,0 +1,19 @@
+from blueprints import realtime_broadcaster
+from blueprints.realtime_broadcaster import CoalescingBroadcaster
+from blueprints.realtime_protocol import DeltaEncoder
+
+
+def test_refresh_keyframe_does_not_swallow_broadcast(monkeypatch):
+    encoder = DeltaEncoder(keyframe_interval=3600)
+    published = []
+    monkeypatch.setattr(realtime_broadcaster, 'delta_encoder', encoder)
+    monkeypatch.setattr(realtime_broadcaster, 'publish',
+                        lambda changes, sources_for, keyframe: published.append(changes) or (1, 0))
+
+    updated = {'600519': {'RealtimePrice': 1500.0, 'RealtimeChange': 1.2}}
+    broadcaster = CoalescingBroadcaster()
+    broadcaster.mark(updated)
+    encoder.encode_keyframe(updated)     # 刷新请求方的关键帧
+    broadcaster.flush()
+
+    assert published == [{'600519': [1500.0, 1.2]}]
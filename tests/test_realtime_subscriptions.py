@@ -0,0 +1,40 @@
+from blueprints import realtime_subscriptions
+from blueprints.realtime_protocol import DeltaEncoder
+from blueprints.realtime_subscriptions import SubscriptionRegistry, publish
+
+
+class _SocketIO:
+    def __init__(self):
+        self.emits = []
+
+    def emit(self, event, message, namespace=None, to=None):
+        self.emits.append((to, message))
+
+
+def test_client_in_dashboard_and_codes_rooms_gets_one_emit(monkeypatch):
+    registry = SubscriptionRegistry()
+    socketio = _SocketIO()
+    monkeypatch.setattr(realtime_subscriptions, 'subscriptions', registry)
+    monkeypatch.setattr(realtime_subscriptions, 'socketio', socketio)
+    monkeypatch.setattr(realtime_subscriptions, 'delta_encoder', DeltaEncoder(keyframe_interval=3600))
+
+    joined, left = registry.subscribe('sid-1', ['ma_strategy_dashboard'], ['600519', '000001'])
+    sources = {'600519': ('ma_strategy',), '000001': ()}
+    events, _ = publish({'600519': [1500.0, 1.2], '000001': [10.0, -0.5]}, sources.get)
+
+    assert len(joined) == 1 and not left
+    assert events == 1
+    assert [to for to, _ in socketio.emits] == joined
+
+
+def test_resubscribe_moves_client_between_targets():
+    registry = SubscriptionRegistry()
+    first, _ = registry.subscribe('sid-1', ['ma_strategy_dashboard'], ['600519'])
+    registry.subscribe('sid-2', ['ma_strategy_dashboard'], ['600519'])
+
+    joined, left = registry.subscribe('sid-1', ['custom_stock_dashboard'])
+    assert left == set(first) and joined != first
+    assert registry.route(['600519'], lambda code: ('ma_strategy',)) == {first[0]: ['600519']}
+
+    registry.unsubscribe_all('sid-2')
+    assert registry.route(['600519'], lambda code: ('ma_strategy',)) == {}
@@ -0,0 +1,47 @@
+from datetime import date
+import time
+
+from blueprints import trading_calendar as calendar_module
+from blueprints.trading_calendar import TradingCalendar
+
+
+class _FailingSession:
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, *args):
+        self.queries += 1
+        raise RuntimeError('database unavailable')
+
+
+class _Db:
+    def __init__(self):
+        self.session = _FailingSession()
+
+
+def test_failed_reload_is_throttled(monkeypatch):
+    db = _Db()
+    monkeypatch.setattr(calendar_module, 'db', db)
+    monkeypatch.setattr(calendar_module, 'TradingDay', type('TradingDay', (), {'trading_date': None}))
+    calendar = TradingCalendar(miss_retry_interval=60)
+
+    for _ in range(5):
+        assert calendar.latest() is None
+
+    assert db.session.queries == 1
+
+
+def test_daily_reload_follows_beijing_date(monkeypatch):
+    calendar = TradingCalendar(miss_retry_interval=60)
+    calendar._dates = [date(2026, 10, 16)]
+    calendar._loaded_at = time.time()
+    calendar._loaded_day = date(2026, 10, 16)
+    reasons = []
+    monkeypatch.setattr(calendar, '_reload', reasons.append)
+
+    monkeypatch.setattr(calendar_module, 'get_beijing_today', lambda: date(2026, 10, 16))
+    calendar.latest()
+    monkeypatch.setattr(calendar_module, 'get_beijing_today', lambda: date(2026, 10, 17))
+    calendar.latest()
+
+    assert reasons == ['daily refresh']